@@ -0,0 +1,81 @@
+"""
+Background queue for media work that should not delay the Telegram reply
+"""
+
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MediaJob = Callable[[], Awaitable[None]]
+
+
+class MediaJobQueue:
+    """Runs media download/merge jobs on a fixed set of background workers"""
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or int(os.getenv('MEDIA_QUEUE_WORKERS', 3))
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Start the worker tasks (must be called from the running event loop)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"media-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Media queue started with {self.workers} workers")
+
+    async def submit(self, job: MediaJob, description: str = "media job"):
+        """
+        Queue a job for background execution
+
+        Args:
+            job: Zero-argument coroutine function to run
+            description: Label used in logs
+        """
+        if self._queue is None:
+            self.start()
+        await self._queue.put((job, description))
+        logger.info(f"Queued {description} ({self._queue.qsize()} pending)")
+
+    def pending(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue else 0
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job, description = await self._queue.get()
+            try:
+                logger.info(f"Worker {worker_id} running {description}")
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Background {description} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def stop(self, drain: bool = True, timeout: float = None):
+        """
+        Stop the workers, optionally waiting for queued jobs first
+
+        Args:
+            drain: Wait for queued and running jobs to finish
+            timeout: Seconds to wait for the drain before cancelling the rest
+        """
+        if drain and self._queue is not None:
+            logger.info(f"Draining media queue ({self._queue.qsize()} pending)")
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Media queue not drained after {timeout}s, cancelling {self._queue.qsize()} pending jobs")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,224 @@
+"""
+Parsing of archived post JSON files
+The archive holds two shapes: flat tweet dicts written by the Twitter
+StorageManager (`tweet_<id>.json`, author as a username string, counts at
+the top level) and the unified post dicts written by the bot
+(`<platform>_<id>.json`, nested author/metrics). Both are normalized to
+SocialMediaPost here
+"""
+
+import os
+import re
+import json
+import logging
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .data_models import (
+    SocialMediaPost, Platform, MediaItem, MediaType, MediaRole,
+    AuthorInfo, PostMetrics, UserContext
+)
+
+logger = logging.getLogger(__name__)
+
+# tweet_123.json, facebook_123.json, ... (anything else in the tree is ignored)
+ARCHIVE_FILE_PATTERN = re.compile(r'^(tweet|twitter|facebook|instagram|tiktok)_.+\.json$')
+HASHTAG_PATTERN = re.compile(r'#\w+')
+
+
+def default_archive_roots() -> List[str]:
+    """Directories post JSON files are archived in: StorageManager (local and server) and the bot"""
+    return [
+        os.getenv('LOCAL_STORAGE_PATH', './scraped_data'),
+        os.getenv('SERVER_STORAGE_PATH', '/home/ubuntu/social-media-archive-project/scraped_data'),
+        '/home/ubuntu/social-media-archive-project/media_storage/data',
+    ]
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    text = str(value).replace('Z', '+00:00')
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%a %b %d %H:%M:%S %z %Y'):
+        try:
+            return datetime.strptime(str(value), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _enum(enum_class, value, default):
+    try:
+        return enum_class(value)
+    except ValueError:
+        return default
+
+
+def _download_metadata(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Download state stored with a media entry (bot entries use download_* keys)"""
+    metadata = {
+        'status': entry.get('download_status') or entry.get('status'),
+        'error': entry.get('download_error') or entry.get('error'),
+    }
+    for key in ('faststart', 'etag', 'last_modified', 'content_length'):
+        metadata[key] = entry.get(key)
+    return {key: value for key, value in metadata.items() if value is not None}
+
+
+def _media_items(entries: Iterable[Dict[str, Any]]) -> List[MediaItem]:
+    items = []
+    for entry in entries or []:
+        if not entry.get('url'):
+            continue
+        items.append(MediaItem(
+            url=entry['url'],
+            media_type=_enum(MediaType, entry.get('type'), MediaType.PHOTO),
+            width=entry.get('width'),
+            height=entry.get('height'),
+            duration=entry.get('duration'),
+            file_size=entry.get('file_size'),
+            mime_type=entry.get('mime_type'),
+            local_path=entry.get('local_path'),
+            hosted_url=entry.get('hosted_url'),
+            role=_enum(MediaRole, entry.get('role', 'primary'), MediaRole.PRIMARY),
+            video_codec=entry.get('video_codec'),
+            audio_codec=entry.get('audio_codec'),
+            bitrate=entry.get('bitrate'),
+            download_metadata=_download_metadata(entry)
+        ))
+    return items
+
+
+def post_from_tweet_json(data: Dict[str, Any]) -> SocialMediaPost:
+    """Build a post from the flat shape written by the Twitter StorageManager"""
+    context = data.get('user_context') or {}
+    user_id = context.get('telegram_user_id') or data.get('scraped_by_user_id')
+    username = context.get('telegram_username') or data.get('scraped_by_user')
+    user_context = None
+    if user_id or username:
+        user_context = UserContext(
+            telegram_user_id=user_id,
+            telegram_username=username,
+            notes=context.get('added_notes') or data.get('user_notes')
+        )
+
+    text = data.get('text') or ''
+    return SocialMediaPost(
+        id=str(data['id']),
+        platform=Platform.TWITTER,
+        url=data.get('url'),
+        text=text,
+        author=AuthorInfo(
+            username=data.get('author'),
+            display_name=data.get('author_name'),
+            followers_count=data.get('author_followers'),
+            verified=bool(data.get('author_verified'))
+        ),
+        created_at=_parse_datetime(data.get('created_at')),
+        scraped_at=_parse_datetime(data.get('scraped_at')) or datetime.now(),
+        media=_media_items(data.get('media')),
+        metrics=PostMetrics(
+            likes=data.get('like_count') or 0,
+            shares=data.get('retweet_count') or 0,
+            comments=data.get('reply_count') or 0,
+            views=data.get('view_count')
+        ),
+        scraped_hashtags=data.get('scraped_hashtags') or HASHTAG_PATTERN.findall(text),
+        user_hashtags=data.get('user_hashtags') or [],
+        user_context=user_context,
+        raw_data=data
+    )
+
+
+def post_from_post_json(data: Dict[str, Any]) -> SocialMediaPost:
+    """Build a post from the unified shape written by the bot (or SocialMediaPost.to_dict)"""
+    author = data.get('author') or {}
+    metrics = data.get('metrics') or {}
+
+    # The bot writes 'telegram_user' + 'user_notes'; to_dict writes 'user_context'
+    user_context = None
+    if data.get('user_context'):
+        context = data['user_context']
+        user_context = UserContext(
+            telegram_user_id=context.get('telegram_user_id'),
+            telegram_username=context.get('telegram_username'),
+            first_name=context.get('first_name'),
+            last_name=context.get('last_name'),
+            notes=context.get('notes'),
+            preserve_original=bool(context.get('preserve_original'))
+        )
+    elif data.get('telegram_user'):
+        telegram_user = data['telegram_user']
+        user_context = UserContext(
+            telegram_user_id=telegram_user.get('user_id'),
+            telegram_username=telegram_user.get('username'),
+            first_name=telegram_user.get('first_name'),
+            last_name=telegram_user.get('last_name'),
+            notes=data.get('user_notes')
+        )
+
+    return SocialMediaPost(
+        id=str(data['id']),
+        platform=Platform(data['platform']),
+        url=data.get('url'),
+        text=data.get('text') or '',
+        author=AuthorInfo(
+            username=author.get('username'),
+            display_name=author.get('display_name'),
+            followers_count=author.get('followers_count'),
+            verified=bool(author.get('verified')),
+            profile_url=author.get('profile_url'),
+            avatar_url=author.get('avatar_url')
+        ),
+        created_at=_parse_datetime(data.get('created_at')),
+        scraped_at=_parse_datetime(data.get('scraped_at')) or datetime.now(),
+        media=_media_items(data.get('media')),
+        metrics=PostMetrics(
+            likes=metrics.get('likes') or 0,
+            shares=metrics.get('shares') or 0,
+            comments=metrics.get('comments') or 0,
+            views=metrics.get('views'),
+            saves=metrics.get('saves')
+        ),
+        scraped_hashtags=data.get('scraped_hashtags') or [],
+        user_hashtags=data.get('user_hashtags') or [],
+        user_context=user_context,
+        raw_data=data.get('raw_data') or {}
+    )
+
+
+def post_from_json(data: Dict[str, Any]) -> SocialMediaPost:
+    """Build a post from either archived shape (detected by structure, not file name)"""
+    if isinstance(data.get('author'), dict) and data.get('platform'):
+        return post_from_post_json(data)
+    return post_from_tweet_json(data)
+
+
+def load_archive_post(path) -> Optional[SocialMediaPost]:
+    """Read one archived JSON file; None if it isn't a post"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not data.get('id'):
+        return None
+    return post_from_json(data)
+
+
+def discover_archive_files(roots: Iterable) -> Iterator[Path]:
+    """Yield every archived post file under the given directories"""
+    seen = set()
+    for root in roots:
+        root = Path(root)
+        if not root.is_dir():
+            logger.warning(f"Archive directory not found: {root}")
+            continue
+        for path in root.rglob('*.json'):
+            if ARCHIVE_FILE_PATTERN.match(path.name) and path.resolve() not in seen:
+                seen.add(path.resolve())
+                yield path
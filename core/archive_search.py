@@ -0,0 +1,91 @@
+"""
+Full-text search over the archive
+Queries use web search syntax ("quoted phrase", or, -word) and run against
+the GIN-indexed search_vector of social_media_posts, which covers content,
+user notes and both hashtag arrays in each post's own language (see
+update_search_vector in create_unified_schema.sql)
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .db_pool import ConnectionPool
+from .language import detect_language
+
+logger = logging.getLogger(__name__)
+
+RESULT_COLUMNS = (
+    'id', 'platform', 'url', 'content', 'language', 'author_username',
+    'created_at', 'telegram_user_id', 'user_notes', 'user_hashtags', 'media_count', 'rank'
+)
+
+# ts_rank_cd normalization 32 scales ranks to 0..1
+RANK_NORMALIZATION = 32
+
+
+class ArchiveSearch:
+    """Ranked full-text search over social_media_posts"""
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    @staticmethod
+    def _conditions(query: str, platform: Optional[str], since: Optional[datetime],
+                    until: Optional[datetime]) -> Tuple[str, List[Any]]:
+        # A platform and date range let the planner prune partitions
+        conditions = ["search_vector @@ query"]
+        params: List[Any] = [query, detect_language(query)]
+        if platform:
+            conditions.append("platform = %s")
+            params.append(platform)
+        if since is not None:
+            conditions.append("created_at >= %s")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < %s")
+            params.append(until)
+        return ' AND '.join(conditions), params
+
+    def search(self, query: str, platform: str = None, since: datetime = None,
+               until: datetime = None, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Posts matching a query, best matches first
+
+        Args:
+            query: Search terms in web search syntax
+            platform: Optional platform to search in
+            since, until: Optional created_at range (inclusive start, exclusive end)
+            limit, offset: Page of results
+        """
+        if not query or not query.strip():
+            return []
+        where, params = self._conditions(query, platform, since, until)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT id, platform, url, content, language, author_username,
+                           created_at, telegram_user_id, raw_data->>'user_notes', user_hashtags,
+                           jsonb_array_length(media_items),
+                           ts_rank_cd(search_vector, query, {RANK_NORMALIZATION}) AS rank
+                    FROM social_media_posts, search_query(%s, %s) AS query
+                    WHERE {where}
+                    ORDER BY rank DESC, created_at DESC NULLS LAST
+                    LIMIT %s OFFSET %s
+                """, params + [limit, offset])
+                rows = cursor.fetchall()
+        return [dict(zip(RESULT_COLUMNS, row)) for row in rows]
+
+    def count(self, query: str, platform: str = None, since: datetime = None,
+              until: datetime = None) -> int:
+        """Number of posts matching a query"""
+        if not query or not query.strip():
+            return 0
+        where, params = self._conditions(query, platform, since, until)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT count(*) FROM social_media_posts, search_query(%s, %s) AS query
+                    WHERE {where}
+                """, params)
+                return cursor.fetchone()[0]
@@ -0,0 +1,86 @@
+"""
+Async PostgreSQL access for the archive pipeline
+Backed by psycopg 3's asyncio driver and connection pool, so database
+writes never block the bot's event loop
+"""
+
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Optional
+
+from psycopg import AsyncConnection
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabase:
+    """
+    Lazily opened async connection pool
+
+    Every session gets a statement_timeout, so a lock wait or runaway
+    query fails that one save instead of tying up a pooled connection.
+    Pool sizing and recycling follow the same DB_POOL_* settings as the
+    synchronous pool in core/db_pool.py.
+    """
+
+    def __init__(self, db_config: Dict[str, Any], min_size: int = None, max_size: int = None,
+                 statement_timeout_ms: int = None, max_lifetime: float = None):
+        self.db_config = db_config
+        self.min_size = min_size if min_size is not None else int(os.getenv('DB_POOL_MIN', 1))
+        self.max_size = max_size or int(os.getenv('DB_POOL_MAX', 10))
+        self.statement_timeout_ms = statement_timeout_ms or int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 15000))
+        self.max_lifetime = max_lifetime or float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+        self._pool: Optional[AsyncConnectionPool] = None
+        self._lock = asyncio.Lock()
+
+    def _conninfo(self) -> str:
+        config = {
+            'host': self.db_config.get('host'),
+            'dbname': self.db_config.get('database'),
+            'user': self.db_config.get('user'),
+            'password': self.db_config.get('password'),
+            'port': self.db_config.get('port'),
+        }
+        return make_conninfo(
+            **{k: v for k, v in config.items() if v},
+            options=f"-c statement_timeout={self.statement_timeout_ms}"
+        )
+
+    async def pool(self) -> AsyncConnectionPool:
+        """The connection pool, opened on first use (it must be created inside the running loop)"""
+        if self._pool is not None:
+            return self._pool
+        async with self._lock:
+            if self._pool is None:
+                pool = AsyncConnectionPool(
+                    self._conninfo(),
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    max_lifetime=self.max_lifetime,
+                    check=AsyncConnectionPool.check_connection,
+                    open=False
+                )
+                await pool.open()
+                self._pool = pool
+        return self._pool
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[AsyncConnection]:
+        """
+        Check out a connection for one transaction
+
+        Commits when the block completes and rolls back if it raises.
+        """
+        pool = await self.pool()
+        async with pool.connection() as conn:
+            yield conn
+
+    async def close(self):
+        """Close the pool and all its connections"""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
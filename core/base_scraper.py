@@ -113,7 +113,7 @@ class BaseScraper(ABC):
             url=url,
             text="",  # To be filled by specific scraper
             author=AuthorInfo(username="", display_name=""),  # To be filled
-            created_at=datetime.now(),  # To be filled with actual date
+            created_at=None,  # To be filled with actual date when known
             scraped_at=datetime.now(),
             user_context=user_context,
             metrics=PostMetrics()
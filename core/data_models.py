@@ -19,6 +19,11 @@ class MediaType(Enum):
     ANIMATED_GIF = "animated_gif"
     AUDIO = "audio"
 
+class MediaRole(Enum):
+    PRIMARY = "primary"        # The post's own photos/videos
+    POSTER = "poster"          # Cover/thumbnail frame of a video
+    SOUNDTRACK = "soundtrack"  # Separate music track of a video
+
 @dataclass
 class MediaItem:
     """Represents a media file (image, video, etc.)"""
@@ -31,6 +36,13 @@ class MediaItem:
     mime_type: Optional[str] = None
     local_path: Optional[str] = None
     hosted_url: Optional[str] = None
+    role: MediaRole = MediaRole.PRIMARY
+    # Filled in by ffprobe after download (core/media_probe.py)
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    bitrate: Optional[int] = None  # bits per second
+    # Download result (status, error, validators) recorded in media_files
+    download_metadata: Dict[str, Any] = field(default_factory=dict)
 
 @dataclass
 class UserContext:
@@ -40,6 +52,7 @@ class UserContext:
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     notes: Optional[str] = None
+    preserve_original: bool = False  # Evidence posts: archive media at original quality
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -47,7 +60,8 @@ class UserContext:
             'telegram_username': self.telegram_username,
             'first_name': self.first_name,
             'last_name': self.last_name,
-            'notes': self.notes
+            'notes': self.notes,
+            'preserve_original': self.preserve_original
         }
 
 @dataclass
@@ -90,8 +104,8 @@ class SocialMediaPost:
     text: str
     author: AuthorInfo
     
-    # Timestamps
-    created_at: datetime
+    # Timestamps (created_at is None when the platform does not report it)
+    created_at: Optional[datetime]
     scraped_at: datetime
     
     # Media and engagement
@@ -123,7 +137,7 @@ class SocialMediaPost:
                 'profile_url': self.author.profile_url,
                 'avatar_url': self.author.avatar_url
             },
-            'created_at': self.created_at.isoformat(),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
             'scraped_at': self.scraped_at.isoformat(),
             'media': [
                 {
@@ -135,7 +149,11 @@ class SocialMediaPost:
                     'file_size': item.file_size,
                     'mime_type': item.mime_type,
                     'local_path': item.local_path,
-                    'hosted_url': item.hosted_url
+                    'hosted_url': item.hosted_url,
+                    'role': item.role.value,
+                    'video_codec': item.video_codec,
+                    'audio_codec': item.audio_codec,
+                    'bitrate': item.bitrate
                 } for item in self.media
             ],
             'metrics': self.metrics.to_dict(),
@@ -5,29 +5,28 @@ Database storage functionality for social media posts
 import os
 import json
 import logging
-import psycopg2
-from psycopg2.extras import Json
-from typing import Optional
+from psycopg2.extras import Json, execute_values
+from typing import Optional, Dict, Any
+from concurrent.futures import Future
 from datetime import datetime
 from dotenv import load_dotenv
 
 from .data_models import SocialMediaPost
+from .db_pool import get_pool
+from .post_rows import (
+    POST_COLUMNS, POST_KEY, POST_IDENTITY, POST_UPDATE_SQL, POST_UPSERT, POST_STAGING_SQL, JSON_COLUMNS,
+    MEDIA_COLUMNS, MEDIA_KEY, MEDIA_UPDATE_SQL, CONTENT_FIELDS, post_row, media_rows,
+    METRICS_COLUMNS, METRICS_KEY, METRICS_INSERT, metrics_row,
+    changed_fields, convert_datetime_to_str, post_upsert_params
+)
+from .metrics_history import MetricsHistory
+from .archive_search import ArchiveSearch
+from .write_behind import UpsertTarget, WriteBehindWriter, register_writer
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 
-def convert_datetime_to_str(obj):
-    """Recursively convert datetime objects to ISO format strings"""
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    elif isinstance(obj, dict):
-        return {k: convert_datetime_to_str(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_datetime_to_str(item) for item in obj]
-    return obj
-
-
 def datetime_to_str(obj):
     """Convert datetime objects to ISO format strings"""
     if isinstance(obj, datetime):
@@ -35,10 +34,41 @@ def datetime_to_str(obj):
     raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
 
 
+POST_TARGET = UpsertTarget('social_media_posts', POST_COLUMNS, POST_KEY, POST_UPDATE_SQL, JSON_COLUMNS,
+                           staging_sql=POST_STAGING_SQL, identity_columns=POST_IDENTITY)
+MEDIA_TARGET = UpsertTarget('media_files', MEDIA_COLUMNS, MEDIA_KEY, MEDIA_UPDATE_SQL)
+METRICS_TARGET = UpsertTarget('post_metrics_history', METRICS_COLUMNS, METRICS_KEY, None)
+
+# Upsert reporting what happened: no row from `upserted` means the stored
+# content was identical and the update was skipped
+POST_UPSERT_REPORTING = f"""
+    WITH previous AS (
+        SELECT content_hashes FROM social_media_posts WHERE platform = %s AND id = %s
+    ), upserted AS (
+        {POST_UPSERT}
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT (SELECT inserted FROM upserted), (SELECT content_hashes FROM previous)
+"""
+
+# All media rows of a post in one statement
+MEDIA_INSERT = f"""
+    INSERT INTO media_files ({', '.join(MEDIA_COLUMNS)}) VALUES %s
+    ON CONFLICT ({', '.join(MEDIA_KEY)}) DO UPDATE SET {MEDIA_UPDATE_SQL}
+"""
+
+
 class DatabaseStorage:
-    """Handles database storage for social media posts"""
+    """
+    Handles database storage for social media posts
+
+    With DB_WRITE_BEHIND=true, posts are buffered and written in batches
+    (COPY into a staging table plus one upsert); `save_post` still waits
+    for its batch to commit, while `submit_post` lets bulk callers keep
+    going and collect the acknowledgements later.
+    """
     
-    def __init__(self):
+    def __init__(self, write_behind: bool = None):
         self.db_config = {
             'host': os.getenv('DB_HOST', 'localhost'),
             'database': os.getenv('DB_NAME', 'social_media_archive'),
@@ -46,139 +76,125 @@ class DatabaseStorage:
             'password': os.getenv('DB_PASSWORD'),
             'port': os.getenv('DB_PORT', '5432')
         }
+        self.db_pool = get_pool(self.db_config)
+        self.metrics_history = MetricsHistory(self.db_pool)
+        self.archive_search = ArchiveSearch(self.db_pool)
+
+        if write_behind is None:
+            write_behind = os.getenv('DB_WRITE_BEHIND', 'false').lower() == 'true'
+        self.writer: Optional[WriteBehindWriter] = None
+        if write_behind:
+            self.writer = register_writer(WriteBehindWriter(self.db_pool, POST_TARGET, [MEDIA_TARGET, METRICS_TARGET]))
     
     def get_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(**self.db_config)
+        """Check out a pooled database connection (use as a context manager)"""
+        return self.db_pool.connection()
     
-    def save_post(self, post: SocialMediaPost) -> bool:
-        """Save a social media post to the database"""
-        try:
-            conn = self.get_connection()
+    def _insert_post(self, post: SocialMediaPost, record_metrics: bool = True) -> Dict[str, Any]:
+        post_values = post_row(post)
+        row = [
+            Json(value) if column in JSON_COLUMNS else value
+            for column, value in zip(POST_COLUMNS, post_values)
+        ]
+        with self.get_connection() as conn:
             cur = conn.cursor()
-            
-            # Prepare media items for JSON storage
-            media_items = []
-            for media in post.media:
-                media_items.append({
-                    'url': media.url,
-                    'type': media.media_type.value,
-                    'width': media.width,
-                    'height': media.height,
-                    'duration': media.duration,
-                    'file_size': media.file_size,
-                    'mime_type': media.mime_type,
-                    'local_path': media.local_path,
-                    'hosted_url': media.hosted_url
-                })
-            
-            # Prepare metrics
-            metrics = {
-                'likes': post.metrics.likes,
-                'shares': post.metrics.shares,
-                'comments': post.metrics.comments,
-                'views': post.metrics.views,
-                'saves': post.metrics.saves
-            }
-            
-            # Remove None values from metrics
-            metrics = {k: v for k, v in metrics.items() if v is not None}
-            
-            # Prepare raw_data with user notes
+            cur.execute(POST_UPSERT_REPORTING, [post.platform.value, post.id] + post_upsert_params(row))
+            inserted, previous_hashes = cur.fetchone()
+            rows = media_rows(post)
+            if rows:
+                execute_values(cur, MEDIA_INSERT, rows)
+            if record_metrics:
+                cur.execute(METRICS_INSERT, metrics_row(post))
+            cur.close()
 
-            
-            enhanced_raw_data = post.raw_data.copy() if post.raw_data else {}
+        if inserted:
+            return {'status': 'inserted', 'changed_fields': list(CONTENT_FIELDS)}
+        if inserted is None:
+            return {'status': 'unchanged', 'changed_fields': []}
+        current_hashes = post_values[POST_COLUMNS.index('content_hashes')]
+        return {'status': 'updated', 'changed_fields': changed_fields(previous_hashes, current_hashes)}
+    
+    def upsert_post(self, post: SocialMediaPost, record_metrics: bool = True) -> Dict[str, Any]:
+        """
+        Save a post and report what changed
 
-            
-            if post.user_context and post.user_context.notes:
+        Always written immediately (also in write-behind mode), since the
+        outcome is per post.
 
-            
-                enhanced_raw_data['user_notes'] = post.user_context.notes
+        Args:
+            post: Post to save
+            record_metrics: Append a post_metrics_history row (off when
+                re-saving a post already observed in this archive run)
 
-            
-            
+        Returns:
+            {'status': 'inserted' | 'updated' | 'unchanged',
+             'changed_fields': content columns that differ from the stored row}
 
-            
-            # Insert or update the post
-            cur.execute('''
-                INSERT INTO social_media_posts (
-                    id, platform, url, content,
-                    author_username, author_display_name, author_id,
-                    author_followers, author_verified, author_profile_url, author_avatar_url,
-                    created_at, scraped_at,
-                    metrics, media_items,
-                    scraped_hashtags, user_hashtags,
-                    telegram_user_id, telegram_username, telegram_first_name, telegram_last_name,
-                    raw_data
-                ) VALUES (
-                    %s, %s, %s, %s,
-                    %s, %s, %s,
-                    %s, %s, %s, %s,
-                    %s, %s,
-                    %s, %s,
-                    %s, %s,
-                    %s, %s, %s, %s,
-                    %s
-                )
-                ON CONFLICT (id) DO UPDATE SET
-                    scraped_at = EXCLUDED.scraped_at,
-                    metrics = EXCLUDED.metrics,
-                    media_items = EXCLUDED.media_items,
-                    user_hashtags = EXCLUDED.user_hashtags,
-                    raw_data = EXCLUDED.raw_data
-            ''', (
-                post.id,
-                post.platform.value,
-                post.url,
-                post.text,
-                post.author.username if post.author else None,
-                post.author.display_name if post.author else None,
-                getattr(post.author, 'id', None) if post.author else None,
-                post.author.followers_count if post.author else None,
-                post.author.verified if post.author else False,
-                post.author.profile_url if post.author else None,
-                post.author.avatar_url if post.author else None,
-                post.created_at,
-                post.scraped_at,
-                Json(convert_datetime_to_str(metrics)),
-                Json(media_items),
-                post.scraped_hashtags,
-                post.user_hashtags,
-                post.user_context.telegram_user_id if post.user_context else None,
-                post.user_context.telegram_username if post.user_context else None,
-                post.user_context.first_name if post.user_context else None,
-                post.user_context.last_name if post.user_context else None,
-                Json(convert_datetime_to_str(enhanced_raw_data))
-            ))
-            
-            conn.commit()
-            logger.info(f"Saved {post.platform.value} post {post.id} to database")
-            
-            cur.close()
-            conn.close()
+        Raises:
+            psycopg2.Error: If the save fails
+        """
+        self.metrics_history.ensure_partitions()
+        return self._insert_post(post, record_metrics)
+    
+    def submit_post(self, post: SocialMediaPost, record_metrics: bool = True) -> Future:
+        """
+        Queue a post for saving without waiting for it
+
+        Args:
+            post: Post to save
+            record_metrics: Append a post_metrics_history row
+
+        Returns:
+            Future resolving once the post is committed. Without
+            write-behind the post is saved immediately, the Future is
+            already done and holds the upsert_post() result.
+        """
+        self.metrics_history.ensure_partitions()
+        if self.writer is not None:
+            return self.writer.submit(post_row(post), [media_rows(post), [metrics_row(post)] if record_metrics else []])
+
+        future = Future()
+        try:
+            future.set_result(self._insert_post(post, record_metrics))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def save_post(self, post: SocialMediaPost, record_metrics: bool = True) -> bool:
+        """Save a social media post to the database"""
+        try:
+            result = self.submit_post(post, record_metrics).result()
+            if isinstance(result, dict) and result['status'] == 'unchanged':
+                logger.info(f"{post.platform.value} post {post.id} unchanged in database")
+            else:
+                logger.info(f"Saved {post.platform.value} post {post.id} to database")
             return True
             
         except Exception as e:
             logger.error(f"Failed to save post to database: {e}")
             return False
     
+    def flush(self):
+        """Wait until every queued post is committed (no-op without write-behind)"""
+        if self.writer is not None:
+            self.writer.flush()
+    
     def post_exists(self, post_id: str, platform: str) -> bool:
         """Check if a post already exists in the database"""
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            
-            cur.execute('''
-                SELECT EXISTS(
-                    SELECT 1 FROM social_media_posts 
-                    WHERE id = %s AND platform = %s
-                )
-            ''', (post_id, platform))
+            with self.get_connection() as conn:
+                cur = conn.cursor()
+                
+                cur.execute('''
+                    SELECT EXISTS(
+                        SELECT 1 FROM social_media_posts 
+                        WHERE id = %s AND platform = %s
+                    )
+                ''', (post_id, platform))
+                
+                exists = cur.fetchone()[0]
+                cur.close()
             
-            exists = cur.fetchone()[0]
-            
-            cur.close()
-            conn.close()
             return exists
             
         except Exception as e:
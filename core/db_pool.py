@@ -0,0 +1,147 @@
+"""
+Shared PostgreSQL connection pools
+Saving a post used to open (and sometimes leak) a new connection per
+operation; writers now check connections out of a process-wide pool
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections
+
+    `connection()` blocks while all connections are checked out instead of
+    failing. Connections idle for longer than `health_check_interval` are
+    pinged before reuse, and connections older than `max_lifetime` are
+    replaced so server-side memory and stale sessions don't accumulate.
+    """
+
+    def __init__(self, db_config: Dict[str, Any], minconn: int = None, maxconn: int = None,
+                 max_lifetime: float = None, health_check_interval: float = None):
+        self.db_config = db_config
+        self.minconn = minconn if minconn is not None else int(os.getenv('DB_POOL_MIN', 1))
+        self.maxconn = maxconn or int(os.getenv('DB_POOL_MAX', 10))
+        self.max_lifetime = max_lifetime or float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+        self.health_check_interval = (
+            health_check_interval if health_check_interval is not None
+            else float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+        )
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._lock = threading.Lock()
+        # id(connection) -> (created_at, returned_at)
+        self._times: Dict[int, Tuple[float, float]] = {}
+
+    @property
+    def pool(self) -> ThreadedConnectionPool:
+        # Created on first use so importing a module never opens connections
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(self.minconn, self.maxconn, **self.db_config)
+        return self._pool
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self._times.pop(id(conn), None)
+        self.pool.putconn(conn, close=True)
+
+    def _checkout(self):
+        """Take a usable connection from the pool (replacing expired or dead ones)"""
+        while True:
+            conn = self.pool.getconn()
+            now = time.monotonic()
+            created_at, returned_at = self._times.setdefault(id(conn), (now, now))
+
+            if now - created_at > self.max_lifetime:
+                logger.debug("Recycling database connection past its max lifetime")
+                self._discard(conn)
+                continue
+            if (conn.closed or now - returned_at > self.health_check_interval) and not self._is_healthy(conn):
+                logger.warning("Discarding broken database connection")
+                self._discard(conn)
+                continue
+            return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Check out a connection for one unit of work
+
+        Commits when the block completes, rolls back if it raises, and
+        always returns the connection to the pool.
+        """
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                if not conn.closed:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        pass
+                raise
+        finally:
+            if conn is not None:
+                if conn.closed:
+                    self._discard(conn)
+                else:
+                    created_at, _ = self._times.get(id(conn), (time.monotonic(), 0))
+                    self._times[id(conn)] = (created_at, time.monotonic())
+                    self.pool.putconn(conn)
+            self._slots.release()
+
+    def close(self):
+        """Close every connection in the pool"""
+        with self._lock:
+            if self._pool is not None and not self._pool.closed:
+                self._pool.closeall()
+            self._pool = None
+            self._times.clear()
+
+
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_config: Dict[str, Any]) -> ConnectionPool:
+    """Shared pool for a connection config (one per distinct database/user)"""
+    key = tuple(sorted((k, str(v)) for k, v in db_config.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(db_config)
+        return _pools[key]
+
+
+@atexit.register
+def close_all_pools():
+    """Close every shared pool (registered to run at interpreter exit)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
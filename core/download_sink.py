@@ -0,0 +1,175 @@
+"""
+Buffered disk sink for streamed media downloads
+Collects network chunks into large blocks and writes them off the event loop
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Size of chunks pulled from the HTTP response
+READ_CHUNK_SIZE = 64 * 1024
+
+# Block size bounds for disk writes
+MIN_BLOCK_SIZE = 256 * 1024
+MAX_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+class DownloadSink:
+    """
+    Write a streamed download to disk in large blocks
+
+    Chunks are buffered in memory and handed to a worker thread one block at
+    a time, so a 500 MB video costs a few hundred thread hops instead of tens
+    of thousands. One block is written while the next one fills; if the disk
+    is still busy when the next block is ready, the block size doubles (up to
+    MAX_BLOCK_SIZE) so slow disks get fewer, larger writes.
+
+    The file is written to a `.part` sibling, preallocated with fallocate when
+    the expected size is known, hashed (SHA-256) in the writer thread, and
+    atomically renamed into place on close.
+    """
+
+    def __init__(self, path: Path, expected_size: Optional[int] = None,
+                 min_block_size: int = MIN_BLOCK_SIZE,
+                 max_block_size: int = MAX_BLOCK_SIZE):
+        self.path = Path(path)
+        self.temp_path = self.path.with_name(self.path.name + '.part')
+        self.expected_size = expected_size
+        self.block_size = min_block_size
+        self.max_block_size = max_block_size
+        self.bytes_written = 0
+        self.blocks_written = 0
+
+        self._buffer = bytearray()
+        self._hasher = hashlib.sha256()
+        self._fd: Optional[int] = None
+        self._preallocated = False
+        self._pending: Optional[asyncio.Future] = None
+
+    @property
+    def sha256(self) -> str:
+        """Hex digest of everything written so far"""
+        return self._hasher.hexdigest()
+
+    async def open(self):
+        """Create the temporary file and preallocate it if possible"""
+        self._fd = await asyncio.to_thread(self._open_sync)
+
+    def _open_sync(self) -> int:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+        if self.expected_size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, self.expected_size)
+                self._preallocated = True
+            except OSError as e:
+                # Not supported on every filesystem (e.g. some network mounts)
+                logger.debug(f"fallocate failed for {self.temp_path}: {e}")
+
+        return fd
+
+    async def write(self, chunk: bytes):
+        """Buffer a chunk, flushing a block to disk when the buffer is full"""
+        self._buffer += chunk
+        if len(self._buffer) >= self.block_size:
+            await self._flush()
+
+    async def _flush(self):
+        if self._pending is not None:
+            if not self._pending.done() and self.block_size < self.max_block_size:
+                # Disk is slower than the network - write bigger blocks
+                self.block_size = min(self.block_size * 2, self.max_block_size)
+            await self._pending
+            self._pending = None
+
+        if not self._buffer:
+            return
+
+        block, self._buffer = self._buffer, bytearray()
+        self._pending = asyncio.ensure_future(asyncio.to_thread(self._write_block, block))
+
+    def _write_block(self, block: bytearray):
+        self._hasher.update(block)
+        view = memoryview(block)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        self.bytes_written += len(block)
+        self.blocks_written += 1
+
+    async def close(self) -> Path:
+        """Flush remaining data and move the finished file into place"""
+        await self._flush()
+        if self._pending is not None:
+            await self._pending
+            self._pending = None
+        await asyncio.to_thread(self._finalize_sync)
+        return self.path
+
+    def _finalize_sync(self):
+        try:
+            if self._preallocated and self.bytes_written != self.expected_size:
+                # Content-Length was wrong - drop the unused preallocation
+                os.ftruncate(self._fd, self.bytes_written)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+        os.replace(self.temp_path, self.path)
+
+    async def abort(self):
+        """Discard a partially written download"""
+        if self._pending is not None:
+            try:
+                await self._pending
+            except Exception:
+                pass
+            self._pending = None
+        await asyncio.to_thread(self._abort_sync)
+
+    def _abort_sync(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        try:
+            self.temp_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.close()
+        else:
+            await self.abort()
+        return False
+
+
+async def write_response_to_file(response, path: Path) -> DownloadSink:
+    """
+    Stream an aiohttp response body to disk through a DownloadSink
+
+    Args:
+        response: aiohttp ClientResponse with a 200 status
+        path: Final path for the file
+
+    Returns:
+        The closed DownloadSink (for bytes_written and sha256)
+    """
+    content_length = response.headers.get('content-length')
+    expected_size = int(content_length) if content_length and content_length.isdigit() else None
+
+    async with DownloadSink(path, expected_size=expected_size) as sink:
+        async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+            await sink.write(chunk)
+
+    return sink
@@ -6,12 +6,18 @@ import os
 import logging
 import asyncio
 import tempfile
+from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple
 
+import aiohttp
+
 from .media_downloader import MediaDownloader
+from .download_sink import READ_CHUNK_SIZE
 from .media_merger import media_merger
-from .data_models import MediaItem, MediaType
+from .media_policy import wants_role
+from .media_probe import media_probe
+from .data_models import MediaItem, MediaType, MediaRole
 from .exceptions import MediaDownloadError
 
 logger = logging.getLogger(__name__)
@@ -19,22 +25,123 @@ logger = logging.getLogger(__name__)
 class EnhancedMediaDownloader(MediaDownloader):
     """Extended media downloader with stream merging capabilities"""
     
+    def __init__(self, base_path: str = None, base_url: str = None):
+        super().__init__(base_path, base_url)
+        # Merge while downloading instead of downloading both streams first
+        self.streaming_merge = os.getenv('MEDIA_STREAMING_MERGE', 'true').lower() == 'true'
+    
+    def _merged_item(self, video_stream: Dict[str, Any]) -> MediaItem:
+        """MediaItem describing the merged output (keyed on the video URL)"""
+        return MediaItem(
+            url=video_stream['base_url'],  # Use video URL as primary
+            media_type=MediaType.VIDEO,
+            width=video_stream.get('width'),
+            height=video_stream.get('height'),
+            mime_type='video/mp4'
+        )
+    
+    async def stream_and_merge(self, video_stream: Dict[str, Any],
+                               audio_stream: Dict[str, Any],
+                               post_id: str,
+                               platform: str,
+                               duration: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Fetch video and audio concurrently and merge them in one pass
+        
+        Both DASH representations are piped straight into ffmpeg, so no
+        intermediate files are written and network time is not serialized.
+        
+        Args:
+            video_stream: Video stream data with 'base_url', 'width', 'height', etc.
+            audio_stream: Audio stream data with 'base_url'
+            post_id: Post ID for filename generation
+            platform: Platform name
+            duration: Video duration in seconds (for progress reporting)
+            
+        Returns:
+            dict: Metadata about the merged file
+        """
+        final_path, hosted_url = self._generate_local_path(self._merged_item(video_stream), post_id, platform)
+        
+        if final_path.exists():
+            logger.info(f"Merged file already exists: {final_path}")
+            return {
+                'local_path': str(final_path),
+                'hosted_url': hosted_url,
+                'file_size': final_path.stat().st_size,
+                'mime_type': 'video/mp4',
+                'status': 'already_exists',
+                'merged': True
+            }
+        
+        logger.info(f"Streaming video and audio for {platform} post {post_id} into ffmpeg")
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+        
+        try:
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(video_stream['base_url']) as video_response, \
+                           session.get(audio_stream['base_url']) as audio_response:
+                    for response in (video_response, audio_response):
+                        if response.status != 200:
+                            raise MediaDownloadError(f"HTTP {response.status}", str(response.url), response.status)
+                    
+                    merged = await media_merger.merge_streams(
+                        video_response.content.iter_chunked(READ_CHUNK_SIZE),
+                        audio_response.content.iter_chunked(READ_CHUNK_SIZE),
+                        final_path,
+                        duration=duration
+                    )
+        except (aiohttp.ClientError, asyncio.TimeoutError, MediaDownloadError) as e:
+            logger.error(f"Streaming merge download failed for {platform} post {post_id}: {e}")
+            merged = False
+        
+        if not merged:
+            return {
+                'local_path': None,
+                'hosted_url': None,
+                'error': 'merge_failed',
+                'status': 'failed'
+            }
+        
+        self._record_inventory(final_path, MediaType.VIDEO, platform)
+        return {
+            'local_path': str(final_path),
+            'hosted_url': hosted_url,
+            'file_size': final_path.stat().st_size,
+            'mime_type': 'video/mp4',
+            'downloaded_at': datetime.now(),
+            'status': 'success',
+            'merged': True,
+            'faststart': True
+        }
+    
     async def download_and_merge_streams(self, video_stream: Dict[str, Any], 
                                        audio_stream: Dict[str, Any],
                                        post_id: str, 
-                                       platform: str) -> Dict[str, Any]:
+                                       platform: str,
+                                       duration: Optional[float] = None) -> Dict[str, Any]:
         """
-        Download video and audio streams separately and merge them
+        Download video and audio streams and merge them
+        
+        Uses the single-pass streaming merge when available and falls back
+        to downloading both streams to disk before merging.
         
         Args:
             video_stream: Video stream data with 'base_url', 'width', 'height', etc.
             audio_stream: Audio stream data with 'base_url'
             post_id: Post ID for filename generation
             platform: Platform name
+            duration: Video duration in seconds (for progress reporting)
             
         Returns:
             dict: Metadata about the merged file
         """
+        if self.streaming_merge and media_merger.streaming_supported:
+            result = await self.stream_and_merge(video_stream, audio_stream, post_id, platform, duration)
+            if result['status'] != 'failed':
+                return result
+            logger.warning(f"Streaming merge failed for {platform} post {post_id} - falling back to separate downloads")
+        
         try:
             # Create temporary directory for intermediate files
             with tempfile.TemporaryDirectory() as temp_dir:
@@ -60,7 +167,8 @@ class EnhancedMediaDownloader(MediaDownloader):
                 video_result = await self.download_media_item(
                     video_item, 
                     f"{post_id}_video", 
-                    platform
+                    platform,
+                    postprocess=False
                 )
                 
                 if video_result['status'] != 'success' and video_result['status'] != 'already_exists':
@@ -72,7 +180,8 @@ class EnhancedMediaDownloader(MediaDownloader):
                 audio_result = await self.download_media_item(
                     audio_item, 
                     f"{post_id}_audio", 
-                    platform
+                    platform,
+                    postprocess=False
                 )
                 
                 if audio_result['status'] != 'success' and audio_result['status'] != 'already_exists':
@@ -84,16 +193,8 @@ class EnhancedMediaDownloader(MediaDownloader):
                 audio_path = Path(audio_result['local_path'])
                 
                 # Generate final output path
-                final_item = MediaItem(
-                    url=video_stream['base_url'],  # Use video URL as primary
-                    media_type=MediaType.VIDEO,
-                    width=video_stream.get('width'),
-                    height=video_stream.get('height'),
-                    mime_type='video/mp4'
-                )
-                
                 final_path, hosted_url = self._generate_local_path(
-                    final_item, 
+                    self._merged_item(video_stream), 
                     post_id, 
                     platform
                 )
@@ -120,10 +221,11 @@ class EnhancedMediaDownloader(MediaDownloader):
                 
                 # Merge video and audio
                 logger.info(f"Merging video and audio streams for {platform} post {post_id}")
-                merge_success = media_merger.merge_video_audio(
+                merge_success = await media_merger.merge_video_audio(
                     video_path, 
                     audio_path, 
-                    final_path
+                    final_path,
+                    duration=duration
                 )
                 
                 if not merge_success:
@@ -152,6 +254,8 @@ class EnhancedMediaDownloader(MediaDownloader):
                 except Exception as e:
                     logger.warning(f"Failed to clean up intermediate files: {e}")
                 
+                self._record_inventory(final_path, MediaType.VIDEO, platform)
+                
                 # Return merged file metadata
                 return {
                     'local_path': str(final_path),
@@ -159,7 +263,8 @@ class EnhancedMediaDownloader(MediaDownloader):
                     'file_size': final_path.stat().st_size,
                     'mime_type': 'video/mp4',
                     'status': 'success',
-                    'merged': True
+                    'merged': True,
+                    'faststart': True
                 }
                 
         except Exception as e:
@@ -191,8 +296,10 @@ class EnhancedMediaDownloader(MediaDownloader):
             logger.warning("No video representations found in Facebook data")
             return results
         
-        # Extract best video and audio streams
+        # Extract best video and audio streams; the scraper already picked the
+        # video rendition under the quality policy
         best_video, audio_stream = media_merger.extract_best_streams(video_reps)
+        best_video = media_data.get('_video_stream') or best_video
         
         if best_video and audio_stream:
             # We have separate streams - download and merge
@@ -202,7 +309,8 @@ class EnhancedMediaDownloader(MediaDownloader):
                 best_video,
                 audio_stream,
                 post_id,
-                'facebook'
+                'facebook',
+                duration=media_data.get('playable_duration_s')
             )
             results.append(merge_result)
             
@@ -225,8 +333,8 @@ class EnhancedMediaDownloader(MediaDownloader):
             )
             results.append(video_result)
         
-        # Also download thumbnail if available
-        if 'thumbnail_uri' in media_data:
+        # Also download thumbnail if available and the media policy keeps posters
+        if 'thumbnail_uri' in media_data and wants_role('facebook', MediaRole.POSTER):
             logger.info(f"Downloading thumbnail for Facebook post {post_id}")
             thumb_item = MediaItem(
                 url=media_data['thumbnail_uri'],
@@ -241,6 +349,9 @@ class EnhancedMediaDownloader(MediaDownloader):
             )
             results.append(thumb_result)
         
+        # Fill in real dimensions, duration, codecs and bitrate
+        await media_probe.probe_results(results)
+        
         return results
 
 # Create enhanced downloader instance
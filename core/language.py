@@ -0,0 +1,76 @@
+"""
+Language detection for full-text search
+Posts are tagged with an ISO 639-1 code at ingest; search_config() in
+create_unified_schema.sql maps it to the text search configuration their
+search_vector is built with. Arabic, Hebrew, Persian, Cyrillic and Greek
+text is told apart by script alone. Latin-script text is passed to
+langdetect when it is installed and otherwise taken as English
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from typing import Optional
+
+try:
+    from langdetect import DetectorFactory, LangDetectException, detect as _langdetect
+    DetectorFactory.seed = 0  # Deterministic results
+except ImportError:  # Optional: only refines Latin-script text
+    _langdetect = None
+
+# Links, mentions and hashtags say little about the language of the text
+NOISE_PATTERN = re.compile(r'https?://\S+|[@#]\w+')
+
+# Letters used by Persian but not by Arabic
+PERSIAN_LETTERS = set('پچژگکی')
+
+# Latin text shorter than this is too little for langdetect
+MIN_LATIN_LETTERS = 20
+
+_SCRIPT_LANGUAGES = {
+    'ARABIC': 'ar',
+    'HEBREW': 'he',
+    'CYRILLIC': 'ru',
+    'GREEK': 'el',
+}
+
+
+def _script(char: str) -> Optional[str]:
+    try:
+        return unicodedata.name(char).split(' ', 1)[0]
+    except ValueError:
+        return None
+
+
+def detect_language(*texts: Optional[str]) -> Optional[str]:
+    """
+    ISO 639-1 code of the dominant language of the given texts
+
+    Returns None when there are no letters to go by (media-only posts).
+    """
+    text = NOISE_PATTERN.sub(' ', ' '.join(t for t in texts if t))
+    scripts = Counter()
+    persian = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        scripts[_script(char)] += 1
+        if char in PERSIAN_LETTERS:
+            persian += 1
+    if not scripts:
+        return None
+
+    script, letters = scripts.most_common(1)[0]
+    if script == 'ARABIC':
+        return 'fa' if persian * 20 >= letters else 'ar'
+    if script in _SCRIPT_LANGUAGES:
+        return _SCRIPT_LANGUAGES[script]
+    if script != 'LATIN':
+        return None
+
+    if _langdetect is not None and letters >= MIN_LATIN_LETTERS:
+        try:
+            return _langdetect(text)[:2]
+        except LangDetectException:
+            pass
+    return 'en'
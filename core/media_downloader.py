@@ -8,7 +8,6 @@ import hashlib
 import logging
 import asyncio
 import aiohttp
-import aiofiles
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 from urllib.parse import urlparse, urljoin
@@ -16,16 +15,60 @@ from datetime import datetime
 import mimetypes
 
 from .data_models import MediaItem, MediaType
+from .download_sink import write_response_to_file
+from .media_merger import media_merger
+from .media_layout import layout_is_sharded, shard_prefix
+from .media_inventory import media_inventory, media_category, LOCAL_TIER
+from .media_probe import media_probe
+from .storage_backends import LocalStorageBackend
+from .url_normalizer import asset_key
 from .exceptions import MediaDownloadError
 
 logger = logging.getLogger(__name__)
 
+
+def conditional_headers(record: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Build If-None-Match / If-Modified-Since headers from stored validators"""
+    headers = {}
+    if record:
+        if record.get('etag'):
+            headers['If-None-Match'] = record['etag']
+        if record.get('last_modified'):
+            headers['If-Modified-Since'] = record['last_modified']
+    return headers
+
+
+def response_validators(response) -> Dict[str, Any]:
+    """Extract the cache validators of a media response"""
+    content_length = response.headers.get('content-length')
+    return {
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified'),
+        'content_length': int(content_length) if content_length and content_length.isdigit() else None
+    }
+
+
+def media_file_hash(url: str, additional_data: str = "") -> str:
+    """
+    Name (without extension) MediaDownloader gives a downloaded file
+
+    The URL is reduced to its asset key first, so re-scrapes of signed CDN
+    URLs (new oh=/oe=/x-expires= parameters) map to the same file.
+    """
+    hash_input = f"{asset_key(url)}{additional_data}".encode('utf-8')
+    return hashlib.sha256(hash_input).hexdigest()[:16]
+
+
 class MediaDownloader:
     """Downloads and manages media files from social media posts"""
     
     def __init__(self, base_path: str = None, base_url: str = None):
         self.base_path = Path(base_path or os.getenv('MEDIA_STORAGE_PATH', '/home/ubuntu/social-media-archive-project/media_storage'))
         self.base_url = base_url or os.getenv('MEDIA_BASE_URL', 'http://localhost:8000/media')
+        self.faststart = os.getenv('MEDIA_FASTSTART', 'true').lower() == 'true'
+        self.storage = LocalStorageBackend(self.base_path, self.base_url)
+        # Revalidate existing files with conditional requests on re-archive
+        self.revalidate = os.getenv('MEDIA_REVALIDATE', 'true').lower() == 'true'
         
         # Create base directory if it doesn't exist
         self.base_path.mkdir(parents=True, exist_ok=True)
@@ -36,19 +79,11 @@ class MediaDownloader:
     
     def _get_file_hash(self, url: str, additional_data: str = "") -> str:
         """Generate a unique hash for the file based on URL and additional data"""
-        hash_input = f"{url}{additional_data}".encode('utf-8')
-        return hashlib.sha256(hash_input).hexdigest()[:16]
+        return media_file_hash(url, additional_data)
     
     def _get_media_subdir(self, media_type: MediaType) -> str:
         """Get subdirectory name for media type"""
-        if media_type in [MediaType.PHOTO, MediaType.ANIMATED_GIF]:
-            return "images"
-        elif media_type == MediaType.VIDEO:
-            return "videos"
-        elif media_type == MediaType.AUDIO:
-            return "audio"
-        else:
-            return "documents"
+        return media_category(media_type.value)
     
     def _get_file_extension(self, url: str, content_type: str = None) -> str:
         """Get file extension from URL or content type"""
@@ -84,34 +119,64 @@ class MediaDownloader:
         file_hash = self._get_file_hash(media_item.url, f"{post_id}_{platform}")
         subdir = self._get_media_subdir(media_item.media_type)
         
-        # Create platform-specific subdirectory
+        # Platform-specific subdirectory
         platform_dir = self.base_path / subdir / platform
-        platform_dir.mkdir(exist_ok=True)
         
         # Generate filename with extension
         extension = self._get_file_extension(media_item.url, media_item.mime_type)
         filename = f"{file_hash}{extension}"
-        local_path = platform_dir / filename
+        legacy_path = platform_dir / filename
+        legacy_url = self.storage.url_for(f"{subdir}/{platform}/{filename}")
+        
+        if not layout_is_sharded():
+            platform_dir.mkdir(parents=True, exist_ok=True)
+            return legacy_path, legacy_url
         
-        # Generate hosted URL
-        hosted_url = f"{self.base_url}/{subdir}/{platform}/{filename}"
+        # Fan out into hash-prefixed subdirectories (videos/twitter/ab/cd/<hash>.mp4)
+        shard = shard_prefix(filename)
+        local_path = platform_dir / shard / filename
+        hosted_url = self.storage.url_for(f"{subdir}/{platform}/{shard}/{filename}")
         
+        # Files not yet moved by the layout migration are still used in place
+        if not local_path.exists() and legacy_path.is_file() and not legacy_path.is_symlink():
+            return legacy_path, legacy_url
+        
+        local_path.parent.mkdir(parents=True, exist_ok=True)
         return local_path, hosted_url
     
-    async def download_media_item(self, media_item: MediaItem, post_id: str, platform: str) -> Dict[str, Any]:
+    async def download_media_item(self, media_item: MediaItem, post_id: str, platform: str,
+                                  postprocess: bool = True) -> Dict[str, Any]:
         """
         Download a single media item and return metadata
         
+        Args:
+            media_item: Media to download
+            post_id: Post ID for filename generation
+            platform: Platform name
+            postprocess: Run post-download steps such as faststart and
+                inventory indexing (disabled for intermediate files that
+                are merged later)
+        
         Returns:
             dict: Contains local_path, hosted_url, file_size, mime_type, etc.
+                status is 'success', 'already_exists', 'not_modified' (an
+                existing file was revalidated with a 304) or 'failed'
         """
         try:
             local_path, hosted_url = self._generate_local_path(media_item, post_id, platform)
+            request_headers = {}
             
-            # Skip if file already exists
+            # Existing files are revalidated if we stored validators for them,
+            # otherwise skipped as before
             if local_path.exists():
+                record = media_inventory.get(local_path) if self.revalidate else None
+                request_headers = conditional_headers(record)
+            
+            if local_path.exists() and not request_headers:
                 file_size = local_path.stat().st_size
                 logger.debug(f"Media file already exists: {local_path}")
+                if postprocess:
+                    self._record_inventory(local_path, media_item.media_type, platform)
                 return {
                     'local_path': str(local_path),
                     'hosted_url': hosted_url,
@@ -121,9 +186,35 @@ class MediaDownloader:
                     'status': 'already_exists'
                 }
             
+            # Older media may have been moved to the cold tier by the tiering job
+            record = media_inventory.get(local_path)
+            if record and record['tier'] != LOCAL_TIER:
+                logger.debug(f"Media file already archived in {record['tier']}: {local_path}")
+                return {
+                    'local_path': str(local_path),
+                    'hosted_url': record['remote_url'],
+                    'file_size': record['size'],
+                    'mime_type': media_item.mime_type,
+                    'downloaded_at': datetime.now(),
+                    'status': 'already_exists'
+                }
+            
             # Download the file
             async with aiohttp.ClientSession() as session:
-                async with session.get(media_item.url, timeout=aiohttp.ClientTimeout(total=60)) as response:
+                async with session.get(media_item.url, headers=request_headers,
+                                       timeout=aiohttp.ClientTimeout(total=60)) as response:
+                    if response.status == 304:
+                        logger.debug(f"Media not modified: {media_item.url}")
+                        return {
+                            'local_path': str(local_path),
+                            'hosted_url': hosted_url,
+                            'file_size': local_path.stat().st_size,
+                            'mime_type': media_item.mime_type,
+                            **response_validators(response),
+                            'downloaded_at': datetime.now(),
+                            'status': 'not_modified'
+                        }
+                    
                     if response.status != 200:
                         logger.error(f"Failed to download media: HTTP {response.status} for {media_item.url}")
                         return {
@@ -135,33 +226,41 @@ class MediaDownloader:
                     
                     # Get content type and size
                     content_type = response.headers.get('content-type', media_item.mime_type)
-                    content_length = response.headers.get('content-length')
-                    file_size = int(content_length) if content_length else None
-                    
                     # Update mime_type if we got it from headers
                     if content_type and not media_item.mime_type:
                         media_item.mime_type = content_type
                     
-                    # Write file to disk
-                    async with aiofiles.open(local_path, 'wb') as f:
-                        downloaded_size = 0
-                        async for chunk in response.content.iter_chunked(8192):
-                            await f.write(chunk)
-                            downloaded_size += len(chunk)
-                    
-                    # Get actual file size
+                    # Write file to disk in large blocks, hashing as we go
+                    validators = response_validators(response)
+                    sink = await write_response_to_file(response, local_path)
+            
+            actual_size = sink.bytes_written
+            sha256 = sink.sha256
+            logger.info(f"Downloaded media: {media_item.url} -> {local_path} ({actual_size} bytes)")
+            
+            # Move the moov atom to the front so hosted videos start playing immediately
+            # (sha256 above stays the hash of the bytes as served by the platform)
+            faststart = False
+            if postprocess and self.faststart and media_item.media_type in (MediaType.VIDEO, MediaType.ANIMATED_GIF):
+                faststart = await media_merger.ensure_faststart(local_path)
+                if faststart:
                     actual_size = local_path.stat().st_size
-                    
-                    logger.info(f"Downloaded media: {media_item.url} -> {local_path} ({actual_size} bytes)")
-                    
-                    return {
-                        'local_path': str(local_path),
-                        'hosted_url': hosted_url,
-                        'file_size': actual_size,
-                        'mime_type': content_type or media_item.mime_type,
-                        'downloaded_at': datetime.now(),
-                        'status': 'success'
-                    }
+            
+            if postprocess:
+                self._record_inventory(local_path, media_item.media_type, platform, sha256, actual_size,
+                                       validators)
+            
+            return {
+                'local_path': str(local_path),
+                'hosted_url': hosted_url,
+                'file_size': actual_size,
+                'mime_type': content_type or media_item.mime_type,
+                'sha256': sha256,
+                'faststart': faststart,
+                **validators,
+                'downloaded_at': datetime.now(),
+                'status': 'success'
+            }
         
         except asyncio.TimeoutError:
             logger.error(f"Timeout downloading media: {media_item.url}")
@@ -192,13 +291,19 @@ class MediaDownloader:
         
         logger.info(f"Downloading {len(media_items)} media items for {platform} post {post_id}")
         
-        # Download all media items concurrently
-        tasks = []
+        # Download all distinct assets concurrently (the same asset can appear
+        # more than once with different signed URLs)
+        unique_items = {}
         for media_item in media_items:
+            unique_items.setdefault(asset_key(media_item.url), media_item)
+        
+        tasks = []
+        for media_item in unique_items.values():
             task = self.download_media_item(media_item, post_id, platform)
             tasks.append(task)
         
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        unique_results = dict(zip(unique_items, await asyncio.gather(*tasks, return_exceptions=True)))
+        results = [unique_results[asset_key(media_item.url)] for media_item in media_items]
         
         # Process results
         media_metadata = []
@@ -214,51 +319,53 @@ class MediaDownloader:
             else:
                 media_metadata.append(result)
         
+        # Fill in real dimensions, duration, codecs and bitrate
+        await media_probe.probe_results(media_metadata)
+        
         successful_downloads = sum(1 for r in media_metadata if r.get('status') == 'success')
-        logger.info(f"Successfully downloaded {successful_downloads}/{len(media_items)} media items for post {post_id}")
+        not_modified = sum(1 for r in media_metadata if r.get('status') == 'not_modified')
+        logger.info(f"Successfully downloaded {successful_downloads}/{len(media_items)} media items for post {post_id}"
+                    f"{f' ({not_modified} not modified)' if not_modified else ''}")
         
         return media_metadata
     
+    def _record_inventory(self, local_path: Path, media_type: MediaType, platform: str,
+                          sha256: str = None, file_size: int = None,
+                          validators: Dict[str, Any] = None):
+        """Add a stored file (and its HTTP validators) to the media inventory"""
+        if file_size is None:
+            file_size = local_path.stat().st_size
+        media_inventory.add(local_path, file_size, self._get_media_subdir(media_type), platform, sha256,
+                            **(validators or {}))
+    
     def get_storage_stats(self) -> Dict[str, Any]:
-        """Get storage statistics"""
-        stats = {
-            'total_files': 0,
-            'total_size': 0,
-            'by_type': {}
-        }
-        
-        for media_type_dir in ['images', 'videos', 'audio', 'documents']:
-            type_dir = self.base_path / media_type_dir
-            if type_dir.exists():
-                type_stats = {
-                    'files': 0,
-                    'size': 0
-                }
-                
-                for file_path in type_dir.rglob('*'):
-                    if file_path.is_file():
-                        type_stats['files'] += 1
-                        type_stats['size'] += file_path.stat().st_size
-                
-                stats['by_type'][media_type_dir] = type_stats
-                stats['total_files'] += type_stats['files']
-                stats['total_size'] += type_stats['size']
-        
-        return stats
+        """Get storage statistics (from the media inventory totals)"""
+        return media_inventory.stats()
     
     def cleanup_orphaned_files(self, valid_file_paths: List[str]) -> int:
-        """Remove files that are no longer referenced in the database"""
+        """
+        Remove indexed files that are not in `valid_file_paths`
+        
+        Deletes immediately and trusts the caller's list to be complete; use
+        core.media_gc.MediaGarbageCollector for archive-wide cleanup.
+        """
         valid_paths = set(valid_file_paths)
         removed_count = 0
         
-        for file_path in self.base_path.rglob('*'):
-            if file_path.is_file() and str(file_path) not in valid_paths:
-                try:
-                    file_path.unlink()
-                    removed_count += 1
-                    logger.info(f"Removed orphaned file: {file_path}")
-                except Exception as e:
-                    logger.error(f"Failed to remove orphaned file {file_path}: {e}")
+        # Collect first - the inventory is modified while deleting
+        orphaned = [path for path in media_inventory.iter_paths() if path not in valid_paths]
+        for path in orphaned:
+            file_path = Path(path)
+            try:
+                file_path.unlink()
+                removed_count += 1
+                logger.info(f"Removed orphaned file: {file_path}")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Failed to remove orphaned file {file_path}: {e}")
+                continue
+            media_inventory.remove(file_path)
         
         return removed_count
 
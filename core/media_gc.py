@@ -0,0 +1,309 @@
+"""
+Mark-and-sweep garbage collection for orphaned media files
+Streams every referenced path out of Postgres and the archived post JSON
+files into an on-disk mark set and sweeps the media inventory against it
+in batches
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, Iterator, List, Tuple
+
+import psycopg2
+from dotenv import load_dotenv
+
+from .media_inventory import MediaInventory, media_inventory, LOCAL_TIER
+from .storage_backends import get_cold_backend
+from .media_layout import legacy_to_sharded
+from .archive_import import load_archive_post, discover_archive_files, default_archive_roots
+from .exceptions import StorageError
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip from the server-side cursor
+MARK_FETCH_SIZE = 10000
+
+SWEEP_BATCH_SIZE = 1000
+
+# Every path a post can reference: media_files rows (UnifiedStorageManager,
+# storage_utils) and media_items JSON (DatabaseStorage / the bot)
+REFERENCED_PATHS_QUERY = """
+    SELECT local_path FROM media_files
+    WHERE local_path IS NOT NULL
+    UNION ALL
+    SELECT item->>'local_path'
+    FROM social_media_posts, jsonb_array_elements(media_items) AS item
+    WHERE jsonb_typeof(media_items) = 'array'
+      AND item->>'local_path' IS NOT NULL
+"""
+
+# Derivatives kept next to their original (see core/media_transcoder.py)
+DERIVATIVES_QUERY = """
+    SELECT source_path, derivative_path FROM media_derivatives
+    WHERE kept_original AND derivative_path IS NOT NULL
+"""
+
+
+class MediaGarbageCollector:
+    """
+    Reclaims media files that no post references any more
+
+    Mark: referenced paths are streamed from Postgres with a named
+    (server-side) cursor into a SQLite set on disk, so memory stays bounded
+    however large the archive is. The archived post JSON files are marked
+    too, since a post only reaches the database if its save succeeded (and
+    never with USE_DATABASE=false). Legacy flat-layout paths are marked
+    together with their sharded location.
+
+    Sweep: inventory entries that are unmarked and older than the grace
+    period are deleted a batch at a time. The grace period protects files
+    whose database row has not been written yet (the bot downloads media
+    before it updates the post). The sweep is refused if marking did not
+    complete, if an archived JSON file could not be read, or if it would
+    delete more than `max_delete_fraction` of the archive.
+    """
+
+    def __init__(self, inventory: MediaInventory = None, grace_period: timedelta = None,
+                 max_delete_fraction: float = None, work_dir: str = None,
+                 archive_roots: Iterable[str] = None):
+        self.inventory = inventory or media_inventory
+        self.archive_roots = list(archive_roots) if archive_roots is not None else default_archive_roots()
+        self.grace_period = grace_period or timedelta(days=float(os.getenv('MEDIA_GC_GRACE_DAYS', 7)))
+        self.max_delete_fraction = max_delete_fraction if max_delete_fraction is not None else \
+            float(os.getenv('MEDIA_GC_MAX_DELETE_FRACTION', 0.5))
+        self.work_dir = work_dir
+        self._cold_backend = None
+        self.db_config = {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'database': os.getenv('DB_NAME', 'social_media_archive'),
+            'user': os.getenv('DB_USER', 'postgres'),
+            'password': os.getenv('DB_PASSWORD'),
+            'port': os.getenv('DB_PORT', '5432')
+        }
+
+    def _open_marks(self, marks_path: Path) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(marks_path))
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("CREATE TABLE marks (path TEXT PRIMARY KEY) WITHOUT ROWID")
+        conn.execute("ATTACH DATABASE ? AS inv", (str(self.inventory.db_path),))
+        return conn
+
+    def mark(self, marks: sqlite3.Connection) -> int:
+        """
+        Stream referenced paths from Postgres into the mark set
+
+        Returns:
+            Number of references read
+        """
+        referenced = 0
+        pg_conn = psycopg2.connect(**self.db_config)
+        try:
+            # Named cursor: rows stay on the server and arrive MARK_FETCH_SIZE at a time
+            with pg_conn.cursor(name='media_gc_mark') as cursor:
+                cursor.itersize = MARK_FETCH_SIZE
+                cursor.execute(REFERENCED_PATHS_QUERY)
+                while True:
+                    rows = cursor.fetchmany(MARK_FETCH_SIZE)
+                    if not rows:
+                        break
+                    marks.executemany("INSERT OR IGNORE INTO marks VALUES (?)", self._expand(rows))
+                    referenced += len(rows)
+
+            # A derivative lives as long as its original is referenced
+            with pg_conn.cursor(name='media_gc_mark_derivatives') as cursor:
+                cursor.itersize = MARK_FETCH_SIZE
+                cursor.execute(DERIVATIVES_QUERY)
+                while True:
+                    rows = cursor.fetchmany(MARK_FETCH_SIZE)
+                    if not rows:
+                        break
+                    marks.executemany(
+                        "INSERT OR IGNORE INTO marks SELECT ? WHERE EXISTS (SELECT 1 FROM marks WHERE path = ?)",
+                        [(derivative_path, source_path) for source_path, derivative_path in rows]
+                    )
+            marks.commit()
+        finally:
+            pg_conn.close()
+
+        logger.info(f"Marked {referenced} media references")
+        return referenced
+
+    def mark_archives(self, marks: sqlite3.Connection) -> Tuple[int, int]:
+        """
+        Mark the local paths of media listed in archived post JSON files
+
+        Returns:
+            (references read, archive files that could not be read)
+        """
+        referenced = unreadable = 0
+        batch: List[Tuple[str]] = []
+        for path in discover_archive_files(self.archive_roots):
+            try:
+                post = load_archive_post(path)
+            except Exception as e:
+                logger.error(f"Cannot read archived post {path}: {e}")
+                unreadable += 1
+                continue
+            if post is None:
+                continue
+            batch.extend((media.local_path,) for media in post.media if media.local_path)
+            if len(batch) >= MARK_FETCH_SIZE:
+                marks.executemany("INSERT OR IGNORE INTO marks VALUES (?)", self._expand(batch))
+                referenced += len(batch)
+                batch = []
+        if batch:
+            marks.executemany("INSERT OR IGNORE INTO marks VALUES (?)", self._expand(batch))
+            referenced += len(batch)
+        marks.commit()
+
+        logger.info(f"Marked {referenced} media references from archived JSON ({unreadable} unreadable files)")
+        return referenced, unreadable
+
+    @staticmethod
+    def _expand(rows: List[Tuple[str]]) -> Iterator[Tuple[str]]:
+        """Mark each path and, for flat-layout paths, where the migration moved it"""
+        for (path,) in rows:
+            yield (path,)
+            sharded = legacy_to_sharded(Path(path))
+            if sharded is not None:
+                yield (str(sharded),)
+
+    def _candidates(self, marks: sqlite3.Connection, cutoff: str) -> Iterator[List[Tuple[str, int, str, str]]]:
+        """Yield batches of unreferenced inventory entries older than the cutoff"""
+        last_path = ''
+        while True:
+            rows = marks.execute("""
+                SELECT i.path, i.size, i.media_type, i.tier
+                FROM inv.media_inventory i
+                WHERE i.path > ?
+                  AND i.created_at < ?
+                  AND NOT EXISTS (SELECT 1 FROM marks m WHERE m.path = i.path)
+                ORDER BY i.path
+                LIMIT ?
+            """, (last_path, cutoff, SWEEP_BATCH_SIZE)).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_path = rows[-1][0]
+
+    def run(self, dry_run: bool = True, force: bool = False, sample_size: int = 20) -> Dict[str, Any]:
+        """
+        Run a full mark-and-sweep pass
+
+        Args:
+            dry_run: Only report what would be deleted (the default)
+            force: Sweep even if the safety limit on deletions is exceeded
+            sample_size: Number of example paths to include in the report
+
+        Returns:
+            Report dict with reference, candidate and reclaimed byte counts
+        """
+        started = time.monotonic()
+        cutoff_time = datetime.utcnow() - self.grace_period
+        cutoff = cutoff_time.strftime('%Y-%m-%d %H:%M:%S')
+        report = {
+            'dry_run': dry_run,
+            'referenced': 0,
+            'archived_references': 0,
+            'unreadable_archives': 0,
+            'inventory_files': self.inventory.stats(tier=None)['total_files'],
+            'candidates': 0,
+            'deleted': 0,
+            'reclaimed_bytes': 0,
+            'skipped_recent': 0,
+            'errors': 0,
+            'by_type': {},
+            'sample': []
+        }
+
+        with tempfile.TemporaryDirectory(prefix='media_gc_', dir=self.work_dir) as temp_dir:
+            marks = self._open_marks(Path(temp_dir) / 'marks.sqlite')
+            try:
+                # Any failure while marking aborts before anything is deleted
+                report['referenced'] = self.mark(marks)
+                report['archived_references'], report['unreadable_archives'] = self.mark_archives(marks)
+                if not report['referenced'] + report['archived_references'] and report['inventory_files'] > 0 and not force:
+                    raise StorageError("No media references found in the database or archives - refusing to sweep")
+                if report['unreadable_archives'] and not dry_run and not force:
+                    raise StorageError(
+                        f"{report['unreadable_archives']} archived post files could not be read - "
+                        f"fix them or rerun with force to proceed"
+                    )
+
+                if not dry_run and not force:
+                    unreferenced = marks.execute("""
+                        SELECT COUNT(*) FROM inv.media_inventory i
+                        WHERE i.created_at < ?
+                          AND NOT EXISTS (SELECT 1 FROM marks m WHERE m.path = i.path)
+                    """, (cutoff,)).fetchone()[0]
+                    if report['inventory_files'] and unreferenced / report['inventory_files'] > self.max_delete_fraction:
+                        raise StorageError(
+                            f"Sweep would delete {unreferenced} of {report['inventory_files']} files "
+                            f"(limit {self.max_delete_fraction:.0%}) - rerun with force to proceed"
+                        )
+
+                for batch in self._candidates(marks, cutoff):
+                    self._sweep_batch(batch, cutoff_time, dry_run, report, sample_size)
+            finally:
+                marks.close()
+
+        report['elapsed_seconds'] = round(time.monotonic() - started, 1)
+        logger.info(
+            f"Media GC {'dry run' if dry_run else 'sweep'}: {report['candidates']} unreferenced files, "
+            f"{report['deleted']} deleted, {report['reclaimed_bytes']} bytes"
+        )
+        return report
+
+    @property
+    def cold_backend(self):
+        if self._cold_backend is None:
+            self._cold_backend = get_cold_backend()
+        return self._cold_backend
+
+    def _delete_cold(self, path: str):
+        """Delete a file that the tiering job moved to the cold backend"""
+        if self.cold_backend is None:
+            raise StorageError("cold storage backend is not configured")
+        key = Path(path).relative_to(self.inventory.base_path).as_posix()
+        self.cold_backend.delete(key)
+
+    def _sweep_batch(self, batch: List[Tuple[str, int, str, str]], cutoff_time: datetime,
+                     dry_run: bool, report: Dict[str, Any], sample_size: int):
+        for path, size, media_type, tier in batch:
+            report['candidates'] += 1
+            type_stats = report['by_type'].setdefault(media_type, {'files': 0, 'size': 0})
+            type_stats['files'] += 1
+            type_stats['size'] += size
+            if len(report['sample']) < sample_size:
+                report['sample'].append(path)
+
+            if dry_run:
+                report['reclaimed_bytes'] += size
+                continue
+
+            try:
+                if tier != LOCAL_TIER:
+                    self._delete_cold(path)
+                else:
+                    # Re-check on disk: the file may have been rewritten since it was indexed
+                    if datetime.utcfromtimestamp(os.lstat(path).st_mtime) > cutoff_time:
+                        report['skipped_recent'] += 1
+                        continue
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, StorageError) as e:
+                logger.error(f"Failed to remove orphaned file {path}: {e}")
+                report['errors'] += 1
+                continue
+
+            self.inventory.remove(path)
+            report['deleted'] += 1
+            report['reclaimed_bytes'] += size
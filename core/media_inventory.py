@@ -0,0 +1,494 @@
+"""
+Inventory of stored media files
+Keeps an incrementally maintained SQLite index of every file in the media
+tree so storage stats and housekeeping never have to walk the filesystem
+"""
+
+import os
+import sqlite3
+import logging
+import mimetypes
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Storage directory for each MediaType value
+MEDIA_CATEGORIES = {
+    'photo': 'images',
+    'animated_gif': 'images',
+    'video': 'videos',
+    'audio': 'audio',
+}
+CATEGORY_DIRS = ['images', 'videos', 'audio', 'documents']
+
+# Bot downloads live outside the per-type directories
+BOT_MEDIA_DIR = Path('data') / 'media'
+
+RECONCILE_BATCH_SIZE = 1000
+
+# Where a file's bytes live: 'local' (media tree) or the name of a cold backend
+LOCAL_TIER = 'local'
+
+# Columns added after the table was first created
+COLUMN_MIGRATIONS = {
+    'tier': "ALTER TABLE media_inventory ADD COLUMN tier TEXT NOT NULL DEFAULT 'local'",
+    'remote_url': "ALTER TABLE media_inventory ADD COLUMN remote_url TEXT",
+    'etag': "ALTER TABLE media_inventory ADD COLUMN etag TEXT",
+    'last_modified': "ALTER TABLE media_inventory ADD COLUMN last_modified TEXT",
+    'content_length': "ALTER TABLE media_inventory ADD COLUMN content_length INTEGER",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_inventory (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    media_type TEXT NOT NULL,
+    platform TEXT,
+    sha256 TEXT,
+    tier TEXT NOT NULL DEFAULT 'local',
+    remote_url TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    content_length INTEGER,
+    created_at TEXT NOT NULL DEFAULT (datetime('now')),
+    updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_media_inventory_sha256 ON media_inventory(sha256);
+CREATE INDEX IF NOT EXISTS idx_media_inventory_platform ON media_inventory(platform);
+
+-- ffprobe results by content hash, so each distinct file is probed once
+CREATE TABLE IF NOT EXISTS media_probes (
+    sha256 TEXT PRIMARY KEY,
+    width INTEGER,
+    height INTEGER,
+    duration REAL,
+    video_codec TEXT,
+    audio_codec TEXT,
+    bitrate INTEGER,
+    container TEXT,
+    probed_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+"""
+
+# Created after COLUMN_MIGRATIONS, since the triggers read the tier column
+TOTALS_SCHEMA = """
+-- Running totals per media type and tier, kept in step with media_inventory by triggers
+CREATE TABLE IF NOT EXISTS media_inventory_totals (
+    media_type TEXT NOT NULL,
+    tier TEXT NOT NULL,
+    files INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (media_type, tier)
+);
+
+CREATE TRIGGER IF NOT EXISTS media_inventory_insert AFTER INSERT ON media_inventory
+BEGIN
+    INSERT INTO media_inventory_totals (media_type, tier, files, size) VALUES (NEW.media_type, NEW.tier, 1, NEW.size)
+    ON CONFLICT(media_type, tier) DO UPDATE SET files = files + 1, size = size + NEW.size;
+END;
+
+CREATE TRIGGER IF NOT EXISTS media_inventory_delete AFTER DELETE ON media_inventory
+BEGIN
+    UPDATE media_inventory_totals SET files = files - 1, size = size - OLD.size
+    WHERE media_type = OLD.media_type AND tier = OLD.tier;
+END;
+
+CREATE TRIGGER IF NOT EXISTS media_inventory_update AFTER UPDATE OF size, media_type, tier ON media_inventory
+BEGIN
+    UPDATE media_inventory_totals SET files = files - 1, size = size - OLD.size
+    WHERE media_type = OLD.media_type AND tier = OLD.tier;
+    INSERT INTO media_inventory_totals (media_type, tier, files, size) VALUES (NEW.media_type, NEW.tier, 1, NEW.size)
+    ON CONFLICT(media_type, tier) DO UPDATE SET files = files + 1, size = size + NEW.size;
+END;
+"""
+
+# Totals kept per media type only, before tiers were counted separately
+LEGACY_TOTALS_DROP = """
+DROP TRIGGER IF EXISTS media_inventory_insert;
+DROP TRIGGER IF EXISTS media_inventory_delete;
+DROP TRIGGER IF EXISTS media_inventory_update;
+DROP TABLE IF EXISTS media_inventory_totals;
+"""
+
+
+def media_category(media_type: str) -> str:
+    """Storage directory name ('images', 'videos', ...) for a MediaType value"""
+    return MEDIA_CATEGORIES.get(media_type, 'documents')
+
+
+def classify_path(relative_path: Path) -> Tuple[str, Optional[str]]:
+    """
+    Infer media type and platform from a path relative to the media root
+
+    Files under images/<platform>/..., videos/<platform>/... etc. are typed by
+    their directory; bot downloads in data/media are typed by extension.
+    """
+    parts = relative_path.parts
+    if parts and parts[0] in CATEGORY_DIRS:
+        platform = parts[1] if len(parts) > 2 else None
+        return parts[0], platform
+
+    mime_type, _ = mimetypes.guess_type(relative_path.name)
+    if mime_type:
+        major = mime_type.split('/')[0]
+        if major == 'image':
+            return 'images', None
+        if major == 'video':
+            return 'videos', None
+        if major == 'audio':
+            return 'audio', None
+    return 'documents', None
+
+
+class MediaInventory:
+    """
+    SQLite index of stored media files
+
+    Every download adds a row and every delete removes one; per-type totals
+    are maintained by triggers so stats are a single small query. `reconcile`
+    walks the media tree to correct drift (files added or removed outside
+    the downloaders) and is meant to run periodically, not per request.
+    """
+
+    def __init__(self, base_path: str = None, db_path: str = None):
+        self.base_path = Path(base_path or os.getenv('MEDIA_STORAGE_PATH', '/home/ubuntu/social-media-archive-project/media_storage'))
+        self.db_path = Path(db_path or os.getenv('MEDIA_INVENTORY_PATH', str(self.base_path / '.media_inventory.sqlite')))
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(media_inventory)")}
+        for column, ddl in COLUMN_MIGRATIONS.items():
+            if column not in columns:
+                conn.execute(ddl)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_media_inventory_tier_created ON media_inventory(tier, created_at)")
+
+        totals_columns = {row['name'] for row in conn.execute("PRAGMA table_info(media_inventory_totals)")}
+        rebuild_totals = 'tier' not in totals_columns
+        if rebuild_totals:
+            conn.executescript(LEGACY_TOTALS_DROP)
+        conn.executescript(TOTALS_SCHEMA)
+        if rebuild_totals:
+            self._rebuild_totals(conn)
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def _rebuild_totals(conn: sqlite3.Connection):
+        """Recompute media_inventory_totals from media_inventory (in the caller's transaction)"""
+        conn.execute("DELETE FROM media_inventory_totals")
+        conn.execute("""
+            INSERT INTO media_inventory_totals (media_type, tier, files, size)
+            SELECT media_type, tier, count(*), COALESCE(sum(size), 0)
+            FROM media_inventory GROUP BY media_type, tier
+        """)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def add(self, path, size: int, media_type: str, platform: str = None, sha256: str = None,
+            etag: str = None, last_modified: str = None, content_length: int = None):
+        """
+        Record a stored file (or refresh its size/hash if already indexed)
+
+        Args:
+            path: Absolute path of the file
+            size: File size in bytes
+            media_type: Storage category ('images', 'videos', 'audio', 'documents')
+            platform: Platform the file was archived from
+            sha256: Content hash if known
+            etag: ETag header of the origin response (for revalidation)
+            last_modified: Last-Modified header of the origin response
+            content_length: Content-Length of the origin response
+        """
+        try:
+            with self._lock, self.conn:
+                self.conn.execute("""
+                    INSERT INTO media_inventory
+                        (path, size, media_type, platform, sha256, etag, last_modified, content_length)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(path) DO UPDATE SET
+                        size = excluded.size,
+                        media_type = excluded.media_type,
+                        platform = COALESCE(excluded.platform, media_inventory.platform),
+                        sha256 = COALESCE(excluded.sha256, media_inventory.sha256),
+                        etag = COALESCE(excluded.etag, media_inventory.etag),
+                        last_modified = COALESCE(excluded.last_modified, media_inventory.last_modified),
+                        content_length = COALESCE(excluded.content_length, media_inventory.content_length),
+                        tier = 'local',
+                        remote_url = NULL,
+                        updated_at = datetime('now')
+                """, (str(path), size, media_type, platform, sha256, etag, last_modified, content_length))
+        except sqlite3.Error as e:
+            # The inventory is an index - never fail a download because of it
+            logger.error(f"Failed to record {path} in media inventory: {e}")
+
+    def set_tier(self, path, tier: str, remote_url: str = None):
+        """Record that a file's bytes moved to another storage tier"""
+        with self._lock, self.conn:
+            self.conn.execute("""
+                UPDATE media_inventory SET tier = ?, remote_url = ?, updated_at = datetime('now')
+                WHERE path = ?
+            """, (tier, remote_url, str(path)))
+
+    def rename(self, old_path, new_path):
+        """Point a record at the file's new path (e.g. after a layout migration)"""
+        if str(old_path) == str(new_path):
+            return
+        with self._lock, self.conn:
+            # An explicit DELETE (not UPDATE OR REPLACE) so the totals trigger sees the dropped row
+            self.conn.execute("""
+                DELETE FROM media_inventory
+                WHERE path = ? AND EXISTS (SELECT 1 FROM media_inventory WHERE path = ?)
+            """, (str(new_path), str(old_path)))
+            self.conn.execute("""
+                UPDATE media_inventory SET path = ?, updated_at = datetime('now')
+                WHERE path = ?
+            """, (str(new_path), str(old_path)))
+
+    def remove(self, path):
+        """Drop a deleted file from the inventory"""
+        try:
+            with self._lock, self.conn:
+                self.conn.execute("DELETE FROM media_inventory WHERE path = ?", (str(path),))
+        except sqlite3.Error as e:
+            logger.error(f"Failed to remove {path} from media inventory: {e}")
+
+    def get(self, path) -> Optional[Dict[str, Any]]:
+        """Inventory record for a path, or None if it is not indexed"""
+        try:
+            with self._lock:
+                row = self.conn.execute("SELECT * FROM media_inventory WHERE path = ?", (str(path),)).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to read {path} from media inventory: {e}")
+            return None
+        return dict(row) if row else None
+
+    def get_probe(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Cached ffprobe result for a content hash, or None"""
+        try:
+            with self._lock:
+                row = self.conn.execute("SELECT * FROM media_probes WHERE sha256 = ?", (sha256,)).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to read probe cache for {sha256}: {e}")
+            return None
+        if not row:
+            return None
+        probe = dict(row)
+        del probe['sha256'], probe['probed_at']
+        return probe
+
+    def put_probe(self, sha256: str, probe: Dict[str, Any]):
+        """Cache an ffprobe result for a content hash"""
+        try:
+            with self._lock, self.conn:
+                self.conn.execute("""
+                    INSERT OR REPLACE INTO media_probes
+                        (sha256, width, height, duration, video_codec, audio_codec, bitrate, container)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (sha256, probe.get('width'), probe.get('height'), probe.get('duration'),
+                      probe.get('video_codec'), probe.get('audio_codec'), probe.get('bitrate'),
+                      probe.get('container')))
+        except sqlite3.Error as e:
+            logger.error(f"Failed to cache probe for {sha256}: {e}")
+
+    def iter_paths(self, batch_size: int = RECONCILE_BATCH_SIZE) -> Iterator[str]:
+        """Yield every indexed path, in path order, a batch at a time"""
+        last_path = ''
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT path FROM media_inventory WHERE path > ? ORDER BY path LIMIT ?",
+                    (last_path, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row['path']
+            last_path = rows[-1]['path']
+
+    def iter_records(self, tier: str = LOCAL_TIER, created_before: str = None,
+                     batch_size: int = RECONCILE_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield batches of inventory records in one tier
+
+        Args:
+            tier: Storage tier to list
+            created_before: Only records indexed before this UTC timestamp
+                ('YYYY-MM-DD HH:MM:SS')
+            batch_size: Records per batch
+        """
+        created_before = created_before or '9999-12-31 23:59:59'
+        last_path = ''
+        while True:
+            with self._lock:
+                rows = self.conn.execute("""
+                    SELECT * FROM media_inventory
+                    WHERE tier = ? AND created_at < ? AND path > ?
+                    ORDER BY path LIMIT ?
+                """, (tier, created_before, last_path, batch_size)).fetchall()
+            if not rows:
+                return
+            yield [dict(row) for row in rows]
+            last_path = rows[-1]['path']
+
+    def stats(self, tier: str = LOCAL_TIER) -> Dict[str, Any]:
+        """
+        Storage statistics from the maintained totals
+
+        Args:
+            tier: Storage tier to count (default: files on local disk; None for every tier)
+        """
+        stats = {
+            'total_files': 0,
+            'total_size': 0,
+            'by_type': {}
+        }
+
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT media_type, SUM(files) AS files, SUM(size) AS size FROM media_inventory_totals
+                WHERE ? IS NULL OR tier = ?
+                GROUP BY media_type ORDER BY media_type
+            """, (tier, tier)).fetchall()
+
+        for row in rows:
+            if row['files'] <= 0:
+                continue
+            stats['by_type'][row['media_type']] = {
+                'files': row['files'],
+                'size': row['size']
+            }
+            stats['total_files'] += row['files']
+            stats['total_size'] += row['size']
+
+        return stats
+
+    def _walk_media_files(self) -> Iterator[Tuple[str, int, str, Optional[str]]]:
+        """Yield (path, size, media_type, platform) for every file in the media tree"""
+        roots = [self.base_path / category for category in CATEGORY_DIRS]
+        roots.append(self.base_path / BOT_MEDIA_DIR)
+
+        for root in roots:
+            if not root.is_dir():
+                continue
+            for dirpath, dirnames, filenames in os.walk(root):
+                for filename in filenames:
+                    if filename.endswith('.part'):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        st = os.lstat(path)
+                    except FileNotFoundError:
+                        continue
+                    if not os.path.isfile(path) or os.path.islink(path):
+                        # Legacy-layout symlinks point at files indexed under their real path
+                        continue
+                    media_type, platform = classify_path(Path(path).relative_to(self.base_path))
+                    yield path, st.st_size, media_type, platform
+
+    def reconcile(self, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Correct drift between the inventory and the filesystem
+
+        Walks the media tree once into a temporary table, then adds missing
+        files, fixes changed sizes, drops rows for files that no longer
+        exist and recomputes the stored totals, all in one transaction.
+        Files offloaded to a cold tier are not expected on disk and are left
+        alone. Uses its own connection so regular inventory updates are only
+        blocked for the final set-based step.
+
+        Args:
+            dry_run: Report the differences without changing the inventory
+
+        Returns:
+            dict with counts of 'scanned', 'added', 'updated' and 'removed' files
+        """
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TEMP TABLE seen_files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    media_type TEXT NOT NULL,
+                    platform TEXT
+                )
+            """)
+
+            scanned = 0
+            batch: List[Tuple[str, int, str, Optional[str]]] = []
+            for record in self._walk_media_files():
+                batch.append(record)
+                if len(batch) >= RECONCILE_BATCH_SIZE:
+                    conn.executemany("INSERT OR REPLACE INTO seen_files VALUES (?, ?, ?, ?)", batch)
+                    scanned += len(batch)
+                    batch = []
+            if batch:
+                conn.executemany("INSERT OR REPLACE INTO seen_files VALUES (?, ?, ?, ?)", batch)
+                scanned += len(batch)
+
+            conn.commit()
+
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                INSERT INTO media_inventory (path, size, media_type, platform)
+                SELECT s.path, s.size, s.media_type, s.platform
+                FROM seen_files s
+                LEFT JOIN media_inventory m ON m.path = s.path
+                WHERE m.path IS NULL
+            """)
+            added = cursor.rowcount
+
+            cursor.execute("""
+                UPDATE media_inventory
+                SET size = (SELECT s.size FROM seen_files s WHERE s.path = media_inventory.path),
+                    updated_at = datetime('now')
+                WHERE path IN (
+                    SELECT s.path FROM seen_files s
+                    JOIN media_inventory m ON m.path = s.path
+                    WHERE m.size != s.size AND m.tier = 'local'
+                )
+            """)
+            updated = cursor.rowcount
+
+            cursor.execute("""
+                DELETE FROM media_inventory
+                WHERE tier = 'local' AND path NOT IN (SELECT path FROM seen_files)
+            """)
+            removed = cursor.rowcount
+
+            # Repairs any drift in the running totals as well
+            self._rebuild_totals(conn)
+
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+
+            result = {'scanned': scanned, 'added': added, 'updated': updated, 'removed': removed}
+            logger.info(f"Media inventory reconciled: {result}")
+            return result
+        finally:
+            conn.close()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# Global instance
+media_inventory = MediaInventory()
@@ -0,0 +1,68 @@
+"""
+Directory layout for stored media files
+Fans files out over hash-prefixed subdirectories (ab/cd/<file>) so that no
+single directory grows to millions of entries
+"""
+
+import os
+import re
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+# Two levels of two hex characters: 65,536 leaf directories
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+# MediaDownloader names files by a 16-character hex digest of the asset
+HASH_NAME_PATTERN = re.compile(r'^[0-9a-f]{16}$')
+
+
+def layout_is_sharded() -> bool:
+    """Whether new files should be written to the sharded layout"""
+    return os.getenv('MEDIA_LAYOUT', 'sharded').lower() == 'sharded'
+
+
+def shard_prefix(filename: str) -> str:
+    """
+    Get the shard directories for a file name
+
+    MediaDownloader's hash names are sharded on their own prefix; anything
+    else (e.g. the bot's "<post_id>_media_<n>" names, whose leading digits
+    change slowly) is sharded on the SHA-256 of its stem.
+
+    Returns:
+        Relative directory such as "ab/cd"
+    """
+    stem = Path(filename).stem.split('.')[0].lower()
+    if HASH_NAME_PATTERN.match(stem):
+        key = stem
+    else:
+        key = hashlib.sha256(stem.encode('utf-8')).hexdigest()
+
+    return '/'.join(key[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS))
+
+
+def sharded_path(directory: Path, filename: str) -> Path:
+    """Path of `filename` inside `directory` using the sharded layout"""
+    return Path(directory) / shard_prefix(filename) / filename
+
+
+def is_sharded(path: Path) -> bool:
+    """Check whether a file already sits in its shard directory"""
+    path = Path(path)
+    parents = path.parent.parts[-SHARD_LEVELS:]
+    return '/'.join(parents) == shard_prefix(path.name)
+
+
+def legacy_to_sharded(path: Path) -> Optional[Path]:
+    """
+    Map a flat-layout path to its sharded location
+
+    Returns:
+        The sharded path, or None if the path is already sharded
+    """
+    path = Path(path)
+    if is_sharded(path):
+        return None
+    return sharded_path(path.parent, path.name)
@@ -4,21 +4,80 @@ Used primarily for platforms that provide separate streams (e.g., Facebook)
 """
 
 import os
+import time
+import errno
+import struct
+import asyncio
 import logging
 import tempfile
 import subprocess
+from collections import deque
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple, List, Callable, AsyncIterator
 
 logger = logging.getLogger(__name__)
 
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# Bytes handed to a FIFO writer thread at a time during streaming merges
+FIFO_BLOCK_SIZE = 1024 * 1024
+
+
+# Containers that support relocating the moov atom
+FASTSTART_EXTENSIONS = {'.mp4', '.m4v', '.mov'}
+
+
+def is_faststart(path: Path) -> Optional[bool]:
+    """
+    Check whether an MP4/MOV file has its moov atom before the media data
+    
+    Only top-level box headers are read, so this is cheap even for large files.
+    
+    Returns:
+        True if moov comes first, False if mdat comes first, None if unknown
+    """
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            size, kind = struct.unpack('>I4s', header)
+            header_size = 8
+            if size == 1:
+                extended = f.read(8)
+                if len(extended) < 8:
+                    return None
+                size = struct.unpack('>Q', extended)[0]
+                header_size = 16
+            if kind == b'moov':
+                return True
+            if kind == b'mdat':
+                return False
+            if size < header_size:
+                # size 0 means "until end of file"; anything else is corrupt
+                return None
+            f.seek(size - header_size, os.SEEK_CUR)
+
+
+def _write_all(fd: int, block: bytes):
+    """Write a whole block to a blocking file descriptor"""
+    view = memoryview(block)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
 class MediaMerger:
     """Handles merging of separate video and audio streams"""
     
-    def __init__(self):
+    def __init__(self, max_processes: int = None, timeout: float = None):
         # Check if ffmpeg is available
         self.ffmpeg_available = self._check_ffmpeg()
         
+        # Bound concurrent ffmpeg processes to the CPU count
+        self.max_processes = max_processes or int(os.getenv('FFMPEG_MAX_PROCESSES', os.cpu_count() or 2))
+        self.timeout = timeout or float(os.getenv('FFMPEG_TIMEOUT', 900))
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        
     def _check_ffmpeg(self) -> bool:
         """Check if ffmpeg is installed and available"""
         try:
@@ -30,8 +89,129 @@ class MediaMerger:
             logger.warning("ffmpeg not found - video/audio merging will not be available")
             return False
     
-    def merge_video_audio(self, video_path: Path, audio_path: Path, 
-                         output_path: Path) -> bool:
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Semaphore limiting concurrent ffmpeg processes (created on first use)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_processes)
+        return self._semaphore
+    
+    def _log_progress(self, label: str) -> ProgressCallback:
+        """Default progress callback: log at most every few seconds"""
+        last_logged = [0.0]
+        
+        def callback(progress: Dict[str, Any]):
+            now = time.monotonic()
+            if progress.get('progress') == 'end' or now - last_logged[0] >= 5:
+                last_logged[0] = now
+                percent = progress.get('percent')
+                position = f"{percent:.0f}%" if percent is not None else f"{progress.get('out_time_s', 0):.1f}s"
+                logger.info(f"ffmpeg {label}: {position} at {progress.get('speed', '?')}")
+        
+        return callback
+    
+    async def run_ffmpeg(self, args: List[str], label: str = "job",
+                         duration: Optional[float] = None,
+                         progress_callback: Optional[ProgressCallback] = None,
+                         timeout: Optional[float] = None,
+                         stdin=None) -> bool:
+        """
+        Run ffmpeg asynchronously inside the bounded process pool
+        
+        Args:
+            args: ffmpeg arguments (inputs, codecs, output)
+            label: Name used in log messages
+            duration: Expected media duration in seconds, used for percentages
+            progress_callback: Called with each parsed `-progress` block
+            timeout: Seconds before the process is killed (default: FFMPEG_TIMEOUT)
+            stdin: Optional stdin for the process (e.g. asyncio.subprocess.PIPE)
+            
+        Returns:
+            bool: True if ffmpeg exited successfully
+            
+        Raises:
+            asyncio.CancelledError: If the caller is cancelled (ffmpeg is killed)
+        """
+        if not self.ffmpeg_available:
+            logger.error("ffmpeg not available - cannot run ffmpeg job")
+            return False
+        
+        cmd = ['ffmpeg', '-hide_banner', '-nostats', '-progress', 'pipe:1', *args]
+        callback = progress_callback or self._log_progress(label)
+        timeout = timeout or self.timeout
+        
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=stdin if stdin is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stderr_tail = deque(maxlen=20)
+            
+            async def read_progress():
+                block = {}
+                async for raw_line in process.stdout:
+                    key, _, value = raw_line.decode('utf-8', 'replace').strip().partition('=')
+                    if not key:
+                        continue
+                    block[key] = value
+                    if key == 'progress':
+                        self._emit_progress(block, duration, callback)
+                        block = {}
+            
+            async def read_stderr():
+                async for raw_line in process.stderr:
+                    stderr_tail.append(raw_line.decode('utf-8', 'replace').rstrip())
+            
+            waiter = asyncio.gather(read_progress(), read_stderr(), process.wait())
+            # Retrieve the outcome even if we stop waiting early (timeout/cancel)
+            waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+            try:
+                await asyncio.wait_for(waiter, timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"ffmpeg {label} timed out after {timeout:.0f}s")
+                await self._kill(process)
+                return False
+            except BaseException:
+                # Cancelled (or failed) - never leave an orphaned ffmpeg behind
+                await self._kill(process)
+                raise
+        
+        if process.returncode != 0:
+            logger.error(f"ffmpeg {label} failed ({process.returncode}): {' | '.join(stderr_tail)}")
+            return False
+        
+        return True
+    
+    def _emit_progress(self, block: Dict[str, str], duration: Optional[float],
+                       callback: ProgressCallback):
+        """Convert a raw `-progress` block and hand it to the callback"""
+        progress = dict(block)
+        out_time_us = block.get('out_time_us') or block.get('out_time_ms')
+        if out_time_us and out_time_us.lstrip('-').isdigit():
+            progress['out_time_s'] = max(int(out_time_us), 0) / 1_000_000
+            if duration:
+                progress['percent'] = min(progress['out_time_s'] / duration * 100, 100.0)
+        try:
+            callback(progress)
+        except Exception as e:
+            logger.debug(f"ffmpeg progress callback failed: {e}")
+    
+    async def _kill(self, process):
+        """Kill an ffmpeg process and reap it"""
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+    
+    async def merge_video_audio(self, video_path: Path, audio_path: Path, 
+                                output_path: Path,
+                                duration: Optional[float] = None,
+                                progress_callback: Optional[ProgressCallback] = None,
+                                timeout: Optional[float] = None) -> bool:
         """
         Merge video and audio files using ffmpeg
         
@@ -39,6 +219,9 @@ class MediaMerger:
             video_path: Path to video file
             audio_path: Path to audio file
             output_path: Path for merged output file
+            duration: Expected duration in seconds (for progress percentages)
+            progress_callback: Called with ffmpeg progress updates
+            timeout: Seconds before the merge is aborted
             
         Returns:
             bool: True if successful, False otherwise
@@ -51,26 +234,23 @@ class MediaMerger:
             # Ensure output directory exists
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Build ffmpeg command
-            cmd = [
-                'ffmpeg',
+            # Build ffmpeg arguments
+            args = [
                 '-i', str(video_path),      # Input video
                 '-i', str(audio_path),      # Input audio
                 '-c:v', 'copy',             # Copy video codec (no re-encoding)
                 '-c:a', 'copy',             # Copy audio codec (no re-encoding)
+                '-movflags', '+faststart',  # moov atom first for instant playback
                 '-y',                       # Overwrite output file
                 str(output_path)
             ]
             
             logger.info(f"Merging video and audio: {video_path.name} + {audio_path.name} -> {output_path.name}")
             
-            # Run ffmpeg
-            result = subprocess.run(cmd, 
-                                  capture_output=True, 
-                                  text=True)
-            
-            if result.returncode != 0:
-                logger.error(f"ffmpeg merge failed: {result.stderr}")
+            if not await self.run_ffmpeg(args, label=f"merge {output_path.name}",
+                                         duration=duration,
+                                         progress_callback=progress_callback,
+                                         timeout=timeout):
                 return False
             
             # Verify output file exists and has content
@@ -81,10 +261,193 @@ class MediaMerger:
                 logger.error("Merge produced empty or missing file")
                 return False
                 
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"Error merging video/audio: {e}")
             return False
     
+    @property
+    def streaming_supported(self) -> bool:
+        """Whether streaming merges (ffmpeg reading from FIFOs) can run here"""
+        return self.ffmpeg_available and hasattr(os, 'mkfifo')
+    
+    async def merge_streams(self, video_chunks: AsyncIterator[bytes],
+                            audio_chunks: AsyncIterator[bytes],
+                            output_path: Path,
+                            duration: Optional[float] = None,
+                            progress_callback: Optional[ProgressCallback] = None,
+                            timeout: Optional[float] = None) -> bool:
+        """
+        Merge video and audio while they are still downloading
+        
+        Both byte streams are pumped into named pipes that ffmpeg reads as
+        its two inputs, so the merged file is produced in a single pass and
+        no intermediate stream files touch the disk. The output is written
+        to a `.part` file and renamed into place only if ffmpeg succeeded and
+        both inputs were delivered completely.
+        
+        Args:
+            video_chunks: Async iterator over the video stream bytes
+            audio_chunks: Async iterator over the audio stream bytes
+            output_path: Path for merged output file
+            duration: Expected duration in seconds (for progress percentages)
+            progress_callback: Called with ffmpeg progress updates
+            timeout: Seconds before the merge is aborted
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not self.streaming_supported:
+            logger.error("Streaming merge not available (needs ffmpeg and FIFO support)")
+            return False
+        
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_output = output_path.with_name(output_path.name + '.part')
+        
+        with tempfile.TemporaryDirectory(prefix='merge_') as fifo_dir:
+            video_fifo = Path(fifo_dir) / 'video'
+            audio_fifo = Path(fifo_dir) / 'audio'
+            os.mkfifo(video_fifo)
+            os.mkfifo(audio_fifo)
+            
+            args = [
+                '-i', str(video_fifo),
+                '-i', str(audio_fifo),
+                '-map', '0:v:0',
+                '-map', '1:a:0',
+                '-c', 'copy',
+                '-movflags', '+faststart',
+                '-f', 'mp4',
+                '-y', str(temp_output)
+            ]
+            
+            logger.info(f"Streaming merge of video and audio -> {output_path.name}")
+            
+            pumps = [
+                asyncio.ensure_future(self._pump_to_fifo(video_chunks, video_fifo)),
+                asyncio.ensure_future(self._pump_to_fifo(audio_chunks, audio_fifo))
+            ]
+            
+            success = False
+            try:
+                success = await self.run_ffmpeg(args, label=f"stream merge {output_path.name}",
+                                                duration=duration,
+                                                progress_callback=progress_callback,
+                                                timeout=timeout)
+            finally:
+                # On success the writers have already closed their pipes;
+                # otherwise stop whatever is still waiting on the network.
+                if success:
+                    await asyncio.wait(pumps, timeout=5)
+                for pump in pumps:
+                    if not pump.done():
+                        pump.cancel()
+                pump_results = await asyncio.gather(*pumps, return_exceptions=True)
+        
+        pump_errors = [r for r in pump_results if isinstance(r, BaseException)]
+        if success and pump_errors:
+            logger.error(f"Streaming merge input failed: {pump_errors[0]!r}")
+            success = False
+        
+        if success and temp_output.exists() and temp_output.stat().st_size > 0:
+            os.replace(temp_output, output_path)
+            logger.info(f"Successfully merged to {output_path} ({output_path.stat().st_size} bytes)")
+            return True
+        
+        if temp_output.exists():
+            temp_output.unlink()
+        return False
+    
+    async def ensure_faststart(self, path: Path, timeout: Optional[float] = None) -> bool:
+        """
+        Relocate the moov atom of an MP4/MOV file to the front
+        
+        Files that already start with moov are left untouched. Otherwise the
+        file is remuxed (no re-encoding) with `-movflags +faststart` in the
+        bounded ffmpeg pool and atomically replaced.
+        
+        Args:
+            path: Video file to optimize in place
+            timeout: Seconds before the remux is aborted
+            
+        Returns:
+            bool: True if the file is (now) faststart, False otherwise
+        """
+        path = Path(path)
+        if path.suffix.lower() not in FASTSTART_EXTENSIONS or not path.exists():
+            return False
+        
+        try:
+            layout = await asyncio.to_thread(is_faststart, path)
+        except OSError as e:
+            logger.error(f"Could not inspect {path}: {e}")
+            return False
+        
+        if layout:
+            return True
+        if layout is None:
+            logger.debug(f"Unrecognized MP4 layout for {path}, skipping faststart")
+            return False
+        
+        temp_output = path.with_name(path.name + '.faststart.part')
+        args = [
+            '-i', str(path),
+            '-map', '0',
+            '-c', 'copy',
+            '-movflags', '+faststart',
+            '-f', 'mp4' if path.suffix.lower() != '.mov' else 'mov',
+            '-y', str(temp_output)
+        ]
+        
+        try:
+            success = await self.run_ffmpeg(args, label=f"faststart {path.name}", timeout=timeout)
+            if success and temp_output.exists() and temp_output.stat().st_size > 0:
+                os.replace(temp_output, path)
+                logger.info(f"Relocated moov atom for faststart playback: {path}")
+                return True
+            return False
+        finally:
+            if temp_output.exists():
+                temp_output.unlink()
+    
+    async def _pump_to_fifo(self, chunks: AsyncIterator[bytes], fifo_path: Path):
+        """Copy an async byte stream into a FIFO read by ffmpeg"""
+        fd = None
+        pending = None
+        try:
+            # Poll for the reader instead of blocking a thread in open()
+            while fd is None:
+                try:
+                    fd = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+                except OSError as e:
+                    if e.errno != errno.ENXIO:
+                        raise
+                    await asyncio.sleep(0.05)
+            os.set_blocking(fd, True)
+            
+            buffer = bytearray()
+            async for chunk in chunks:
+                buffer += chunk
+                if len(buffer) >= FIFO_BLOCK_SIZE:
+                    block, buffer = buffer, bytearray()
+                    pending = asyncio.ensure_future(asyncio.to_thread(_write_all, fd, block))
+                    await asyncio.shield(pending)
+                    pending = None
+            if buffer:
+                pending = asyncio.ensure_future(asyncio.to_thread(_write_all, fd, buffer))
+                await asyncio.shield(pending)
+                pending = None
+        finally:
+            # A writer thread may still be blocked in write(); it fails with
+            # EPIPE once ffmpeg goes away, so wait for it before closing.
+            if pending is not None:
+                await asyncio.wait([pending])
+                if not pending.cancelled():
+                    pending.exception()
+            if fd is not None:
+                os.close(fd)
+    
     def extract_best_streams(self, representations: list) -> Tuple[Optional[Dict], Optional[Dict]]:
         """
         Extract best video and audio streams from Facebook representations
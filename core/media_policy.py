@@ -0,0 +1,71 @@
+"""
+Per-platform media selection policy
+Scrapers report every asset a post exposes, including video covers and
+separate music tracks that the bot never shows; the policy decides which of
+them are worth downloading and archiving
+"""
+
+import os
+import logging
+from typing import Dict, FrozenSet, List
+
+from .data_models import MediaItem, MediaRole
+
+logger = logging.getLogger(__name__)
+
+# Policy name -> media roles that are archived
+POLICIES: Dict[str, FrozenSet[MediaRole]] = {
+    'video_only': frozenset({MediaRole.PRIMARY}),
+    'video_poster': frozenset({MediaRole.PRIMARY, MediaRole.POSTER}),
+    'everything': frozenset(MediaRole),
+}
+
+# Defaults match what _send_success_response links to: the video carries its
+# own audio track and players render their own poster frame.
+# Override per platform with MEDIA_POLICY_<PLATFORM>, e.g. MEDIA_POLICY_TIKTOK=everything
+DEFAULT_POLICIES: Dict[str, str] = {
+    'twitter': 'everything',
+    'facebook': 'video_only',
+    'instagram': 'video_only',
+    'tiktok': 'video_only',
+}
+
+
+def policy_for(platform: str) -> str:
+    """Return the media policy name configured for a platform"""
+    platform = platform.lower()
+    name = os.getenv(f'MEDIA_POLICY_{platform.upper()}', DEFAULT_POLICIES.get(platform, 'everything')).lower()
+    if name not in POLICIES:
+        logger.warning(f"Unknown media policy '{name}' for {platform}, archiving everything")
+        return 'everything'
+    return name
+
+
+def wants_role(platform: str, role: MediaRole) -> bool:
+    """Check whether media with the given role should be archived for a platform"""
+    return role in POLICIES[policy_for(platform)]
+
+
+def select_media(media_items: List[MediaItem], platform: str) -> List[MediaItem]:
+    """
+    Filter a post's media down to what the platform policy archives
+
+    Posters and soundtracks are only dropped next to the primary media they
+    belong to; a post whose only asset is a cover keeps it.
+
+    Args:
+        media_items: Media items as parsed by the scraper
+        platform: Platform name
+
+    Returns:
+        The items to download, in their original order
+    """
+    roles = POLICIES[policy_for(platform)]
+    if not any(item.role == MediaRole.PRIMARY for item in media_items):
+        return list(media_items)
+
+    selected = [item for item in media_items if item.role in roles]
+    skipped = len(media_items) - len(selected)
+    if skipped:
+        logger.debug(f"Media policy for {platform} skipped {skipped} of {len(media_items)} items")
+    return selected
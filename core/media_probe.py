@@ -0,0 +1,191 @@
+"""
+Post-download media probing
+Runs ffprobe on stored files to record their real dimensions, duration,
+codecs and bitrate, which platform APIs report only sometimes. Results are
+cached in the media inventory by content hash
+"""
+
+import os
+import json
+import asyncio
+import logging
+import subprocess
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from .media_inventory import MediaInventory, media_inventory
+
+logger = logging.getLogger(__name__)
+
+# Fields a probe fills in, as named on MediaItem / media_files
+PROBE_FIELDS = ('width', 'height', 'duration', 'video_codec', 'audio_codec', 'bitrate')
+
+
+def _number(value, cast=float):
+    try:
+        return cast(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _rotation(stream: Dict[str, Any]) -> int:
+    """Display rotation of a video stream in degrees (phone videos are often stored sideways)"""
+    rotate = stream.get('tags', {}).get('rotate')
+    if rotate is None:
+        for side_data in stream.get('side_data_list', []):
+            if 'rotation' in side_data:
+                rotate = side_data['rotation']
+                break
+    return abs(_number(rotate, int) or 0) % 180
+
+
+def parse_ffprobe(output: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce `ffprobe -show_format -show_streams` JSON to the fields we store
+
+    Cover art embedded in audio files is reported as a video stream and is
+    ignored.
+    """
+    streams = output.get('streams', [])
+    fmt = output.get('format', {})
+
+    video = next((s for s in streams if s.get('codec_type') == 'video'
+                  and not s.get('disposition', {}).get('attached_pic')), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+
+    probe = {
+        'width': None,
+        'height': None,
+        'duration': _number(fmt.get('duration')),
+        'video_codec': video.get('codec_name') if video else None,
+        'audio_codec': audio.get('codec_name') if audio else None,
+        'bitrate': _number(fmt.get('bit_rate'), int),
+        'container': fmt.get('format_name'),
+    }
+    if video:
+        width, height = video.get('width'), video.get('height')
+        if _rotation(video) == 90:
+            width, height = height, width
+        probe['width'], probe['height'] = width, height
+    return probe
+
+
+class MediaProbe:
+    """Run ffprobe in a bounded pool of processes, caching results by sha256"""
+
+    def __init__(self, inventory: MediaInventory = None, max_processes: int = None, timeout: float = None):
+        self.inventory = inventory or media_inventory
+        self.ffprobe_available = self._check_ffprobe()
+        self.max_processes = max_processes or int(os.getenv('MEDIA_PROBE_MAX_PROCESSES', os.cpu_count() or 2))
+        self.timeout = timeout or float(os.getenv('MEDIA_PROBE_TIMEOUT', 60))
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _check_ffprobe(self) -> bool:
+        """Check if ffprobe is installed and available"""
+        try:
+            result = subprocess.run(['ffprobe', '-version'], capture_output=True, text=True)
+            return result.returncode == 0
+        except FileNotFoundError:
+            logger.warning("ffprobe not found - media metadata will not be probed")
+            return False
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Semaphore limiting concurrent ffprobe processes (created on first use)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_processes)
+        return self._semaphore
+
+    async def _run_ffprobe(self, path: Path) -> Optional[Dict[str, Any]]:
+        cmd = ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', str(path)]
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=self.timeout)
+            except BaseException:
+                # Timed out or cancelled - never leave an orphaned ffprobe behind
+                if process.returncode is None:
+                    try:
+                        process.kill()
+                    except ProcessLookupError:
+                        pass
+                    await process.wait()
+                raise
+
+        if process.returncode != 0:
+            logger.warning(f"ffprobe failed for {path}: {stderr.decode('utf-8', 'replace').strip()}")
+            return None
+        try:
+            return parse_ffprobe(json.loads(stdout))
+        except ValueError as e:
+            logger.warning(f"Unreadable ffprobe output for {path}: {e}")
+            return None
+
+    async def probe(self, path, sha256: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Probe a stored file
+
+        Args:
+            path: Path of the file
+            sha256: Content hash; looked up in the inventory if not given
+
+        Returns:
+            Dict with PROBE_FIELDS (and 'container'), or None if the file
+            could not be probed
+        """
+        path = Path(path)
+        if sha256 is None:
+            record = self.inventory.get(path)
+            sha256 = record['sha256'] if record else None
+
+        if sha256:
+            cached = self.inventory.get_probe(sha256)
+            if cached:
+                return cached
+
+        if not self.ffprobe_available or not path.exists():
+            return None
+
+        try:
+            probe = await self._run_ffprobe(path)
+        except asyncio.TimeoutError:
+            logger.warning(f"ffprobe timed out after {self.timeout:.0f}s for {path}")
+            return None
+        except OSError as e:
+            logger.warning(f"Could not run ffprobe for {path}: {e}")
+            return None
+
+        if probe and sha256:
+            self.inventory.put_probe(sha256, probe)
+        return probe
+
+    async def probe_results(self, results: List[Dict[str, Any]]):
+        """
+        Probe every stored file in a list of download results/media entries
+
+        Each dict with a local_path is updated in place with the probed
+        fields; values the probe could not determine are left as they were.
+        """
+        unique = {id(result): result for result in results if result.get('local_path')}
+        if not unique:
+            return
+
+        probes = await asyncio.gather(
+            *(self.probe(result['local_path'], result.get('sha256')) for result in unique.values()),
+            return_exceptions=True
+        )
+        for result, probe in zip(unique.values(), probes):
+            if isinstance(probe, Exception):
+                logger.warning(f"Probing {result['local_path']} failed: {probe}")
+                continue
+            if probe:
+                result.update({field: probe[field] for field in PROBE_FIELDS if probe.get(field) is not None})
+
+
+# Global instance
+media_probe = MediaProbe()
@@ -0,0 +1,194 @@
+"""
+Tiered storage for archived media
+Moves media older than a cutoff from the local media tree to the cold
+backend (S3/MinIO) and points posts at the new location
+"""
+
+import os
+import logging
+import mimetypes
+from pathlib import Path
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+from .media_inventory import MediaInventory, media_inventory, LOCAL_TIER
+from .storage_backends import StorageBackend, get_cold_backend
+from .exceptions import StorageError
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+TIERING_BATCH_SIZE = 200
+
+
+class MediaTieringJob:
+    """
+    Offload old media to the cold tier
+
+    For each batch of local files indexed before the cutoff:
+      1. upload to the cold backend (multipart, streamed from disk) and
+         verify the stored size,
+      2. rewrite hosted_url in media_files and social_media_posts.media_items
+         in one transaction (local_path stays as the file's identity),
+      3. mark the inventory entry as cold and delete the local copy.
+
+    A failure at any step leaves the local file in place, so the job can be
+    re-run safely. Links that still use the old URL are redirected by
+    services/serve_media.py.
+    """
+
+    def __init__(self, inventory: MediaInventory = None, backend: StorageBackend = None,
+                 older_than: timedelta = None, workers: int = None):
+        self.inventory = inventory or media_inventory
+        self.backend = backend or get_cold_backend()
+        if self.backend is None:
+            raise StorageError("No cold storage backend configured (set S3_BUCKET)")
+        self.older_than = older_than or timedelta(days=float(os.getenv('MEDIA_TIER_AFTER_DAYS', 90)))
+        self.workers = workers or int(os.getenv('MEDIA_TIER_WORKERS', 4))
+        self.db_config = {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'database': os.getenv('DB_NAME', 'social_media_archive'),
+            'user': os.getenv('DB_USER', 'postgres'),
+            'password': os.getenv('DB_PASSWORD'),
+            'port': os.getenv('DB_PORT', '5432')
+        }
+
+    def _key_for(self, path: str) -> Optional[str]:
+        try:
+            return Path(path).relative_to(self.inventory.base_path).as_posix()
+        except ValueError:
+            return None
+
+    def _upload(self, record: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], str]]:
+        """Upload one file, returning (record, remote URL) or None on failure"""
+        path = record['path']
+        key = self._key_for(path)
+        if key is None:
+            logger.warning(f"Skipping {path}: outside the media root")
+            return None
+
+        try:
+            size = os.path.getsize(path)
+            content_type, _ = mimetypes.guess_type(path)
+            remote_url = self.backend.put_file(Path(path), key, content_type=content_type)
+            if self.backend.size(key) != size:
+                logger.error(f"Size mismatch after uploading {path} - keeping local copy")
+                return None
+        except (OSError, StorageError) as e:
+            logger.error(f"Failed to offload {path}: {e}")
+            return None
+        except Exception as e:
+            # One bad upload must not abort the whole run
+            logger.error(f"Unexpected error offloading {path}: {type(e).__name__}: {e}")
+            return None
+
+        return record, remote_url
+
+    def _rewrite_urls(self, conn, moves: List[Tuple[str, str]]) -> Tuple[int, int]:
+        """Point media_files rows and media_items entries at the cold-tier URLs"""
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS tier_moves (
+                local_path TEXT PRIMARY KEY,
+                hosted_url TEXT NOT NULL
+            ) ON COMMIT DELETE ROWS;
+        """)
+        execute_values(cursor, "INSERT INTO tier_moves VALUES %s ON CONFLICT DO NOTHING", moves)
+
+        cursor.execute("""
+            UPDATE media_files AS m SET hosted_url = t.hosted_url
+            FROM tier_moves t
+            WHERE m.local_path = t.local_path;
+        """)
+        media_files_updated = cursor.rowcount
+
+        cursor.execute("""
+            UPDATE social_media_posts AS p SET media_items = (
+                SELECT jsonb_agg(
+                    CASE WHEN t.local_path IS NULL THEN e.item
+                    ELSE e.item || jsonb_build_object('hosted_url', t.hosted_url)
+                    END ORDER BY e.ord)
+                FROM jsonb_array_elements(p.media_items) WITH ORDINALITY AS e(item, ord)
+                LEFT JOIN tier_moves t ON t.local_path = e.item->>'local_path'
+            )
+            WHERE jsonb_typeof(p.media_items) = 'array'
+              AND EXISTS (
+                SELECT 1
+                FROM jsonb_array_elements(p.media_items) AS e(item)
+                JOIN tier_moves t ON t.local_path = e.item->>'local_path'
+            );
+        """)
+        posts_updated = cursor.rowcount
+
+        conn.commit()
+        cursor.close()
+        return media_files_updated, posts_updated
+
+    def run(self, dry_run: bool = False, limit: int = None) -> Dict[str, Any]:
+        """
+        Offload every local file older than the cutoff
+
+        Args:
+            dry_run: Only count the files and bytes that would move
+            limit: Stop after this many files
+
+        Returns:
+            Report dict with file, byte and database row counts
+        """
+        cutoff = (datetime.utcnow() - self.older_than).strftime('%Y-%m-%d %H:%M:%S')
+        report = {
+            'dry_run': dry_run,
+            'backend': self.backend.name,
+            'files': 0,
+            'bytes': 0,
+            'failed': 0,
+            'media_files_updated': 0,
+            'posts_updated': 0
+        }
+
+        conn = None if dry_run else psycopg2.connect(**self.db_config)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for batch in self.inventory.iter_records(LOCAL_TIER, cutoff, TIERING_BATCH_SIZE):
+                    if limit is not None:
+                        batch = batch[:limit - report['files'] - report['failed']]
+                    if not batch:
+                        break
+
+                    if dry_run:
+                        report['files'] += len(batch)
+                        report['bytes'] += sum(record['size'] for record in batch)
+                        continue
+
+                    uploaded = [result for result in pool.map(self._upload, batch) if result]
+                    report['failed'] += len(batch) - len(uploaded)
+                    if not uploaded:
+                        continue
+
+                    # Database first: if this fails the local files are untouched
+                    media_files_updated, posts_updated = self._rewrite_urls(
+                        conn, [(record['path'], url) for record, url in uploaded]
+                    )
+                    report['media_files_updated'] += media_files_updated
+                    report['posts_updated'] += posts_updated
+
+                    for record, url in uploaded:
+                        self.inventory.set_tier(record['path'], self.backend.name, url)
+                        try:
+                            os.unlink(record['path'])
+                        except FileNotFoundError:
+                            pass
+                        report['files'] += 1
+                        report['bytes'] += record['size']
+
+                    logger.info(f"Offloaded {report['files']} files ({report['bytes']} bytes) so far")
+        finally:
+            if conn is not None:
+                conn.close()
+
+        return report
@@ -0,0 +1,431 @@
+"""
+Background transcoding of archived media into space-efficient derivatives
+Profiles are declared below and enabled with MEDIA_TRANSCODE_PROFILES; jobs
+run niced, on a fixed number of workers, inside an off-peak window. By
+default only lossless profiles run and no original is ever deleted
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+import subprocess
+from pathlib import Path
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+from .media_inventory import MediaInventory, media_inventory, LOCAL_TIER
+from .quality_policy import EVIDENCE_HASHTAGS
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+TRANSCODE_BATCH_SIZE = 50
+
+# Files younger than this may still be in use by a download or merge
+MIN_FILE_AGE = timedelta(hours=1)
+
+# Lossy profiles (hevc, av1) are opt-in
+DEFAULT_PROFILES = 'jpeg_lossless,png_lossless'
+
+
+@dataclass
+class TranscodeProfile:
+    """
+    A derivative to produce from archived media
+
+    `command` is an argv template; {input}, {output} and {threads} are
+    substituted per file. Lossless profiles replace the original in place.
+    Lossy profiles write the derivative next to the original as
+    <stem>.<profile><output_extension>; they only replace it when
+    MEDIA_KEEP_ORIGINALS=false and `keep_original` is not set. Media of
+    evidence posts is never replaced (see MediaTranscoder._evidence_paths).
+    """
+    name: str
+    media_types: Tuple[str, ...]
+    extensions: Tuple[str, ...]
+    command: List[str]
+    output_extension: str
+    lossless: bool = False
+    keep_original: bool = False
+    # Derivatives that save less than this fraction are discarded
+    min_savings: float = 0.1
+
+    @property
+    def tool(self) -> str:
+        return self.command[0]
+
+    @property
+    def available(self) -> bool:
+        return shutil.which(self.tool) is not None
+
+    def keeps_original(self) -> bool:
+        if self.lossless:
+            return False
+        return self.keep_original or os.getenv('MEDIA_KEEP_ORIGINALS', 'true').lower() != 'false'
+
+    def applies_to(self, record: Dict[str, Any]) -> bool:
+        return (record['media_type'] in self.media_types and
+                Path(record['path']).suffix.lower() in self.extensions and
+                not is_derivative(Path(record['path'])))
+
+    def derivative_path(self, source: Path, keep_original: bool) -> Path:
+        if not keep_original:
+            return source
+        return source.with_name(f"{source.stem}.{self.name}{self.output_extension}")
+
+    def build_command(self, source: Path, output: Path, threads: int) -> List[str]:
+        values = {'input': str(source), 'output': str(output), 'threads': str(threads)}
+        return [arg.format(**values) for arg in self.command]
+
+
+FFMPEG_ARGS = ['ffmpeg', '-hide_banner', '-nostats', '-loglevel', 'error', '-y', '-i', '{input}', '-map', '0']
+
+PROFILES: Dict[str, TranscodeProfile] = {
+    # H.265 mezzanine for videos and GIF-as-MP4
+    'hevc': TranscodeProfile(
+        name='hevc',
+        media_types=('videos', 'images'),
+        extensions=('.mp4', '.m4v', '.mov'),
+        command=FFMPEG_ARGS + ['-c:v', 'libx265', '-crf', '26', '-preset', 'medium', '-tag:v', 'hvc1',
+                               '-c:a', 'copy', '-threads', '{threads}', '-movflags', '+faststart',
+                               '-f', 'mp4', '{output}'],
+        output_extension='.mp4',
+        min_savings=0.2
+    ),
+    # AV1 mezzanine: smaller than HEVC but much slower to encode
+    'av1': TranscodeProfile(
+        name='av1',
+        media_types=('videos', 'images'),
+        extensions=('.mp4', '.m4v', '.mov'),
+        command=FFMPEG_ARGS + ['-c:v', 'libsvtav1', '-crf', '35', '-preset', '8',
+                               '-c:a', 'copy', '-threads', '{threads}', '-movflags', '+faststart',
+                               '-f', 'mp4', '{output}'],
+        output_extension='.mp4',
+        min_savings=0.2
+    ),
+    # Lossless JPEG optimisation (Huffman tables + progressive), metadata kept
+    'jpeg_lossless': TranscodeProfile(
+        name='jpeg_lossless',
+        media_types=('images',),
+        extensions=('.jpg', '.jpeg'),
+        command=['jpegtran', '-copy', 'all', '-optimize', '-progressive', '-outfile', '{output}', '{input}'],
+        output_extension='.jpg',
+        lossless=True,
+        min_savings=0.01
+    ),
+    # Lossless PNG recompression (metadata kept: it may matter as evidence)
+    'png_lossless': TranscodeProfile(
+        name='png_lossless',
+        media_types=('images',),
+        extensions=('.png',),
+        command=['oxipng', '-o', '4', '--threads', '{threads}', '--out', '{output}', '{input}'],
+        output_extension='.png',
+        lossless=True,
+        min_savings=0.01
+    ),
+}
+
+
+def is_derivative(path: Path) -> bool:
+    """Whether a file is a kept-alongside derivative (<stem>.<profile>.<ext>)"""
+    return any(path.name.endswith(f".{name}{profile.output_extension}") for name, profile in PROFILES.items())
+
+
+def active_profiles() -> List[TranscodeProfile]:
+    """Profiles enabled with MEDIA_TRANSCODE_PROFILES"""
+    names = os.getenv('MEDIA_TRANSCODE_PROFILES', DEFAULT_PROFILES)
+    profiles = []
+    for name in (n.strip() for n in names.split(',')):
+        if not name:
+            continue
+        if name not in PROFILES:
+            logger.warning(f"Unknown transcode profile: {name}")
+            continue
+        profiles.append(PROFILES[name])
+    return profiles
+
+
+def in_window(window: str, now: datetime = None) -> bool:
+    """
+    Check whether the local time is inside an "HH:MM-HH:MM" window
+
+    Windows may wrap midnight ("22:00-06:00"). An empty window means always.
+    """
+    if not window:
+        return True
+    now = (now or datetime.now()).time()
+    start_str, _, end_str = window.partition('-')
+    start = datetime.strptime(start_str.strip(), '%H:%M').time()
+    end = datetime.strptime(end_str.strip(), '%H:%M').time()
+    if start <= end:
+        return start <= now < end
+    return now >= start or now < end
+
+
+def niced(command: List[str]) -> List[str]:
+    """Prefix a command to run at the lowest CPU priority (no preexec_fn: unsafe in threads)"""
+    if shutil.which('nice'):
+        return ['nice', '-n', '19'] + command
+    return command
+
+
+def file_sha256(path: Path) -> str:
+    """Content hash of a file, as stored in the media inventory"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class MediaTranscoder:
+    """
+    Produces derivatives for archived media according to the active profiles
+
+    Work comes from the media inventory (local tier only); results, including
+    per-file savings, are recorded in the media_derivatives table, which is
+    also how already-processed files are skipped. CPU use is bounded by the
+    worker count and threads per job, and every tool runs at nice 19.
+    Media of evidence posts keeps its original bytes.
+    """
+
+    def __init__(self, inventory: MediaInventory = None, profiles: List[TranscodeProfile] = None,
+                 workers: int = None, threads: int = None, window: str = None, timeout: float = None):
+        self.inventory = inventory or media_inventory
+        requested = profiles if profiles is not None else active_profiles()
+        for profile in requested:
+            if not profile.available:
+                logger.warning(f"Transcode profile {profile.name} disabled: {profile.tool} not installed")
+        self.profiles = [profile for profile in requested if profile.available]
+
+        # Default budget: a quarter of the machine
+        self.workers = workers or int(os.getenv('MEDIA_TRANSCODE_WORKERS', max(1, (os.cpu_count() or 4) // 4)))
+        self.threads = threads or int(os.getenv('MEDIA_TRANSCODE_THREADS', 2))
+        self.window = window if window is not None else os.getenv('MEDIA_TRANSCODE_WINDOW', '01:00-06:00')
+        self.timeout = timeout or float(os.getenv('MEDIA_TRANSCODE_TIMEOUT', 3600))
+        self.db_config = {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'database': os.getenv('DB_NAME', 'social_media_archive'),
+            'user': os.getenv('DB_USER', 'postgres'),
+            'password': os.getenv('DB_PASSWORD'),
+            'port': os.getenv('DB_PORT', '5432')
+        }
+
+    def _processed(self, conn, profile: TranscodeProfile, paths: List[str]) -> set:
+        """Paths in `paths` already handled by `profile` (or that are derivatives)"""
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT source_path FROM media_derivatives
+                WHERE profile = %s AND source_path = ANY(%s)
+                UNION
+                SELECT derivative_path FROM media_derivatives
+                WHERE derivative_path = ANY(%s)
+            """, (profile.name, paths, paths))
+            return {row[0] for row in cursor.fetchall()}
+
+    def _evidence_paths(self, conn, paths: List[str]) -> set:
+        """Paths in `paths` that belong to posts flagged as evidence by their user hashtags"""
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT m.local_path FROM media_files m
+                JOIN social_media_posts p ON p.platform = m.platform AND p.id = m.post_id
+                WHERE m.local_path = ANY(%s)
+                  AND EXISTS (SELECT 1 FROM unnest(p.user_hashtags) tag WHERE lower(tag) = ANY(%s))
+            """, (paths, list(EVIDENCE_HASHTAGS)))
+            return {row[0] for row in cursor.fetchall()}
+
+    def _transcode(self, record: Dict[str, Any], profile: TranscodeProfile,
+                   evidence: bool = False) -> Dict[str, Any]:
+        """Run one profile on one file (in a worker thread)"""
+        source = Path(record['path'])
+        keep_original = evidence or profile.keeps_original()
+        target = profile.derivative_path(source, keep_original)
+        temp_output = target.with_name(f".{target.name}.{profile.name}.part")
+        result = {
+            'source_path': str(source),
+            'profile': profile.name,
+            'derivative_path': None,
+            'original_size': record['size'],
+            'derivative_size': None,
+            'sha256': None,
+            'kept_original': keep_original,
+            'status': 'failed'
+        }
+
+        if evidence and profile.lossless:
+            # A lossless copy next to the original would only cost space
+            result['status'] = 'skipped'
+            return result
+
+        try:
+            original_size = source.stat().st_size
+            result['original_size'] = original_size
+            completed = subprocess.run(
+                niced(profile.build_command(source, temp_output, self.threads)),
+                capture_output=True, timeout=self.timeout
+            )
+            if completed.returncode != 0 or not temp_output.exists():
+                stderr = completed.stderr.decode('utf-8', 'replace').strip()[-500:]
+                logger.error(f"{profile.name} failed for {source.name}: {stderr}")
+                return result
+
+            derivative_size = temp_output.stat().st_size
+            result['derivative_size'] = derivative_size
+            if derivative_size <= 0 or derivative_size > original_size * (1 - profile.min_savings):
+                # Not worth it - remember so the file is not retried
+                result['status'] = 'skipped'
+                return result
+
+            result['sha256'] = file_sha256(temp_output)
+            os.replace(temp_output, target)
+            result['derivative_path'] = str(target)
+            result['status'] = 'success'
+            return result
+
+        except subprocess.TimeoutExpired:
+            logger.error(f"{profile.name} timed out for {source.name}")
+            return result
+        except OSError as e:
+            logger.error(f"{profile.name} failed for {source.name}: {e}")
+            return result
+        finally:
+            if temp_output.exists():
+                temp_output.unlink()
+
+    def _record_results(self, conn, results: List[Dict[str, Any]]):
+        """Store derivative rows and update sizes of files replaced in place (media_files and media_items)"""
+        with conn.cursor() as cursor:
+            execute_values(cursor, """
+                INSERT INTO media_derivatives
+                    (source_path, profile, derivative_path, original_size, derivative_size, kept_original, status)
+                VALUES %s
+                ON CONFLICT (source_path, profile) DO UPDATE SET
+                    derivative_path = EXCLUDED.derivative_path,
+                    original_size = EXCLUDED.original_size,
+                    derivative_size = EXCLUDED.derivative_size,
+                    kept_original = EXCLUDED.kept_original,
+                    status = EXCLUDED.status,
+                    created_at = NOW()
+            """, [
+                (r['source_path'], r['profile'], r['derivative_path'], r['original_size'],
+                 r['derivative_size'], r['kept_original'], r['status'])
+                for r in results
+            ])
+
+            replaced = [(r['source_path'], r['derivative_size']) for r in results
+                        if r['status'] == 'success' and not r['kept_original']]
+            if replaced:
+                cursor.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS transcoded_sizes (
+                        local_path TEXT PRIMARY KEY,
+                        file_size BIGINT
+                    ) ON COMMIT DELETE ROWS;
+                """)
+                execute_values(cursor, "INSERT INTO transcoded_sizes VALUES %s ON CONFLICT DO NOTHING", replaced)
+                cursor.execute("""
+                    UPDATE media_files AS m SET file_size = t.file_size
+                    FROM transcoded_sizes t
+                    WHERE m.local_path = t.local_path;
+                """)
+                cursor.execute("""
+                    UPDATE social_media_posts AS p SET media_items = (
+                        SELECT jsonb_agg(
+                            CASE WHEN t.local_path IS NULL THEN e.item
+                            ELSE e.item || jsonb_build_object('file_size', t.file_size)
+                            END ORDER BY e.ord)
+                        FROM jsonb_array_elements(p.media_items) WITH ORDINALITY AS e(item, ord)
+                        LEFT JOIN transcoded_sizes t ON t.local_path = e.item->>'local_path'
+                    )
+                    WHERE jsonb_typeof(p.media_items) = 'array'
+                      AND EXISTS (
+                        SELECT 1
+                        FROM jsonb_array_elements(p.media_items) AS e(item)
+                        JOIN transcoded_sizes t ON t.local_path = e.item->>'local_path'
+                    );
+                """)
+        conn.commit()
+
+    def _update_inventory(self, record: Dict[str, Any], result: Dict[str, Any]):
+        if result['status'] != 'success':
+            return
+        if result['kept_original']:
+            self.inventory.add(result['derivative_path'], result['derivative_size'],
+                               record['media_type'], record['platform'], result['sha256'])
+        else:
+            # New content, new hash: cached probes of the old file no longer apply
+            self.inventory.add(record['path'], result['derivative_size'],
+                               record['media_type'], record['platform'], result['sha256'])
+
+    def run(self, dry_run: bool = False, ignore_window: bool = False, limit: int = None) -> Dict[str, Any]:
+        """
+        Transcode eligible files until the work or the off-peak window runs out
+
+        Args:
+            dry_run: Only count eligible files
+            ignore_window: Run even outside MEDIA_TRANSCODE_WINDOW
+            limit: Stop after this many files
+
+        Returns:
+            Report dict with per-profile counts and bytes saved
+        """
+        report = {
+            'dry_run': dry_run,
+            'profiles': {p.name: {'eligible': 0, 'success': 0, 'skipped': 0, 'failed': 0, 'bytes_saved': 0}
+                         for p in self.profiles},
+            'bytes_saved': 0,
+            'stopped_by_window': False
+        }
+        if not self.profiles:
+            logger.warning("No transcode profiles available")
+            return report
+
+        cutoff = (datetime.utcnow() - MIN_FILE_AGE).strftime('%Y-%m-%d %H:%M:%S')
+        processed_files = 0
+        conn = psycopg2.connect(**self.db_config)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for batch in self.inventory.iter_records(LOCAL_TIER, cutoff, TRANSCODE_BATCH_SIZE):
+                    if not ignore_window and not dry_run and not in_window(self.window):
+                        logger.info(f"Outside transcode window {self.window} - stopping")
+                        report['stopped_by_window'] = True
+                        break
+                    if limit is not None and processed_files >= limit:
+                        break
+
+                    for profile in self.profiles:
+                        candidates = [r for r in batch if profile.applies_to(r)]
+                        if not candidates:
+                            continue
+                        done = self._processed(conn, profile, [r['path'] for r in candidates])
+                        candidates = [r for r in candidates if r['path'] not in done]
+                        if limit is not None:
+                            candidates = candidates[:max(limit - processed_files, 0)]
+                        profile_report = report['profiles'][profile.name]
+                        profile_report['eligible'] += len(candidates)
+                        if dry_run or not candidates:
+                            continue
+
+                        evidence = self._evidence_paths(conn, [r['path'] for r in candidates])
+                        results = list(pool.map(
+                            lambda r: self._transcode(r, profile, r['path'] in evidence), candidates
+                        ))
+                        self._record_results(conn, results)
+                        for record, result in zip(candidates, results):
+                            self._update_inventory(record, result)
+                            profile_report[result['status']] += 1
+                            if result['status'] == 'success' and not result['kept_original']:
+                                saved = result['original_size'] - result['derivative_size']
+                                profile_report['bytes_saved'] += saved
+                                report['bytes_saved'] += saved
+                        processed_files += len(candidates)
+        finally:
+            conn.close()
+
+        return report
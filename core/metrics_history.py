@@ -0,0 +1,119 @@
+"""
+Engagement metrics history
+Every archive of a post appends its PostMetrics to post_metrics_history
+(monthly partitions, see create_unified_schema.sql), so re-scrapes record
+how a post spread instead of overwriting the previous numbers
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .db_pool import ConnectionPool
+from .partitions import ensure_partitions
+from .post_rows import METRICS_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Everything after (platform, post_id)
+_VALUE_COLUMNS = ', '.join(METRICS_COLUMNS[2:])
+
+
+class MetricsHistory:
+    """Read access to post_metrics_history (writes go through the post writers)"""
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    def ensure_partitions(self):
+        """Create the upcoming partitions, once a month per process (see core/partitions.py)"""
+        ensure_partitions(self.pool)
+
+    @staticmethod
+    def _as_dict(row) -> Dict[str, Any]:
+        return dict(zip(METRICS_COLUMNS[2:], row))
+
+    def latest(self, post_id: str, platform: str) -> Optional[Dict[str, Any]]:
+        """Most recent observation of a post's metrics, or None"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT {_VALUE_COLUMNS} FROM post_metrics_history
+                    WHERE platform = %s AND post_id = %s
+                    ORDER BY observed_at DESC
+                    LIMIT 1
+                """, (platform, post_id))
+                row = cursor.fetchone()
+        return self._as_dict(row) if row else None
+
+    def latest_many(self, posts: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        Most recent observation for each of several posts (posts without history are omitted)
+
+        Args:
+            posts: (platform, post_id) pairs
+
+        Returns:
+            Metrics keyed by (platform, post_id)
+        """
+        posts = list(posts)
+        if not posts:
+            return {}
+        platforms, post_ids = (list(values) for values in zip(*posts))
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT DISTINCT ON (platform, post_id) platform, post_id, {_VALUE_COLUMNS}
+                    FROM post_metrics_history
+                    WHERE (platform, post_id) IN (
+                        SELECT * FROM unnest(%s::VARCHAR[], %s::VARCHAR[])
+                    )
+                    ORDER BY platform, post_id, observed_at DESC
+                """, (platforms, post_ids))
+                rows = cursor.fetchall()
+        return {(row[0], row[1]): self._as_dict(row[2:]) for row in rows}
+
+    def series(self, post_id: str, platform: str, since: datetime = None, until: datetime = None,
+               bucket: str = None) -> List[Dict[str, Any]]:
+        """
+        Metrics of a post over time, oldest first
+
+        Args:
+            post_id, platform: The post
+            since, until: Optional time range (inclusive start, exclusive end)
+            bucket: Optional date_trunc unit ('hour', 'day', ...); the last
+                observation in each bucket is returned
+        """
+        conditions = ["platform = %s", "post_id = %s"]
+        params: List[Any] = [platform, post_id]
+        if since is not None:
+            conditions.append("observed_at >= %s")
+            params.append(since)
+        if until is not None:
+            conditions.append("observed_at < %s")
+            params.append(until)
+        where = ' AND '.join(conditions)
+
+        if bucket:
+            query = f"""
+                SELECT {_VALUE_COLUMNS} FROM (
+                    SELECT DISTINCT ON (date_trunc(%s, observed_at)) {_VALUE_COLUMNS}
+                    FROM post_metrics_history
+                    WHERE {where}
+                    ORDER BY date_trunc(%s, observed_at), observed_at DESC
+                ) buckets
+                ORDER BY observed_at
+            """
+            params = [bucket] + params + [bucket]
+        else:
+            query = f"""
+                SELECT {_VALUE_COLUMNS} FROM post_metrics_history
+                WHERE {where}
+                ORDER BY observed_at
+            """
+
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+        return [self._as_dict(row) for row in rows]
@@ -0,0 +1,49 @@
+"""
+Partition maintenance
+social_media_posts (by platform, then by year of created_at) and
+post_metrics_history (by month) get their upcoming partitions from
+plpgsql functions in create_unified_schema.sql. Writers run
+ENSURE_PARTITIONS_SQL once a month per process, so a new period never
+starts without its partition
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+from .db_pool import ConnectionPool
+
+# How far ahead partitions are kept created
+METRICS_MONTHS_AHEAD = 1
+POST_YEARS_AHEAD = 1
+
+ENSURE_PARTITIONS_SQL = (
+    f"SELECT ensure_metrics_history_partitions({METRICS_MONTHS_AHEAD}), "
+    f"ensure_post_partitions({POST_YEARS_AHEAD})"
+)
+
+_ensured_month: Optional[str] = None
+
+
+def _current_month() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m')
+
+
+def partitions_due() -> bool:
+    """Whether this process still has to create this month's partitions"""
+    return _ensured_month != _current_month()
+
+
+def partitions_ensured():
+    """Record that ENSURE_PARTITIONS_SQL ran (and committed) this month"""
+    global _ensured_month
+    _ensured_month = _current_month()
+
+
+def ensure_partitions(pool: ConnectionPool):
+    """Create the upcoming partitions, once a month per process"""
+    if not partitions_due():
+        return
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(ENSURE_PARTITIONS_SQL)
+    partitions_ensured()
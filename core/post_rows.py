@@ -0,0 +1,331 @@
+"""
+Row builders for the unified schema
+Every writer (DatabaseStorage, UnifiedStorageManager, the Twitter
+StorageManager, the archive importer) stores a post as one
+social_media_posts row plus one media_files row per stored asset, built
+here so all entry points write the same data. Live saves also append a
+post_metrics_history row
+"""
+
+import json
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Sequence
+
+from .data_models import SocialMediaPost
+from .language import detect_language
+from .url_normalizer import asset_key
+
+
+def convert_datetime_to_str(obj):
+    """Recursively convert datetime objects to ISO format strings"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    elif isinstance(obj, dict):
+        return {k: convert_datetime_to_str(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_datetime_to_str(item) for item in obj]
+    return obj
+
+
+POST_COLUMNS = (
+    'id', 'platform', 'url', 'content', 'language',
+    'author_username', 'author_display_name', 'author_id',
+    'author_followers', 'author_verified', 'author_profile_url', 'author_avatar_url',
+    'created_at', 'scraped_at',
+    'metrics', 'media_items',
+    'scraped_hashtags', 'user_hashtags',
+    'telegram_user_id', 'telegram_username', 'telegram_first_name', 'telegram_last_name',
+    'raw_data', 'content_hashes'
+)
+# social_media_posts is partitioned by platform and created_at, so its
+# unique key (and the upsert conflict target) has to include both;
+# created_at may be NULL, the index treats NULLs as equal. A post is still
+# identified by (platform, id): writers keep the created_at it was first
+# stored with (see STORED_CREATED_AT_SQL and POST_STAGING_SQL)
+POST_KEY = ('platform', 'id', 'created_at')
+POST_IDENTITY = ('platform', 'id')
+JSON_COLUMNS = {'metrics', 'media_items', 'raw_data', 'content_hashes'}
+
+# Columns refreshed when a post is archived again; their hashes are stored
+# in content_hashes so an identical re-archive leaves the row untouched
+# (no trigger, no TOAST rewrite, no dead tuple)
+CONTENT_FIELDS = ('metrics', 'media_items', 'user_hashtags', 'raw_data')
+
+POST_UPDATE_SQL = """
+    scraped_at = EXCLUDED.scraped_at,
+    metrics = EXCLUDED.metrics,
+    media_items = EXCLUDED.media_items,
+    user_hashtags = EXCLUDED.user_hashtags,
+    raw_data = EXCLUDED.raw_data,
+    content_hashes = EXCLUDED.content_hashes
+WHERE social_media_posts.content_hashes IS DISTINCT FROM EXCLUDED.content_hashes
+"""
+
+MEDIA_COLUMNS = (
+    'post_id', 'platform', 'media_type', 'original_url',
+    'local_path', 'hosted_url', 'width', 'height', 'duration',
+    'file_size', 'mime_type', 'download_status', 'download_error', 'downloaded_at',
+    'faststart', 'etag', 'last_modified', 'content_length', 'asset_key',
+    'video_codec', 'audio_codec', 'bitrate'
+)
+MEDIA_KEY = ('post_id', 'asset_key')
+
+# Probed and validator values are only replaced by known ones, and rows
+# whose values would not change are skipped
+MEDIA_UPDATE_SQL = """
+    original_url = EXCLUDED.original_url,
+    local_path = EXCLUDED.local_path,
+    hosted_url = EXCLUDED.hosted_url,
+    width = COALESCE(EXCLUDED.width, media_files.width),
+    height = COALESCE(EXCLUDED.height, media_files.height),
+    duration = COALESCE(EXCLUDED.duration, media_files.duration),
+    video_codec = COALESCE(EXCLUDED.video_codec, media_files.video_codec),
+    audio_codec = COALESCE(EXCLUDED.audio_codec, media_files.audio_codec),
+    bitrate = COALESCE(EXCLUDED.bitrate, media_files.bitrate),
+    file_size = EXCLUDED.file_size,
+    mime_type = EXCLUDED.mime_type,
+    download_status = EXCLUDED.download_status,
+    download_error = EXCLUDED.download_error,
+    downloaded_at = EXCLUDED.downloaded_at,
+    faststart = media_files.faststart OR EXCLUDED.faststart,
+    etag = COALESCE(EXCLUDED.etag, media_files.etag),
+    last_modified = COALESCE(EXCLUDED.last_modified, media_files.last_modified),
+    content_length = COALESCE(EXCLUDED.content_length, media_files.content_length)
+WHERE (
+    EXCLUDED.original_url, EXCLUDED.local_path, EXCLUDED.hosted_url,
+    COALESCE(EXCLUDED.width, media_files.width),
+    COALESCE(EXCLUDED.height, media_files.height),
+    COALESCE(EXCLUDED.duration, media_files.duration),
+    COALESCE(EXCLUDED.video_codec, media_files.video_codec),
+    COALESCE(EXCLUDED.audio_codec, media_files.audio_codec),
+    COALESCE(EXCLUDED.bitrate, media_files.bitrate),
+    EXCLUDED.file_size, EXCLUDED.mime_type, EXCLUDED.download_status, EXCLUDED.download_error,
+    media_files.faststart OR EXCLUDED.faststart,
+    COALESCE(EXCLUDED.etag, media_files.etag),
+    COALESCE(EXCLUDED.last_modified, media_files.last_modified),
+    COALESCE(EXCLUDED.content_length, media_files.content_length)
+) IS DISTINCT FROM (
+    media_files.original_url, media_files.local_path, media_files.hosted_url,
+    media_files.width, media_files.height, media_files.duration,
+    media_files.video_codec, media_files.audio_codec, media_files.bitrate,
+    media_files.file_size, media_files.mime_type, media_files.download_status, media_files.download_error,
+    media_files.faststart, media_files.etag, media_files.last_modified, media_files.content_length
+)
+"""
+
+# Keyed by (platform, id) like the posts themselves: numeric ids repeat across platforms
+METRICS_COLUMNS = ('platform', 'post_id', 'observed_at', 'likes', 'shares', 'comments', 'views', 'saves')
+METRICS_KEY = ('platform', 'post_id', 'observed_at')
+
+# Append-only: history rows are never updated
+METRICS_INSERT = f"""
+    INSERT INTO post_metrics_history ({', '.join(METRICS_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(METRICS_COLUMNS))})
+    ON CONFLICT ({', '.join(METRICS_KEY)}) DO NOTHING
+"""
+
+
+def upsert_sql(table: str, columns, key, update_sql: str) -> str:
+    """Single-row INSERT ... ON CONFLICT statement (%s placeholders, for psycopg2 and psycopg 3)"""
+    return f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        VALUES ({', '.join(['%s'] * len(columns))})
+        ON CONFLICT ({', '.join(key)}) DO UPDATE SET {update_sql}
+    """
+
+
+# The stored created_at of a post if there is one, else the scraped one
+# (parameters: platform, id, created_at)
+STORED_CREATED_AT_SQL = """(
+    SELECT created_at FROM (
+        SELECT created_at, 0 AS preference FROM social_media_posts WHERE platform = %s AND id = %s
+        UNION ALL
+        SELECT %s::TIMESTAMPTZ, 1
+    ) candidates
+    ORDER BY preference
+    LIMIT 1
+)"""
+
+# Same for bulk_upsert's staging table (see UpsertTarget.staging_sql)
+POST_STAGING_SQL = """
+    UPDATE {staging} AS s SET created_at = p.created_at
+    FROM social_media_posts AS p
+    WHERE p.platform = s.platform AND p.id = s.id
+      AND p.created_at IS DISTINCT FROM s.created_at
+"""
+
+_CREATED_AT = POST_COLUMNS.index('created_at')
+
+POST_UPSERT = f"""
+    INSERT INTO social_media_posts ({', '.join(POST_COLUMNS)})
+    VALUES ({', '.join(STORED_CREATED_AT_SQL if column == 'created_at' else '%s' for column in POST_COLUMNS)})
+    ON CONFLICT ({', '.join(POST_KEY)}) DO UPDATE SET {POST_UPDATE_SQL}
+"""
+MEDIA_UPSERT = upsert_sql('media_files', MEDIA_COLUMNS, MEDIA_KEY, MEDIA_UPDATE_SQL)
+
+
+def post_upsert_params(row: Sequence[Any]) -> List[Any]:
+    """Parameters of POST_UPSERT for a post_row() (values may be adapted for the driver)"""
+    row = list(row)
+    identity = [row[POST_COLUMNS.index('platform')], row[POST_COLUMNS.index('id')]]
+    return row[:_CREATED_AT] + identity + row[_CREATED_AT:]
+
+
+def content_hash(value: Any) -> str:
+    """Short stable hash of a JSON-serializable value"""
+    encoded = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+def hashable_content(value: Any) -> Any:
+    """
+    Copy of a content value with every URL replaced by its asset key
+
+    Signed CDN URLs (Instagram, Facebook, TikTok) carry signature and
+    expiry parameters that change on every fetch; hashing them would make
+    each re-archive look like a content change. Only the hash input is
+    normalized - the stored columns keep the URLs as scraped.
+    """
+    if isinstance(value, str):
+        return asset_key(value) if value.startswith(('http://', 'https://')) else value
+    if isinstance(value, dict):
+        return {key: hashable_content(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [hashable_content(item) for item in value]
+    return value
+
+
+def changed_fields(previous: Dict[str, str], current: Dict[str, str]) -> List[str]:
+    """Content fields whose hashes differ between two content_hashes values"""
+    previous = previous or {}
+    return [field for field in CONTENT_FIELDS if previous.get(field) != current.get(field)]
+
+
+def post_row(post: SocialMediaPost) -> tuple:
+    """Build a social_media_posts row (in POST_COLUMNS order) for a post"""
+    # Prepare media items for JSON storage
+    media_items = []
+    for media in post.media:
+        media_items.append({
+            'url': media.url,
+            'type': media.media_type.value,
+            'width': media.width,
+            'height': media.height,
+            'duration': media.duration,
+            'file_size': media.file_size,
+            'mime_type': media.mime_type,
+            'local_path': media.local_path,
+            'hosted_url': media.hosted_url,
+            'video_codec': media.video_codec,
+            'audio_codec': media.audio_codec,
+            'bitrate': media.bitrate
+        })
+
+    # Prepare metrics
+    metrics = {
+        'likes': post.metrics.likes,
+        'shares': post.metrics.shares,
+        'comments': post.metrics.comments,
+        'views': post.metrics.views,
+        'saves': post.metrics.saves
+    }
+
+    # Remove None values from metrics
+    metrics = {k: v for k, v in metrics.items() if v is not None}
+
+    # Prepare raw_data with user notes
+    enhanced_raw_data = post.raw_data.copy() if post.raw_data else {}
+    notes = post.user_context.notes if post.user_context else None
+    if notes:
+        enhanced_raw_data['user_notes'] = notes
+
+    metrics = convert_datetime_to_str(metrics)
+    raw_data = convert_datetime_to_str(enhanced_raw_data)
+    hashes = {
+        'metrics': content_hash(metrics),
+        'media_items': content_hash(hashable_content(media_items)),
+        'user_hashtags': content_hash(post.user_hashtags),
+        'raw_data': content_hash(hashable_content(raw_data)),
+    }
+
+    return (
+        post.id,
+        post.platform.value,
+        post.url,
+        post.text,
+        # Picks the text search configuration of the post's search_vector
+        detect_language(post.text, notes),
+        post.author.username if post.author else None,
+        post.author.display_name if post.author else None,
+        getattr(post.author, 'id', None) if post.author else None,
+        post.author.followers_count if post.author else None,
+        post.author.verified if post.author else False,
+        post.author.profile_url if post.author else None,
+        post.author.avatar_url if post.author else None,
+        post.created_at,
+        post.scraped_at,
+        metrics,
+        media_items,
+        post.scraped_hashtags,
+        post.user_hashtags,
+        post.user_context.telegram_user_id if post.user_context else None,
+        post.user_context.telegram_username if post.user_context else None,
+        post.user_context.first_name if post.user_context else None,
+        post.user_context.last_name if post.user_context else None,
+        raw_data,
+        hashes
+    )
+
+
+def media_rows(post: SocialMediaPost) -> List[tuple]:
+    """
+    Build media_files rows (in MEDIA_COLUMNS order) for a post's media
+
+    One row per asset: a multi-row upsert cannot touch the same row twice,
+    so the same asset listed twice keeps its last entry.
+    """
+    rows: Dict[str, tuple] = {}
+    for media in post.media:
+        download_metadata: Dict[str, Any] = media.download_metadata or {}
+        key = asset_key(media.url)
+        rows[key] = (
+            post.id,
+            post.platform.value,
+            media.media_type.value,
+            media.url,
+            media.local_path,
+            media.hosted_url,
+            media.width,
+            media.height,
+            media.duration,
+            media.file_size,
+            media.mime_type,
+            download_metadata.get('status') or ('success' if media.local_path else 'pending'),
+            download_metadata.get('error'),
+            download_metadata.get('downloaded_at') or (datetime.now() if media.local_path else None),
+            download_metadata.get('faststart', False),
+            download_metadata.get('etag'),
+            download_metadata.get('last_modified'),
+            download_metadata.get('content_length'),
+            key,
+            media.video_codec,
+            media.audio_codec,
+            media.bitrate
+        )
+    return list(rows.values())
+
+
+def metrics_row(post: SocialMediaPost) -> tuple:
+    """Build a post_metrics_history row (in METRICS_COLUMNS order) observed now"""
+    metrics = post.metrics
+    return (
+        post.platform.value,
+        post.id,
+        datetime.now(timezone.utc),
+        metrics.likes,
+        metrics.shares,
+        metrics.comments,
+        metrics.views,
+        metrics.saves
+    )
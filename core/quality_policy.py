@@ -0,0 +1,128 @@
+"""
+Quality selection for video variants
+Platforms expose each video at several resolutions/bitrates; instead of
+always archiving the largest one, scrapers pass every variant through the
+policy here, which caps resolution and bytes per second of video unless the
+post is flagged as evidence
+"""
+
+import os
+import logging
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid {name}, using {default}")
+        return default
+
+
+# Hashtags that mark a post as evidence: its media is archived at original quality
+EVIDENCE_HASHTAGS = {
+    tag.strip().lower()
+    for tag in os.getenv('MEDIA_EVIDENCE_HASHTAGS', '#evidence,#original').split(',')
+    if tag.strip()
+}
+
+
+@dataclass
+class VideoVariant:
+    """One downloadable rendition of a video as advertised by the platform"""
+    url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    bitrate: Optional[int] = None  # bits per second
+    size: Optional[int] = None     # bytes
+    source: Any = None             # Platform object/dict the variant came from
+
+    def bytes_per_second(self, duration: Optional[float] = None) -> Optional[float]:
+        """Estimated storage cost per second of video, if it can be known"""
+        if self.size and duration:
+            return self.size / duration
+        if self.bitrate:
+            return self.bitrate / 8
+        return None
+
+    @property
+    def resolution(self) -> Optional[int]:
+        """Short side in pixels (720 for both 1280x720 and 720x1280)"""
+        if self.width and self.height:
+            return min(self.width, self.height)
+        return self.height
+
+    def rank(self):
+        """Sort key: higher is better quality"""
+        return (self.resolution or 0, self.bitrate or 0, self.size or 0)
+
+
+class QualityPolicy:
+    """
+    Pick a variant under a resolution cap and a bytes-per-second budget
+
+    The resolution cap applies to the short side, so portrait and landscape
+    videos are treated alike. A limit of 0 disables it, and variants whose
+    resolution or cost is unknown are not excluded by that limit. When
+    nothing fits, the cheapest variant is taken so the post is still
+    archived.
+    """
+
+    def __init__(self, max_height: int = None, max_bytes_per_second: int = None):
+        self.max_height = max_height if max_height is not None else _env_int('MEDIA_MAX_HEIGHT', 1080)
+        self.max_bytes_per_second = (
+            max_bytes_per_second if max_bytes_per_second is not None
+            else _env_int('MEDIA_MAX_BYTES_PER_SECOND', 0)
+        )
+
+    def _fits(self, variant: VideoVariant, duration: Optional[float]) -> bool:
+        if self.max_height and variant.resolution and variant.resolution > self.max_height:
+            return False
+        cost = variant.bytes_per_second(duration)
+        if self.max_bytes_per_second and cost and cost > self.max_bytes_per_second:
+            return False
+        return True
+
+    def choose(self, variants: Iterable[VideoVariant], duration: Optional[float] = None,
+               preserve_original: bool = False) -> Optional[VideoVariant]:
+        """
+        Choose the variant to archive
+
+        Args:
+            variants: All renditions of one video
+            duration: Video duration in seconds, if known
+            preserve_original: Ignore the limits and take the best rendition
+
+        Returns:
+            The chosen variant or None if there are none
+        """
+        variants: List[VideoVariant] = [v for v in variants if v.url]
+        if not variants:
+            return None
+
+        best = max(variants, key=VideoVariant.rank)
+        if preserve_original:
+            return best
+
+        fitting = [v for v in variants if self._fits(v, duration)]
+        if fitting:
+            chosen = max(fitting, key=VideoVariant.rank)
+        else:
+            chosen = min(variants, key=lambda v: (v.bytes_per_second(duration) or 0, v.rank()))
+
+        if chosen is not best:
+            logger.debug(f"Quality policy chose {chosen.resolution or '?'}p/{chosen.bitrate or '?'}bps "
+                         f"over {best.resolution or '?'}p/{best.bitrate or '?'}bps")
+        return chosen
+
+
+def is_evidence(hashtags: Optional[Iterable[str]]) -> bool:
+    """Check whether user hashtags flag a post as evidence"""
+    return any(tag.lower() in EVIDENCE_HASHTAGS for tag in hashtags or [])
+
+
+# Global instance
+quality_policy = QualityPolicy()
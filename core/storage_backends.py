@@ -0,0 +1,198 @@
+"""
+Storage backends for archived media
+The local media tree is the hot tier; an S3-compatible object store (AWS S3,
+MinIO, ...) can hold older media that is rarely read
+"""
+
+import os
+import shutil
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+from .exceptions import StorageError
+
+logger = logging.getLogger(__name__)
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from boto3.exceptions import S3UploadFailedError
+    from botocore.exceptions import BotoCoreError, ClientError
+    # upload_file wraps failed transfers in S3UploadFailedError; connection
+    # problems surface as BotoCoreError
+    S3_ERRORS = (ClientError, BotoCoreError, S3UploadFailedError)
+except ImportError:  # Only needed when a cold tier is configured
+    boto3 = None
+
+# Multipart upload settings - files are read and sent 16 MB at a time
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+class StorageBackend:
+    """
+    Where media bytes live
+
+    Keys are paths relative to the media root (e.g. "videos/twitter/ab/cd/<file>"),
+    so the same key addresses a file on every backend.
+    """
+
+    name = 'base'
+
+    def put_file(self, local_path: Path, key: str, content_type: str = None) -> str:
+        """Store a local file under `key`, returning its public URL"""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def size(self, key: str) -> Optional[int]:
+        """Stored size in bytes, or None if the key does not exist"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def url_for(self, key: str) -> str:
+        raise NotImplementedError
+
+
+class LocalStorageBackend(StorageBackend):
+    """The media tree on local disk, served by services/serve_media.py"""
+
+    name = 'local'
+
+    def __init__(self, base_path: Path, base_url: str):
+        self.base_path = Path(base_path)
+        self.base_url = base_url.rstrip('/')
+
+    def path_for(self, key: str) -> Path:
+        return self.base_path / key
+
+    def key_for(self, path: Path) -> str:
+        return Path(path).relative_to(self.base_path).as_posix()
+
+    def put_file(self, local_path: Path, key: str, content_type: str = None) -> str:
+        target = self.path_for(key)
+        if Path(local_path) != target:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(local_path, target)
+        return self.url_for(key)
+
+    def exists(self, key: str) -> bool:
+        return self.path_for(key).is_file()
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self.path_for(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str):
+        try:
+            self.path_for(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    S3-compatible object store
+
+    Works against AWS S3 or a self-hosted MinIO (set S3_ENDPOINT_URL).
+    Objects are uploaded with multipart transfers that stream the file from
+    disk, so memory use does not depend on file size.
+    """
+
+    name = 's3'
+
+    def __init__(self, bucket: str, endpoint_url: str = None, public_url: str = None,
+                 prefix: str = '', region: str = None):
+        if boto3 is None:
+            raise StorageError("boto3 is required for S3 storage. Install with: pip install boto3")
+
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.prefix = prefix.strip('/')
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=os.getenv('S3_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('S3_SECRET_ACCESS_KEY')
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNK_SIZE,
+            max_concurrency=4
+        )
+
+        if public_url:
+            self.public_url = public_url.rstrip('/')
+        elif endpoint_url:
+            # MinIO and most S3-compatible stores use path-style URLs
+            self.public_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.public_url = f"https://{bucket}.s3.amazonaws.com"
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put_file(self, local_path: Path, key: str, content_type: str = None) -> str:
+        extra_args: Dict[str, Any] = {}
+        if content_type:
+            extra_args['ContentType'] = content_type
+        try:
+            self.client.upload_file(
+                str(local_path), self.bucket, self._object_key(key),
+                ExtraArgs=extra_args or None, Config=self.transfer_config
+            )
+        except S3_ERRORS as e:
+            raise StorageError(f"Failed to upload {key} to s3://{self.bucket}: {e}")
+        return self.url_for(key)
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise StorageError(f"Failed to stat s3://{self.bucket}/{key}: {e}")
+        except BotoCoreError as e:
+            raise StorageError(f"Failed to stat s3://{self.bucket}/{key}: {e}")
+        return response['ContentLength']
+
+    def exists(self, key: str) -> bool:
+        return self.size(key) is not None
+
+    def delete(self, key: str):
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        except S3_ERRORS as e:
+            raise StorageError(f"Failed to delete s3://{self.bucket}/{key}: {e}")
+
+    def url_for(self, key: str) -> str:
+        return f"{self.public_url}/{self._object_key(key)}"
+
+
+def get_cold_backend() -> Optional[StorageBackend]:
+    """
+    Cold-tier backend from the environment
+
+    Returns:
+        An S3StorageBackend if S3_BUCKET is set, otherwise None
+    """
+    bucket = os.getenv('S3_BUCKET')
+    if not bucket:
+        return None
+    return S3StorageBackend(
+        bucket=bucket,
+        endpoint_url=os.getenv('S3_ENDPOINT_URL'),
+        public_url=os.getenv('S3_PUBLIC_URL'),
+        prefix=os.getenv('S3_PREFIX', ''),
+        region=os.getenv('S3_REGION')
+    )
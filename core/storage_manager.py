@@ -10,15 +10,23 @@ import asyncio
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-import psycopg2
-from psycopg2.extras import Json
+from psycopg.types.json import Jsonb
 
 from .data_models import SocialMediaPost, Platform, MediaType
 from .exceptions import StorageError, DatabaseError
+from .async_db import AsyncDatabase
 from .smart_media_downloader import smart_media_downloader
+from .post_rows import (
+    POST_COLUMNS, JSON_COLUMNS, POST_UPSERT, MEDIA_UPSERT, METRICS_INSERT,
+    post_row, media_rows, metrics_row, post_upsert_params
+)
+from .partitions import ENSURE_PARTITIONS_SQL, partitions_due, partitions_ensured
+from .media_policy import select_media
+from .media_probe import PROBE_FIELDS
 
 logger = logging.getLogger(__name__)
 
+
 class UnifiedStorageManager:
     """Unified storage manager that handles all social media platforms"""
     
@@ -37,6 +45,7 @@ class UnifiedStorageManager:
             'password': os.getenv('DB_PASSWORD', 'socialarchive2025'),
             'port': os.getenv('DB_PORT', '5432')
         }
+        self.db = AsyncDatabase(self.db_config)
     
     def get_storage_paths(self, filename: str) -> List[str]:
         """Get list of paths where data should be saved based on environment"""
@@ -69,6 +78,9 @@ class UnifiedStorageManager:
         try:
             saved_paths = []
             
+            # Drop covers/soundtracks the platform policy doesn't archive
+            post.media = select_media(post.media, post.platform.value)
+
             # Download media files if enabled
             if self.download_media and post.media:
                 logger.info(f"Downloading {len(post.media)} media files for post {post.id}")
@@ -101,17 +113,19 @@ class UnifiedStorageManager:
             if i < len(media_metadata):
                 metadata = media_metadata[i]
                 
-                # Update media item with download info
-                if metadata.get('status') == 'success':
+                # Update media item with download info (revalidated files keep their location)
+                if metadata.get('status') in ('success', 'already_exists', 'not_modified'):
                     media_item.local_path = metadata.get('local_path')
                     media_item.hosted_url = metadata.get('hosted_url')
                     media_item.file_size = metadata.get('file_size')
                     if metadata.get('mime_type'):
                         media_item.mime_type = metadata.get('mime_type')
+                    # Probed values are more reliable than what the platform reported
+                    for field in PROBE_FIELDS:
+                        if metadata.get(field) is not None:
+                            setattr(media_item, field, metadata[field])
                 
-                # Store download status in raw_data
-                if not hasattr(media_item, 'download_metadata'):
-                    media_item.download_metadata = {}
+                # Download status is recorded in media_files
                 media_item.download_metadata.update(metadata)
     
     def _save_to_json(self, post: SocialMediaPost) -> List[str]:
@@ -141,81 +155,33 @@ class UnifiedStorageManager:
         return saved_paths
     
     async def _save_to_database(self, post: SocialMediaPost) -> bool:
-        """Save post to PostgreSQL database"""
+        """Save post, its media rows and a metrics observation to the unified schema"""
         if not self.use_database:
             return False
             
         try:
-            conn = psycopg2.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            # Prepare data for insertion
-            insert_data = {
-                'id': post.id,
-                'platform': post.platform.value,
-                'text': post.text,
-                'author': post.author.username,
-                'author_name': post.author.display_name,
-                'author_followers': post.author.followers_count,
-                'author_verified': post.author.verified,
-                'created_at': post.created_at,
-                'scraped_at': post.scraped_at,
-                'retweet_count': post.metrics.shares,  # Map shares to retweets for compatibility
-                'like_count': post.metrics.likes,
-                'reply_count': post.metrics.comments,
-                'quote_count': 0,  # Platform-specific, will be overridden if available
-                'view_count': post.metrics.views,
-                'original_url': post.url,
-                'scraped_by_user': post.user_context.telegram_username if post.user_context else None,
-                'scraped_by_user_id': post.user_context.telegram_user_id if post.user_context else None,
-                'user_notes': post.user_context.notes if post.user_context else None,
-                'raw_data': Json(post.raw_data)
-            }
-            
-            # Insert or update post (use tweets table for backward compatibility)
-            insert_query = """
-                INSERT INTO tweets (
-                    id, text, author, author_name, author_followers, author_verified,
-                    created_at, scraped_at, retweet_count, like_count, reply_count, 
-                    quote_count, view_count, original_url, scraped_by_user,
-                    scraped_by_user_id, user_notes, raw_data
-                ) VALUES (
-                    %(id)s, %(text)s, %(author)s, %(author_name)s, %(author_followers)s, %(author_verified)s,
-                    %(created_at)s, %(scraped_at)s, %(retweet_count)s, %(like_count)s, %(reply_count)s,
-                    %(quote_count)s, %(view_count)s, %(original_url)s, %(scraped_by_user)s,
-                    %(scraped_by_user_id)s, %(user_notes)s, %(raw_data)s
-                )
-                ON CONFLICT (id) DO UPDATE SET
-                    text = EXCLUDED.text,
-                    author = EXCLUDED.author,
-                    author_name = EXCLUDED.author_name,
-                    author_followers = EXCLUDED.author_followers,
-                    author_verified = EXCLUDED.author_verified,
-                    created_at = EXCLUDED.created_at,
-                    scraped_at = EXCLUDED.scraped_at,
-                    retweet_count = EXCLUDED.retweet_count,
-                    like_count = EXCLUDED.like_count,
-                    reply_count = EXCLUDED.reply_count,
-                    quote_count = EXCLUDED.quote_count,
-                    view_count = EXCLUDED.view_count,
-                    original_url = EXCLUDED.original_url,
-                    scraped_by_user = EXCLUDED.scraped_by_user,
-                    scraped_by_user_id = EXCLUDED.scraped_by_user_id,
-                    user_notes = EXCLUDED.user_notes,
-                    raw_data = EXCLUDED.raw_data;
-            """
-            
-            cursor.execute(insert_query, insert_data)
-            
-            # Handle hashtags separately
-            await self._save_hashtags(cursor, post)
-            
-            # Handle media files with download metadata
-            await self._save_media_files(cursor, post)
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
+            row = [
+                Jsonb(value) if column in JSON_COLUMNS else value
+                for column, value in zip(POST_COLUMNS, post_row(post))
+            ]
+            ensure_partitions = partitions_due()
+            async with self.db.connection() as conn, conn.cursor() as cursor:
+                # Pipeline the post, media and metrics statements: one round
+                # trip per save however many media items there are
+                async with conn.pipeline():
+                    if ensure_partitions:
+                        await cursor.execute(ENSURE_PARTITIONS_SQL)
+                    await cursor.execute(POST_UPSERT, post_upsert_params(row))
+                    
+                    # Handle media files with download metadata
+                    rows = media_rows(post)
+                    if rows:
+                        await cursor.executemany(MEDIA_UPSERT, rows)
+                    
+                    # Append this scrape's engagement to the history
+                    await cursor.execute(METRICS_INSERT, metrics_row(post))
+            if ensure_partitions:
+                partitions_ensured()
             
             logger.debug(f"Saved {post.platform.value} post {post.id} to database")
             return True
@@ -224,73 +190,9 @@ class UnifiedStorageManager:
             logger.error(f"Failed to save {post.platform.value} post {post.id} to database: {e}")
             raise DatabaseError(f"Database save failed: {str(e)}")
     
-    async def _save_hashtags(self, cursor, post: SocialMediaPost):
-        """Save hashtags to database"""
-        # Insert user hashtags
-        if post.user_hashtags and post.user_context:
-            for hashtag in post.user_hashtags:
-                hashtag_query = """
-                    INSERT INTO user_hashtags (tweet_id, hashtag, added_by, added_by_user_id)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT DO NOTHING;
-                """
-                cursor.execute(hashtag_query, (
-                    post.id,
-                    hashtag,
-                    post.user_context.telegram_username,
-                    post.user_context.telegram_user_id
-                ))
-        
-        # Insert scraped hashtags
-        if post.scraped_hashtags:
-            for hashtag in post.scraped_hashtags:
-                hashtag_query = """
-                    INSERT INTO tweet_hashtags (tweet_id, hashtag)
-                    VALUES (%s, %s)
-                    ON CONFLICT DO NOTHING;
-                """
-                cursor.execute(hashtag_query, (post.id, hashtag))
-    
-    async def _save_media_files(self, cursor, post: SocialMediaPost):
-        """Save media files to database with download metadata"""
-        if post.media:
-            for media in post.media:
-                # Get download metadata if available
-                download_metadata = getattr(media, 'download_metadata', {})
-                
-                media_query = """
-                    INSERT INTO media_files (
-                        tweet_id, post_id, platform, media_type, original_url, 
-                        local_path, hosted_url, width, height, duration, 
-                        file_size, mime_type, download_status, download_error, downloaded_at
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (tweet_id, original_url) DO UPDATE SET
-                        local_path = EXCLUDED.local_path,
-                        hosted_url = EXCLUDED.hosted_url,
-                        file_size = EXCLUDED.file_size,
-                        mime_type = EXCLUDED.mime_type,
-                        download_status = EXCLUDED.download_status,
-                        download_error = EXCLUDED.download_error,
-                        downloaded_at = EXCLUDED.downloaded_at;
-                """
-                
-                cursor.execute(media_query, (
-                    post.id,  # tweet_id for backward compatibility
-                    post.id,  # post_id for new schema
-                    post.platform.value,
-                    media.media_type.value,
-                    media.url,
-                    getattr(media, 'local_path', None),
-                    getattr(media, 'hosted_url', None),
-                    media.width,
-                    media.height,
-                    media.duration,
-                    getattr(media, 'file_size', None),
-                    media.mime_type,
-                    download_metadata.get('status', 'pending'),
-                    download_metadata.get('error', None),
-                    download_metadata.get('downloaded_at', None)
-                ))
+    async def close(self):
+        """Close pooled database connections"""
+        await self.db.close()
     
     def get_storage_info(self) -> str:
         """Get human-readable storage info"""
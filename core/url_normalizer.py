@@ -0,0 +1,92 @@
+"""
+Stable asset keys for media URLs
+Instagram, Facebook and TikTok serve media from signed CDN URLs whose query
+parameters (and edge hostnames) change on every scrape; these helpers strip
+the volatile parts so the same asset always maps to the same key
+"""
+
+import re
+from typing import Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+# CDN families: (hostname pattern, canonical host, volatile query parameters)
+# Parameters ending in '*' are prefixes.
+META_VOLATILE_PARAMS = ('oh', 'oe', '_nc_*', 'efg', 'ccb', 'edm', 'dl', 'se', 'nc_cid')
+TIKTOK_VOLATILE_PARAMS = (
+    'x-expires', 'x-signature', 'expire', 'signature', 'policy', 'l', 'tk', 'btag',
+    'bti', 'ply_type', 'lr', 'net', 'cd', 'ft', 'qs', 'rc', 'shp', 'shcp', 'vvpl'
+)
+# Pre-signed S3/CloudFront style URLs on any host
+GENERIC_VOLATILE_PARAMS = (
+    'x-amz-*', 'expires', 'signature', 'key-pair-id', 'policy'
+)
+
+CDN_FAMILIES: Tuple[Tuple[re.Pattern, str, Tuple[str, ...]], ...] = (
+    (re.compile(r'(^|\.)cdninstagram\.com$'), 'cdninstagram.com', META_VOLATILE_PARAMS),
+    (re.compile(r'(^|\.)fbcdn\.net$'), 'fbcdn.net', META_VOLATILE_PARAMS),
+    (re.compile(r'(^|\.)(tiktokcdn(-us|-eu)?\.com|tiktokv\.com|byteoversea\.com|ibytedtos\.com)$'),
+     'tiktokcdn.com', TIKTOK_VOLATILE_PARAMS),
+    (re.compile(r'^v\d+[a-z0-9-]*\.tiktok\.com$'), 'tiktokcdn.com', TIKTOK_VOLATILE_PARAMS),
+)
+
+
+def _is_volatile(name: str, volatile: Tuple[str, ...]) -> bool:
+    name = name.lower()
+    for pattern in volatile:
+        if pattern.endswith('*'):
+            if name.startswith(pattern[:-1]):
+                return True
+        elif name == pattern:
+            return True
+    return False
+
+
+def _cdn_family(host: str) -> Optional[Tuple[str, Tuple[str, ...]]]:
+    for pattern, canonical_host, volatile in CDN_FAMILIES:
+        if pattern.search(host):
+            return canonical_host, volatile
+    return None
+
+
+def asset_key(url: str) -> str:
+    """
+    Normalize a media URL into a stable asset key
+
+    Volatile signature/expiry parameters are dropped and CDN edge hostnames
+    (scontent-lhr8-1.cdninstagram.com, v16-webapp.tiktok.com, ...) are
+    collapsed to their CDN family. The remaining parameters keep their
+    order and encoding, so URLs with nothing volatile (e.g. Twitter's
+    pbs.twimg.com) are returned unchanged.
+
+    Args:
+        url: Media URL as scraped
+
+    Returns:
+        The asset key (itself a URL)
+    """
+    if not url:
+        return url
+
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+
+    host = (parts.hostname or '').lower()
+    family = _cdn_family(host)
+    if family:
+        netloc, volatile = family
+        volatile = volatile + GENERIC_VOLATILE_PARAMS
+    else:
+        netloc, volatile = parts.netloc, GENERIC_VOLATILE_PARAMS
+
+    kept = [
+        param for param in parts.query.split('&')
+        if param and not _is_volatile(param.split('=', 1)[0], volatile)
+    ]
+    query = '&'.join(kept)
+
+    if netloc == parts.netloc and query == parts.query and not parts.fragment:
+        return url
+
+    return urlunsplit((parts.scheme, netloc, parts.path, query, ''))
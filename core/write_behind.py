@@ -0,0 +1,274 @@
+"""
+Write-behind batching for bulk ingestion
+Rows are buffered for a short time and flushed together: COPY into a
+temporary staging table, then one set-based upsert per target table.
+Each submitted row gets a Future that resolves once its batch has
+committed, so callers still know when their data is durable
+"""
+
+import io
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .db_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+def _array_element(value: Any) -> str:
+    if value is None:
+        return 'NULL'
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def copy_text(value: Any, as_json: bool = False) -> str:
+    """Encode one value for COPY ... FROM STDIN (text format)"""
+    if value is None:
+        return '\\N'
+    if as_json:
+        text = json.dumps(value, default=str)
+    elif isinstance(value, bool):
+        text = 't' if value else 'f'
+    elif isinstance(value, (datetime, date)):
+        text = value.isoformat()
+    elif isinstance(value, (list, tuple)):
+        text = '{' + ','.join(_array_element(v) for v in value) + '}'
+    elif isinstance(value, dict):
+        text = json.dumps(value, default=str)
+    else:
+        text = str(value)
+    return (text.replace('\\', '\\\\')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r')
+                .replace('\t', '\\t'))
+
+
+def copy_rows(cursor, table: str, columns: Sequence[str], rows: Sequence[Sequence[Any]],
+              json_columns: Iterable[str] = ()):
+    """COPY rows into a table in a single round trip"""
+    as_json = [column in set(json_columns) for column in columns]
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(copy_text(value, is_json) for value, is_json in zip(row, as_json)))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def bulk_upsert(cursor, table: str, columns: Sequence[str], key_columns: Sequence[str],
+                update_sql: Optional[str], rows: Sequence[Sequence[Any]], json_columns: Iterable[str] = (),
+                staging_sql: Optional[str] = None):
+    """
+    Upsert rows through a temporary staging table
+
+    Rows are COPYed into `staging_<table>` and merged with one
+    INSERT ... SELECT ... ON CONFLICT. The staging table is created for
+    each call and dropped at commit, so it never outlives a schema change
+    on a pooled connection. Keys must be unique within
+    `rows`; with no `update_sql` existing rows are left untouched.
+    `staging_sql` (with a {staging} placeholder) runs on the staged rows
+    before the merge. The caller commits.
+    """
+    staging_table = f"staging_{table}"
+    column_list = ', '.join(columns)
+    action = f"DO UPDATE SET {update_sql}" if update_sql else "DO NOTHING"
+    cursor.execute(f"""
+        DROP TABLE IF EXISTS pg_temp.{staging_table};
+        CREATE TEMP TABLE {staging_table}
+        (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP;
+    """)
+    copy_rows(cursor, staging_table, columns, rows, json_columns)
+    if staging_sql:
+        cursor.execute(staging_sql.format(staging=staging_table))
+    cursor.execute(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM {staging_table}
+        ON CONFLICT ({', '.join(key_columns)}) {action};
+    """)
+
+
+@dataclass
+class UpsertTarget:
+    """A table written by bulk_upsert and the shape of its rows"""
+    table: str
+    columns: Sequence[str]
+    key_columns: Sequence[str]
+    update_sql: Optional[str]
+    json_columns: Iterable[str] = ()
+    staging_sql: Optional[str] = None
+    # Columns identifying a row when they are fewer than the conflict key
+    identity_columns: Optional[Sequence[str]] = None
+
+    def key(self, row: Sequence[Any]) -> Tuple:
+        columns = self.identity_columns or self.key_columns
+        return tuple(row[self.columns.index(column)] for column in columns)
+
+    def upsert(self, cursor, rows: Sequence[Sequence[Any]]):
+        bulk_upsert(cursor, self.table, self.columns, self.key_columns,
+                    self.update_sql, rows, self.json_columns, self.staging_sql)
+
+
+# A submitted row, the rows it brings for each dependent table, and its acknowledgement
+Entry = Tuple[Sequence[Any], Sequence[Sequence[Sequence[Any]]], Future]
+
+
+class WriteBehindWriter:
+    """
+    Buffer rows for one table and upsert them in batches
+
+    A batch is flushed when it reaches `batch_size` rows or its oldest row
+    has waited `flush_interval` seconds. Rows with the same key within a
+    batch are collapsed (last write wins). Rows for `dependents` (e.g.
+    media_files rows of a post) are written after the main rows in the
+    same transaction. If a batch fails it is split in half and retried, so
+    one bad row only fails its own Future.
+    """
+
+    def __init__(self, pool: ConnectionPool, target: UpsertTarget, dependents: Sequence[UpsertTarget] = (),
+                 batch_size: int = None, flush_interval: float = None):
+        self.pool = pool
+        self.target = target
+        self.dependents = list(dependents)
+        self.batch_size = batch_size or int(os.getenv('DB_WRITE_BEHIND_BATCH_SIZE', 500))
+        self.flush_interval = flush_interval or float(os.getenv('DB_WRITE_BEHIND_FLUSH_MS', 200)) / 1000
+
+        self._buffer: List[Entry] = []
+        self._oldest: Optional[float] = None
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.target.table}", daemon=True)
+            self._thread.start()
+
+    def submit(self, row: Sequence[Any], dependent_rows: Sequence[Sequence[Sequence[Any]]] = ()) -> Future:
+        """
+        Queue a row for writing
+
+        Args:
+            row: Row for the target table
+            dependent_rows: One list of rows per dependent table
+
+        Returns:
+            Future resolving to True once the row is committed (or raising
+            the database error that prevented it)
+        """
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError(f"Write-behind writer for {self.target.table} is closed")
+            self._ensure_thread()
+            self._buffer.append((row, dependent_rows, future))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+        return future
+
+    def flush(self, timeout: float = None):
+        """Write everything buffered so far and wait until it is committed"""
+        with self._condition:
+            pending = [future for _, _, future in self._buffer]
+            self._flush_requested = True
+            self._condition.notify()
+        for future in pending:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def close(self, timeout: float = None):
+        """Flush remaining rows and stop the background thread"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _take_batch(self) -> Optional[List[Entry]]:
+        """Block until a batch is due; None once closed and drained"""
+        with self._condition:
+            while True:
+                if self._buffer:
+                    due = (len(self._buffer) >= self.batch_size or self._closed or self._flush_requested
+                           or time.monotonic() - self._oldest >= self.flush_interval)
+                    if due:
+                        batch = self._buffer[:self.batch_size]
+                        del self._buffer[:self.batch_size]
+                        self._oldest = time.monotonic() if self._buffer else None
+                        if not self._buffer:
+                            self._flush_requested = False
+                        return batch
+                    self._condition.wait(self.flush_interval - (time.monotonic() - self._oldest))
+                elif self._closed:
+                    return None
+                else:
+                    self._flush_requested = False
+                    self._condition.wait()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._write(batch)
+
+    def _write(self, batch: List[Entry]):
+        """Write a batch, bisecting on failure to isolate bad rows"""
+        # Last write wins for rows with the same key
+        latest: Dict[Tuple, Sequence[Any]] = {}
+        dependent_latest: List[Dict[Tuple, Sequence[Any]]] = [{} for _ in self.dependents]
+        for row, dependent_rows, _ in batch:
+            latest[self.target.key(row)] = row
+            for target, rows, collected in zip(self.dependents, dependent_rows, dependent_latest):
+                for dependent_row in rows:
+                    collected[target.key(dependent_row)] = dependent_row
+
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    self.target.upsert(cursor, list(latest.values()))
+                    for target, collected in zip(self.dependents, dependent_latest):
+                        if collected:
+                            target.upsert(cursor, list(collected.values()))
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Write-behind upsert into {self.target.table} failed: {e}")
+                batch[0][2].set_exception(e)
+                return
+            middle = len(batch) // 2
+            self._write(batch[:middle])
+            self._write(batch[middle:])
+            return
+
+        for _, _, future in batch:
+            future.set_result(True)
+        logger.debug(f"Write-behind flushed {len(latest)} rows into {self.target.table}")
+
+
+_writers: List[WriteBehindWriter] = []
+
+
+def register_writer(writer: WriteBehindWriter) -> WriteBehindWriter:
+    """Track a writer so its buffered rows are flushed at interpreter exit"""
+    _writers.append(writer)
+    return writer
+
+
+@atexit.register
+def close_all_writers():
+    for writer in _writers:
+        writer.close(timeout=30)
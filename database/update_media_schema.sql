@@ -33,3 +33,50 @@ BEGIN
         ON DELETE CASCADE;
     END IF;
 END $$;
+
+-- Track videos whose moov atom was moved to the front (instant playback)
+ALTER TABLE media_files
+ADD COLUMN IF NOT EXISTS faststart BOOLEAN DEFAULT FALSE;
+
+-- Space-efficient derivatives produced by core/media_transcoder.py
+CREATE TABLE IF NOT EXISTS media_derivatives (
+    id SERIAL PRIMARY KEY,
+    source_path TEXT NOT NULL,
+    profile VARCHAR(50) NOT NULL,
+    derivative_path TEXT,              -- equals source_path when replaced in place
+    original_size BIGINT,
+    derivative_size BIGINT,
+    savings_bytes BIGINT GENERATED ALWAYS AS (original_size - derivative_size) STORED,
+    kept_original BOOLEAN DEFAULT FALSE,
+    status VARCHAR(20) NOT NULL,       -- success, skipped (savings too small), failed
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE (source_path, profile)
+);
+
+CREATE INDEX IF NOT EXISTS idx_media_derivatives_derivative_path ON media_derivatives(derivative_path);
+
+-- HTTP validators for conditional revalidation on re-archive
+ALTER TABLE media_files
+ADD COLUMN IF NOT EXISTS etag TEXT,
+ADD COLUMN IF NOT EXISTS last_modified TEXT,
+ADD COLUMN IF NOT EXISTS content_length BIGINT;
+
+-- Stable asset key (original_url without expiring CDN signature parameters).
+-- Run scripts/database/backfill_media_asset_keys.py afterwards: it fills the
+-- column for existing rows, merges duplicates and creates the unique index
+-- idx_media_files_post_asset_key used as the upsert conflict target.
+ALTER TABLE media_files
+ADD COLUMN IF NOT EXISTS asset_key TEXT;
+
+-- Media properties probed with ffprobe after download (core/media_probe.py);
+-- duration becomes fractional seconds
+ALTER TABLE media_files
+ADD COLUMN IF NOT EXISTS video_codec VARCHAR(50),
+ADD COLUMN IF NOT EXISTS audio_codec VARCHAR(50),
+ADD COLUMN IF NOT EXISTS bitrate BIGINT;
+
+ALTER TABLE media_files
+ALTER COLUMN duration TYPE REAL;
+
+CREATE INDEX IF NOT EXISTS idx_media_video_codec ON media_files(video_codec);
+CREATE INDEX IF NOT EXISTS idx_media_dimensions ON media_files(height, width);
@@ -6,8 +6,11 @@ Enhanced to support Twitter, Instagram, Facebook, TikTok, and future platforms
 import asyncio
 import logging
 import os
+import re
 import json
+import signal
 from datetime import datetime
+import aiohttp
 from aiohttp import web
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
@@ -21,8 +24,19 @@ sys.path.append('..')
 
 from bot.platform_manager import PlatformManager
 from bot.url_detector import URLDetector
+from bot.media_queue import MediaJobQueue
 from core.database_storage import database_storage
 from core.data_models import UserContext
+from core.download_sink import write_response_to_file, READ_CHUNK_SIZE
+from core.media_merger import media_merger
+from core.media_layout import layout_is_sharded, shard_prefix
+from core.media_policy import select_media
+from core.quality_policy import is_evidence
+from core.media_inventory import media_inventory, media_category, LOCAL_TIER
+from core.media_downloader import conditional_headers, response_validators
+from core.media_probe import media_probe, PROBE_FIELDS
+from core.archive_import import load_archive_post
+from core.exceptions import MediaDownloadError
 
 # Load environment variables
 load_dotenv()
@@ -39,6 +53,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Archive locations
+DATA_DIR = Path("/home/ubuntu/social-media-archive-project/media_storage/data")
+MEDIA_DIR = DATA_DIR / "media"
+# One marker per archived post whose media is still to be downloaded
+PENDING_MEDIA_DIR = DATA_DIR / ".pending_media"
+MEDIA_BASE_URL = "https://ov-ab103a.infomaniak.ch/data/media"
+MEDIA_DOWNLOAD_TIMEOUT = int(os.getenv('MEDIA_DOWNLOAD_TIMEOUT', 600))
+MEDIA_QUEUE_DRAIN_TIMEOUT = float(os.getenv('MEDIA_QUEUE_DRAIN_TIMEOUT', 120))
+
 class MultiPlatformBot:
     def __init__(self):
         # Initialize Telegram bot
@@ -55,6 +78,9 @@ class MultiPlatformBot:
         # Initialize Twitter API for traditional tweets
         self.twscrape_api = API()
         
+        # Background workers for media downloads
+        self.media_queue = MediaJobQueue()
+        
         # Setup handlers
         self._setup_handlers()
         
@@ -262,7 +288,8 @@ Send me a URL from any supported platform to get started.
             user_context = UserContext(
                 telegram_user_id=user_id,
                 telegram_username=username,
-                notes=description
+                notes=description,
+                preserve_original=is_evidence(user_hashtags)
             )
 
             # Send processing message
@@ -287,12 +314,21 @@ Send me a URL from any supported platform to get started.
                     return
 
                 
-                # Save post data to JSON file
-                json_result = self.save_post_to_json(post_data, platform, user_context, user_hashtags)
+                # Phase 1: commit metadata with provisional media links
+                json_result = await asyncio.to_thread(self.save_post_to_json, post_data, platform, user_context, user_hashtags)
 
-                # Send success response with detailed format
+                # Answer the user right away
                 await self._send_success_response(update, platform, post_data, user_hashtags, processing_msg, json_result)
 
+                # Phase 2: download and merge media in the background
+                if json_result and json_result.get('media'):
+                    await self.media_queue.submit(
+                        lambda: self._complete_media_archive(
+                            update, platform, post_data, user_context, user_hashtags, processing_msg, json_result
+                        ),
+                        f"{platform.value} media for post {post_data.id}"
+                    )
+
             except Exception as scraping_error:
                 logger.error(f"Scraping error: {scraping_error}")
                 await self._send_error_response(update, platform, str(scraping_error), processing_msg)
@@ -301,193 +337,395 @@ Send me a URL from any supported platform to get started.
             logger.error(f"Error processing URL {url}: {e}")
             await update.message.reply_text(f"❌ Error processing {url}: {str(e)}")
 
-    
+    def _build_media_entries(self, post_data):
+        """Build media entries with the local paths and provisional hosted URLs they will have once downloaded"""
+        media_entries = []
+        for i, media in enumerate(post_data.media or []):
+            # Extract file extension properly
+            if media.media_type.value == 'video':
+                file_extension = 'mp4'
+            elif media.media_type.value == 'photo':
+                file_extension = 'jpg'
+            elif media.media_type.value == 'animated_gif':
+                file_extension = 'gif'
+            else:
+                # Try to extract from URL
+                ext_match = re.search(r'\.([a-zA-Z0-9]{2,4})(?:\?|$)', media.url)
+                file_extension = ext_match.group(1) if ext_match else 'mp4'
+            local_filename = f"{post_data.id}_media_{i}.{file_extension}"
+            if layout_is_sharded():
+                # Fan out into hash-prefixed subdirectories (media/ab/cd/<file>)
+                local_filename = f"{shard_prefix(local_filename)}/{local_filename}"
+
+            media_entries.append({
+                'url': media.url,
+                'type': media.media_type.value if hasattr(media.media_type, 'value') else str(media.media_type),
+                'width': media.width,
+                'height': media.height,
+                'duration': media.duration,
+                'mime_type': media.mime_type,
+                'role': media.role.value,
+                'local_path': str(MEDIA_DIR / local_filename),
+                'hosted_url': f"{MEDIA_BASE_URL}/{local_filename}",
+                'file_size': None,
+                'download_status': 'pending'
+            })
+        return media_entries
+
+    def _build_post_dict(self, post_data, user_context, user_hashtags, media_entries):
+        """Convert SocialMediaPost to the archived JSON structure"""
+        return {
+            'id': post_data.id,
+            'platform': post_data.platform.value if hasattr(post_data.platform, 'value') else str(post_data.platform),
+            'url': post_data.url,
+            'text': post_data.text,
+            'author': {
+                'username': post_data.author.username if post_data.author else None,
+                'display_name': post_data.author.display_name if post_data.author else None,
+                'followers_count': post_data.author.followers_count if post_data.author else 0,
+                'verified': post_data.author.verified if post_data.author else False,
+                'profile_url': post_data.author.profile_url if post_data.author else None,
+                'avatar_url': post_data.author.avatar_url if post_data.author else None
+            },
+            'created_at': post_data.created_at.isoformat() if post_data.created_at else None,
+            'scraped_at': post_data.scraped_at.isoformat() if hasattr(post_data, 'scraped_at') and post_data.scraped_at else datetime.now().isoformat(),
+            'metrics': {
+                'likes': post_data.metrics.likes if post_data.metrics else 0,
+                'shares': post_data.metrics.shares if post_data.metrics else 0,
+                'comments': post_data.metrics.comments if post_data.metrics else 0,
+                'views': post_data.metrics.views if post_data.metrics else None
+            },
+            'media': media_entries,
+            'scraped_hashtags': post_data.scraped_hashtags if hasattr(post_data, 'scraped_hashtags') else [],
+            # NEW: User attribution and hashtags
+            'telegram_user': {
+                'user_id': user_context.telegram_user_id if user_context else None,
+                'username': user_context.telegram_username if user_context else None,
+                'first_name': user_context.first_name if user_context else None,
+                'last_name': user_context.last_name if user_context else None
+            } if user_context else None,
+            'user_notes': user_context.notes if user_context and user_context.notes else None,
+            'user_hashtags': user_hashtags or [],
+            'download_stats': self._download_stats(media_entries)
+        }
+
+    def _download_stats(self, media_entries):
+        """Summarize download state of media entries"""
+        return {
+            'total_media': len(media_entries),
+            'successful_downloads': len([m for m in media_entries if m.get('download_status') == 'success']),
+            'failed_downloads': len([m for m in media_entries if m.get('download_error')]),
+            'pending_downloads': len([m for m in media_entries if m.get('download_status') == 'pending'])
+        }
+
+    @staticmethod
+    def _archive_filename(post_id, platform):
+        """Name of the archived JSON file for a post"""
+        return f"tweet_{post_id}.json" if platform.value == 'twitter' else f"{platform.value}_{post_id}.json"
+
+    def _write_post_json(self, post_dict, platform):
+        """Write the archived JSON file for a post"""
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        filepath = DATA_DIR / self._archive_filename(post_dict['id'], platform)
+
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(post_dict, f, ensure_ascii=False, indent=2, default=str)
+
+        logger.info(f"Saved {platform.value} post {post_dict['id']} to {filepath}")
+        return filepath
+
+    def _save_post_to_database(self, post_data, platform, user_hashtags=None, record_metrics=True):
+        """Save SocialMediaPost to the database"""
+        # Add user hashtags to post before saving
+        if user_hashtags:
+            post_data.user_hashtags = user_hashtags
+
+        if database_storage.save_post(post_data, record_metrics=record_metrics):
+            logger.info(f"Saved {platform.value} post {post_data.id} to database")
+        else:
+            logger.warning(f"Failed to save {platform.value} post {post_data.id} to database")
+
+    def _mark_media_pending(self, post_id, platform, pending: bool):
+        """Create or remove the marker that gets a post's media re-queued after a restart"""
+        marker = PENDING_MEDIA_DIR / self._archive_filename(post_id, platform)
+        if pending:
+            PENDING_MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+        else:
+            marker.unlink(missing_ok=True)
+
     def save_post_to_json(self, post_data, platform, user_context=None, user_hashtags=None):
-        """Save SocialMediaPost to JSON file with user attribution and media downloads"""
+        """Save SocialMediaPost to JSON file and database with provisional media links
+
+        Media files are downloaded later by _complete_media_archive; the
+        hosted URLs recorded here are where those files will be served.
+        Blocking - run it off the event loop.
+        """
         try:
-            # Create data directory if it doesn't exist
-            data_dir = Path("/home/ubuntu/social-media-archive-project/media_storage/data")
-            data_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Create media directory for downloads
-            media_dir = Path("/home/ubuntu/social-media-archive-project/media_storage/data/media")
-            media_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Download media files and update media objects
-            downloaded_media = []
-            if post_data.media:
-                import httpx
-                for i, media in enumerate(post_data.media):
-                    try:
-                        # Create filename for local storage
-                        # Extract file extension properly
-                        if media.media_type.value == 'video':
-                            file_extension = 'mp4'
-                        elif media.media_type.value == 'photo':
-                            file_extension = 'jpg'
-                        elif media.media_type.value == 'animated_gif':
-                            file_extension = 'gif'
-                        else:
-                            # Try to extract from URL
-                            import re
-                            ext_match = re.search(r'\.([a-zA-Z0-9]{2,4})(?:\?|$)', media.url)
-                            file_extension = ext_match.group(1) if ext_match else 'mp4'
-                        local_filename = f"{post_data.id}_media_{i}.{file_extension}"
-                        local_path = media_dir / local_filename
-                        
-                        # Download the media file
-                        with httpx.Client() as client:
-                            response = client.get(media.url, timeout=30)
-                            if response.status_code == 200:
-                                with open(local_path, 'wb') as f:
-                                    f.write(response.content)
-                                
-                                downloaded_media.append({
-                                    'url': media.url,
-                                    'type': media.media_type.value if hasattr(media.media_type, 'value') else str(media.media_type),
-                                    'width': media.width,
-                                    'height': media.height,
-                                    'mime_type': media.mime_type,
-                                    'local_path': str(local_path),
-                                    'hosted_url': f"https://ov-ab103a.infomaniak.ch/data/media/{local_filename}",
-                                    'file_size': local_path.stat().st_size if local_path.exists() else None
-                                })
-                                logger.info(f"Downloaded media file: {local_filename}")
-                                # Check if this is a Facebook video that needs audio merging
-                                if (post_data.platform.value == 'facebook' and 
-                                    media.media_type.value == 'video' and
-                                    hasattr(post_data, 'raw_data') and 
-                                    post_data.raw_data.get('_audio_stream')):
-                                    
-                                    # Download and merge audio
-                                    audio_url = post_data.raw_data['_audio_stream'].get('base_url')
-                                    if audio_url:
-                                        logger.info(f"Downloading audio stream for Facebook video...")
-                                        audio_path = local_path.parent / f"{post_data.id}_audio.mp4"
-                                        merged_path = local_path.parent / f"{post_data.id}_merged.mp4"
-                                        
-                                        try:
-                                            # Download audio
-                                            audio_response = client.get(audio_url, timeout=30)
-                                            if audio_response.status_code == 200:
-                                                with open(audio_path, 'wb') as f:
-                                                    f.write(audio_response.content)
-                                                
-                                                # Merge with ffmpeg
-                                                import subprocess
-                                                cmd = [
-                                                    'ffmpeg', '-i', str(local_path), '-i', str(audio_path),
-                                                    '-c:v', 'copy', '-c:a', 'copy', '-y', str(merged_path)
-                                                ]
-                                                result = subprocess.run(cmd, capture_output=True, text=True)
-                                                
-                                                if result.returncode == 0:
-                                                    # Replace original with merged
-                                                    import shutil
-                                                    shutil.move(str(merged_path), str(local_path))
-                                                    logger.info(f"Successfully merged video with audio")
-                                                    downloaded_media[-1]['merged'] = True
-                                                else:
-                                                    logger.error(f"Failed to merge: {result.stderr}")
-                                                
-                                                # Clean up
-                                                if audio_path.exists():
-                                                    audio_path.unlink()
-                                                if merged_path.exists():
-                                                    merged_path.unlink()
-                                                    
-                                        except Exception as merge_error:
-                                            logger.error(f"Failed to merge audio: {merge_error}")
-                                
-                            else:
-                                # Keep original if download fails
-                                downloaded_media.append({
-                                    'url': media.url,
-                                    'type': media.media_type.value if hasattr(media.media_type, 'value') else str(media.media_type),
-                                    'width': media.width,
-                                    'height': media.height,
-                                    'mime_type': media.mime_type,
-                                    'local_path': None,
-                                    'hosted_url': None,
-                                    'download_error': f"HTTP {response.status_code}"
-                                })
-                    except Exception as media_error:
-                        logger.error(f"Failed to download media {i}: {media_error}")
-                        downloaded_media.append({
-                            'url': media.url,
-                            'type': media.media_type.value if hasattr(media.media_type, 'value') else str(media.media_type),
-                            'width': media.width,
-                            'height': media.height,
-                            'mime_type': media.mime_type,
-                            'local_path': None,
-                            'hosted_url': None,
-                            'download_error': str(media_error)
-                        })
-            
-            # Convert SocialMediaPost to dictionary with enhanced data
-            post_dict = {
-                'id': post_data.id,
-                'platform': post_data.platform.value if hasattr(post_data.platform, 'value') else str(post_data.platform),
-                'url': post_data.url,
-                'text': post_data.text,
-                'author': {
-                    'username': post_data.author.username if post_data.author else None,
-                    'display_name': post_data.author.display_name if post_data.author else None,
-                    'followers_count': post_data.author.followers_count if post_data.author else 0,
-                    'verified': post_data.author.verified if post_data.author else False,
-                    'profile_url': post_data.author.profile_url if post_data.author else None,
-                    'avatar_url': post_data.author.avatar_url if post_data.author else None
-                },
-                'created_at': post_data.created_at.isoformat() if post_data.created_at else None,
-                'scraped_at': post_data.scraped_at.isoformat() if hasattr(post_data, 'scraped_at') and post_data.scraped_at else datetime.now().isoformat(),
-                'metrics': {
-                    'likes': post_data.metrics.likes if post_data.metrics else 0,
-                    'shares': post_data.metrics.shares if post_data.metrics else 0,
-                    'comments': post_data.metrics.comments if post_data.metrics else 0,
-                    'views': post_data.metrics.views if post_data.metrics else None
-                },
-                'media': downloaded_media,
-                'scraped_hashtags': post_data.scraped_hashtags if hasattr(post_data, 'scraped_hashtags') else [],
-                # NEW: User attribution and hashtags
-                'telegram_user': {
-                    'user_id': user_context.telegram_user_id if user_context else None,
-                    'username': user_context.telegram_username if user_context else None,
-                    'first_name': user_context.first_name if user_context else None,
-                    'last_name': user_context.last_name if user_context else None
-                } if user_context else None,
-                'user_notes': user_context.notes if user_context and user_context.notes else None,
-                'user_hashtags': user_hashtags or [],
-                'download_stats': {
-                    'total_media': len(downloaded_media),
-                    'successful_downloads': len([m for m in downloaded_media if m.get('local_path')]),
-                    'failed_downloads': len([m for m in downloaded_media if m.get('download_error')])
-                }
-            }
-            
-            # Save to JSON file
-            filename = f"tweet_{post_data.id}.json" if platform.value == 'twitter' else f"{platform.value}_{post_data.id}.json"
-            filepath = data_dir / filename
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(post_dict, f, ensure_ascii=False, indent=2, default=str)
-            
-            logger.info(f"Saved {platform.value} post {post_data.id} to {filepath}")
-            
-            # Also save to database
-            # Add user hashtags to post before saving
-            if user_hashtags:
-                post_data.user_hashtags = user_hashtags
-            
-            # Also save to database
-            if database_storage.save_post(post_data):
-                logger.info(f"Saved {platform.value} post {post_data.id} to database")
-            else:
-                logger.warning(f"Failed to save {platform.value} post {post_data.id} to database")
+            # Drop covers/soundtracks the platform policy doesn't archive
+            post_data.media = select_media(post_data.media or [], platform.value)
+            post_dict = self._build_post_dict(post_data, user_context, user_hashtags, self._build_media_entries(post_data))
+            if post_dict['media']:
+                self._mark_media_pending(post_data.id, platform, True)
+            self._write_post_json(post_dict, platform)
+            self._save_post_to_database(post_data, platform, user_hashtags)
             return post_dict
-            
+
         except Exception as e:
             logger.error(f"Failed to save post to JSON: {e}")
             return None
+
+    def _offloaded_record(self, entry):
+        """Inventory record of an entry whose file the tiering job moved to a cold tier"""
+        local_path = Path(entry['local_path'])
+        if local_path.exists():
+            return None
+        record = media_inventory.get(local_path)
+        return record if record and record['tier'] != LOCAL_TIER else None
+
+    async def _download_media_entry(self, session, entry):
+        """Download one media entry to its local path (revalidating it if already archived)"""
+        local_path = Path(entry['local_path'])
+        headers = conditional_headers(media_inventory.get(local_path)) if local_path.exists() else {}
+        async with session.get(entry['url'], headers=headers) as response:
+            if response.status == 304:
+                entry['file_size'] = local_path.stat().st_size
+                entry['not_modified'] = True
+                logger.info(f"Media file not modified: {local_path.name}")
+                return
+            if response.status != 200:
+                raise MediaDownloadError(f"HTTP {response.status}", entry['url'], response.status)
+            entry.update(response_validators(response))
+            sink = await write_response_to_file(response, local_path)
+
+        entry['file_size'] = sink.bytes_written
+        entry['sha256'] = sink.sha256
+        logger.info(f"Downloaded media file: {local_path.name}")
+
+    async def _stream_merge_facebook(self, session, post_data, entry):
+        """Fetch Facebook video and audio concurrently and merge them in one ffmpeg pass"""
+        audio_url = post_data.raw_data['_audio_stream'].get('base_url')
+        if not audio_url or not media_merger.streaming_supported:
+            return False
+
+        local_path = Path(entry['local_path'])
+        try:
+            async with session.get(entry['url']) as video_response, session.get(audio_url) as audio_response:
+                if video_response.status != 200 or audio_response.status != 200:
+                    logger.error(f"Failed to open Facebook streams: HTTP {video_response.status}/{audio_response.status}")
+                    return False
+                merged = await media_merger.merge_streams(
+                    video_response.content.iter_chunked(READ_CHUNK_SIZE),
+                    audio_response.content.iter_chunked(READ_CHUNK_SIZE),
+                    local_path,
+                    duration=entry.get('duration')
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Streaming merge failed for Facebook post {post_data.id}: {e}")
+            return False
+
+        if merged:
+            entry['merged'] = True
+            entry['file_size'] = local_path.stat().st_size
+            logger.info(f"Streamed and merged Facebook video: {local_path.name}")
+        return merged
+
+    async def _merge_facebook_audio(self, session, post_data, entry):
+        """Download the separate Facebook audio stream and merge it into the video"""
+        audio_url = post_data.raw_data['_audio_stream'].get('base_url')
+        if not audio_url:
+            return
+
+        local_path = Path(entry['local_path'])
+        logger.info(f"Downloading audio stream for Facebook video...")
+        audio_path = local_path.parent / f"{post_data.id}_audio.mp4"
+        merged_path = local_path.parent / f"{post_data.id}_merged.mp4"
+
+        try:
+            # Download audio
+            async with session.get(audio_url) as audio_response:
+                if audio_response.status != 200:
+                    logger.error(f"Failed to download audio stream: HTTP {audio_response.status}")
+                    return
+                await write_response_to_file(audio_response, audio_path)
+
+            # Merge with ffmpeg in the bounded process pool
+            if await media_merger.merge_video_audio(local_path, audio_path, merged_path, duration=entry.get('duration')):
+                # Replace original with merged
+                os.replace(merged_path, local_path)
+                logger.info(f"Successfully merged video with audio")
+                entry['merged'] = True
+                entry['file_size'] = local_path.stat().st_size
+            else:
+                logger.error(f"Failed to merge video and audio for post {post_data.id}")
+
+        except Exception as merge_error:
+            logger.error(f"Failed to merge audio: {merge_error}")
+        finally:
+            # Clean up
+            if audio_path.exists():
+                audio_path.unlink()
+            if merged_path.exists():
+                merged_path.unlink()
+
+    async def _download_post_media(self, post_data, media_entries):
+        """Download (and merge, for Facebook) all media entries of a post"""
+        MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+        timeout = aiohttp.ClientTimeout(total=MEDIA_DOWNLOAD_TIMEOUT)
+
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            def needs_audio_merge(entry):
+                return (post_data.platform.value == 'facebook' and
+                        entry['type'] == 'video' and
+                        hasattr(post_data, 'raw_data') and
+                        post_data.raw_data.get('_audio_stream'))
+
+            async def process(entry):
+                # Already archived and offloaded - keep serving the cold-tier copy
+                record = self._offloaded_record(entry)
+                if record:
+                    logger.info(f"Media file already archived in {record['tier']}: {entry['local_path']}")
+                    entry.update({
+                        'hosted_url': record['remote_url'],
+                        'file_size': record['size'],
+                        'sha256': record['sha256'],
+                        'download_status': 'success',
+                        'not_modified': True
+                    })
+                    return
+
+                # Facebook video + audio: merge while downloading when possible
+                if needs_audio_merge(entry) and await self._stream_merge_facebook(session, post_data, entry):
+                    entry['download_status'] = 'success'
+                    entry['faststart'] = True
+                    self._record_media_entry(post_data, entry)
+                    return
+
+                try:
+                    await self._download_media_entry(session, entry)
+                    entry['download_status'] = 'success'
+                    if entry.get('not_modified'):
+                        # Unchanged since the last archive - already merged/faststarted
+                        return
+                except Exception as media_error:
+                    logger.error(f"Failed to download media {entry['url']}: {media_error}")
+                    entry.update({
+                        'local_path': None,
+                        'hosted_url': None,
+                        'download_status': 'failed',
+                        'download_error': str(media_error)
+                    })
+                    return
+
+                # Check if this is a Facebook video that needs audio merging
+                if needs_audio_merge(entry):
+                    await self._merge_facebook_audio(session, post_data, entry)
+
+                # Move the moov atom to the front so hosted videos start playing immediately
+                if entry.get('merged'):
+                    entry['faststart'] = True
+                elif entry['type'] in ('video', 'animated_gif'):
+                    entry['faststart'] = await media_merger.ensure_faststart(Path(entry['local_path']))
+                    if entry['faststart']:
+                        entry['file_size'] = Path(entry['local_path']).stat().st_size
+
+                self._record_media_entry(post_data, entry)
+
+            await asyncio.gather(*(process(entry) for entry in media_entries))
+
+        # Fill in real dimensions, duration, codecs and bitrate
+        await media_probe.probe_results(media_entries)
+
+    def _record_media_entry(self, post_data, entry):
+        """Add a downloaded media entry to the media inventory"""
+        media_inventory.add(
+            entry['local_path'],
+            entry['file_size'],
+            media_category(entry['type']),
+            post_data.platform.value,
+            entry.get('sha256'),
+            etag=entry.get('etag'),
+            last_modified=entry.get('last_modified'),
+            content_length=entry.get('content_length')
+        )
+
+    async def _complete_media_archive(self, update: Update, platform, post_data, user_context, user_hashtags, processing_msg, post_dict):
+        """Phase 2 of archiving: download media, update JSON/DB records and the reply message (if any)"""
+        media_entries = post_dict['media']
+        await self._download_post_media(post_data, media_entries)
+
+        # Record final media locations on the post
+        for media, entry in zip(post_data.media, media_entries):
+            media.local_path = entry.get('local_path')
+            media.hosted_url = entry.get('hosted_url')
+            media.file_size = entry.get('file_size')
+            for field in PROBE_FIELDS:
+                if entry.get(field) is not None:
+                    setattr(media, field, entry[field])
+            media.download_metadata.update({
+                'status': entry.get('download_status'),
+                'error': entry.get('download_error'),
+                'faststart': entry.get('faststart', False),
+                'etag': entry.get('etag'),
+                'last_modified': entry.get('last_modified'),
+                'content_length': entry.get('content_length')
+            })
+
+        post_dict['download_stats'] = self._download_stats(media_entries)
+        await asyncio.to_thread(self._write_post_json, post_dict, platform)
+        # Phase 1 already recorded this archive's metrics; only the media entries change
+        await asyncio.to_thread(self._save_post_to_database, post_data, platform, user_hashtags, False)
+        await asyncio.to_thread(self._mark_media_pending, post_data.id, platform, False)
+
+        if processing_msg is not None:
+            await self._send_success_response(update, platform, post_data, user_hashtags, processing_msg, post_dict)
+
+    def _load_pending_archives(self):
+        """Archived posts whose media downloads never finished (e.g. the bot restarted)"""
+        if not PENDING_MEDIA_DIR.is_dir():
+            # First start with markers: find posts left pending by earlier runs
+            PENDING_MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+            for path in DATA_DIR.glob('*.json'):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        if json.load(f).get('download_stats', {}).get('pending_downloads'):
+                            (PENDING_MEDIA_DIR / path.name).touch()
+                except (OSError, ValueError, AttributeError):
+                    continue
+
+        pending = []
+        for marker in PENDING_MEDIA_DIR.glob('*.json'):
+            path = DATA_DIR / marker.name
+            try:
+                post_data = load_archive_post(path)
+                with open(path, 'r', encoding='utf-8') as f:
+                    post_dict = json.load(f)
+            except FileNotFoundError:
+                marker.unlink(missing_ok=True)
+                continue
+            except Exception as e:
+                logger.error(f"Cannot resume media downloads for {path}: {e}")
+                continue
+            if post_data is None or len(post_data.media) != len(post_dict.get('media') or []):
+                logger.error(f"Cannot resume media downloads for {path}: media entries do not match")
+                continue
+            pending.append((post_data, post_dict))
+        return pending
+
+    async def resume_pending_media(self):
+        """Re-queue media downloads that were pending when the bot last stopped"""
+        pending = await asyncio.to_thread(self._load_pending_archives)
+        for post_data, post_dict in pending:
+            await self.media_queue.submit(
+                lambda post_data=post_data, post_dict=post_dict: self._complete_media_archive(
+                    None, post_data.platform, post_data, post_data.user_context,
+                    post_dict.get('user_hashtags') or [], None, post_dict
+                ),
+                f"resumed {post_data.platform.value} media for post {post_data.id}"
+            )
+        if pending:
+            logger.info(f"Resumed media downloads for {len(pending)} archived posts")
+
     async def _send_success_response(self, update: Update, platform, post_data, user_hashtags: list, processing_msg, json_result=None):
         """Send detailed success response with proper SocialMediaPost object access"""
         try:
@@ -496,7 +734,7 @@ Send me a URL from any supported platform to get started.
             author_name = post_data.author.display_name if post_data.author else 'Unknown'
             post_id = post_data.id
             tweet_text = post_data.text
-            created_at = post_data.created_at
+            created_at = post_data.created_at or 'unknown'
             
             # Get metrics from the metrics object
             likes = post_data.metrics.likes if post_data.metrics else 0
@@ -522,8 +760,10 @@ Send me a URL from any supported platform to get started.
             ]
             
             # Add media download links if available
+            media_links = []
+            media_pending = False
             if json_result and isinstance(json_result, dict) and 'media' in json_result:
-                            media_links = []
+                            media_pending = json_result.get('download_stats', {}).get('pending_downloads', 0) > 0
                             downloaded_media = json_result.get('media', [])
                             
                             for i, media_info in enumerate(downloaded_media):
@@ -568,6 +808,8 @@ Send me a URL from any supported platform to get started.
                         "📥 Media Downloads:"
                     ])
                     response_parts.extend([f"  {link}" for link in media_links])
+                    if media_pending:
+                        response_parts.append("  ⏳ Media is still downloading - links will work shortly and this message will update when done.")
             
             # Add JSON storage link
             response_parts.extend([
@@ -626,6 +868,10 @@ Send me a URL from any supported platform to get started.
         await self.application.initialize()
         await self.application.start()
         
+        # Start background media workers and pick up downloads cut short by a restart
+        self.media_queue.start()
+        await self.resume_pending_media()
+        
         # Set webhook
         await self.application.bot.set_webhook(url=self.webhook_url)
         logger.info(f"Webhook set to: {self.webhook_url}")
@@ -646,9 +892,25 @@ Send me a URL from any supported platform to get started.
         platforms = self.platform_manager.get_supported_platforms()
         logger.info(f"Multi-platform support: {', '.join(platforms)}")
         
-        # Keep running
-        while True:
-            await asyncio.sleep(1)
+        # Keep running until SIGINT/SIGTERM
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        try:
+            await stop_event.wait()
+        finally:
+            await self.shutdown(runner)
+
+    async def shutdown(self, runner):
+        """Stop taking updates, then let queued media jobs finish"""
+        logger.info("Shutting down")
+        await runner.cleanup()
+        # Jobs still queued after the timeout stay marked pending and resume on the next start
+        await self.media_queue.stop(drain=True, timeout=MEDIA_QUEUE_DRAIN_TIMEOUT)
+        await self.application.stop()
+        await self.application.shutdown()
+        await asyncio.to_thread(database_storage.flush)
 
 async def main():
     """Main function"""
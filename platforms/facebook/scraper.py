@@ -14,9 +14,10 @@ from urllib.parse import urlparse, quote
 from core.base_scraper import BaseScraper
 from core.data_models import (
     Platform, SocialMediaPost, UserContext, MediaItem, 
-    MediaType, AuthorInfo, PostMetrics
+    MediaType, MediaRole, AuthorInfo, PostMetrics
 )
 from core.exceptions import ScrapingError
+from core.quality_policy import VideoVariant, quality_policy
 
 logger = logging.getLogger(__name__)
 
@@ -106,7 +107,25 @@ class FacebookScraper(BaseScraper):
             logger.error(f"Request error: {str(e)}")
             raise ScrapingError(f"Network error fetching Facebook content: {str(e)}")
     
-    def parse_media_items(self, data: Dict[str, Any]) -> List[MediaItem]:
+    def _choose_representation(self, representations: List[Dict[str, Any]], duration: Optional[float],
+                               preserve_original: bool) -> Optional[Dict[str, Any]]:
+        """Pick one video representation under the quality policy"""
+        chosen = quality_policy.choose(
+            [
+                VideoVariant(
+                    url=rep.get('base_url', ''),
+                    width=rep.get('width'),
+                    height=rep.get('height'),
+                    bitrate=rep.get('bandwidth'),
+                    source=rep
+                ) for rep in representations
+            ],
+            duration=duration,
+            preserve_original=preserve_original
+        )
+        return chosen.source if chosen else None
+    
+    def parse_media_items(self, data: Dict[str, Any], preserve_original: bool = False) -> List[MediaItem]:
         """Parse media items from Facebook data"""
         media_items = []
         
@@ -125,10 +144,13 @@ class FacebookScraper(BaseScraper):
                     # Mark in raw_data if this needs merging
                     data['_needs_stream_merge'] = bool(video_streams and audio_streams)
                     
-                    if video_streams and audio_streams:
+                    # Pick the video rendition under the quality policy
+                    best_video = self._choose_representation(
+                        video_streams, data.get('playable_duration_s'), preserve_original
+                    )
+                    
+                    if best_video and audio_streams:
                         # We have separate streams - store both for merging
-                        # Get best quality video
-                        best_video = max(video_streams, key=lambda x: (x.get('height', 0), x.get('bandwidth', 0)))
                         audio_stream = audio_streams[0]  # Usually only one audio stream
                         
                         # Store stream info in raw data for downloader
@@ -143,9 +165,9 @@ class FacebookScraper(BaseScraper):
                             height=best_video.get('height'),
                             duration=data.get('playable_duration_s')
                         ))
-                    elif video_streams:
+                    elif best_video:
                         # Only video (might have embedded audio)
-                        best_video = max(video_streams, key=lambda x: (x.get('height', 0), x.get('bandwidth', 0)))
+                        data['_video_stream'] = best_video
                         media_items.append(MediaItem(
                             url=best_video.get('base_url', ''),
                             media_type=MediaType.VIDEO,
@@ -160,8 +182,10 @@ class FacebookScraper(BaseScraper):
                 if reps_data:
                     # Filter out audio-only and get best quality video
                     video_reps = [r for r in reps_data if isinstance(r, dict) and r.get('height', 0) > 0]
-                    if video_reps:
-                        best_video = max(video_reps, key=lambda x: x.get('bandwidth', 0))
+                    best_video = self._choose_representation(
+                        video_reps, data.get('length_in_second', data.get('playable_duration_s')), preserve_original
+                    )
+                    if best_video:
                         media_items.append(MediaItem(
                             url=best_video.get('base_url', ''),
                             media_type=MediaType.VIDEO,
@@ -174,7 +198,8 @@ class FacebookScraper(BaseScraper):
             if 'thumbnail_uri' in data:
                 media_items.append(MediaItem(
                     url=data['thumbnail_uri'],
-                    media_type=MediaType.PHOTO
+                    media_type=MediaType.PHOTO,
+                    role=MediaRole.POSTER
                 ))
         
         elif post_type == 'photo_post':
@@ -231,7 +256,9 @@ class FacebookScraper(BaseScraper):
         scraped_hashtags = re.findall(r'#(\w+)', text)
         
         # Parse media items
-        media_items = self.parse_media_items(data)
+        media_items = self.parse_media_items(
+            data, preserve_original=bool(user_context and user_context.preserve_original)
+        )
         
         # Get post ID and timestamp
         post_id = data.get('post_id', self.extract_post_id(url))
@@ -241,7 +268,8 @@ class FacebookScraper(BaseScraper):
         if timestamp:
             created_at = datetime.fromtimestamp(int(timestamp))
         else:
-            created_at = datetime.now()
+            # Unknown; not the scrape time, which differs on every re-archive
+            created_at = None
         
         # Store reaction breakdown in raw_data
         data['reaction_breakdown'] = reactions
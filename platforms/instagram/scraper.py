@@ -14,9 +14,10 @@ from urllib.parse import urlparse
 from core.base_scraper import BaseScraper
 from core.data_models import (
     Platform, SocialMediaPost, UserContext, MediaItem, 
-    MediaType, AuthorInfo, PostMetrics
+    MediaType, MediaRole, AuthorInfo, PostMetrics
 )
 from core.exceptions import ScrapingError
+from core.quality_policy import VideoVariant, quality_policy
 
 logger = logging.getLogger(__name__)
 
@@ -100,7 +101,24 @@ class InstagramScraper(BaseScraper):
             logger.error(f"Request error: {str(e)}")
             raise ScrapingError(f"Network error fetching Instagram content: {str(e)}")
     
-    def parse_media_items(self, data: Dict[str, Any]) -> List[MediaItem]:
+    def _choose_version(self, video_versions: List[Dict[str, Any]], duration: Optional[float],
+                        preserve_original: bool) -> Optional[Dict[str, Any]]:
+        """Pick one entry of video_versions under the quality policy"""
+        chosen = quality_policy.choose(
+            [
+                VideoVariant(
+                    url=version.get('url'),
+                    width=version.get('width'),
+                    height=version.get('height'),
+                    source=version
+                ) for version in video_versions
+            ],
+            duration=duration,
+            preserve_original=preserve_original
+        )
+        return chosen.source if chosen else None
+    
+    def parse_media_items(self, data: Dict[str, Any], preserve_original: bool = False) -> List[MediaItem]:
         """Parse media items from Instagram data"""
         media_items = []
         
@@ -125,9 +143,8 @@ class InstagramScraper(BaseScraper):
             # Get video versions
             if 'video_versions' in data:
                 video_versions = data['video_versions']
-                if video_versions:
-                    # Get the best quality video
-                    best_video = video_versions[0]  # Usually ordered by quality
+                best_video = self._choose_version(video_versions, data.get('video_duration'), preserve_original)
+                if best_video:
                     media_items.append(MediaItem(
                         url=best_video['url'],
                         media_type=MediaType.VIDEO,
@@ -145,7 +162,8 @@ class InstagramScraper(BaseScraper):
                         url=thumbnail['url'],
                         media_type=MediaType.PHOTO,
                         width=thumbnail.get('width'),
-                        height=thumbnail.get('height')
+                        height=thumbnail.get('height'),
+                        role=MediaRole.POSTER
                     ))
         
         elif media_type == 8:  # Carousel (multiple media)
@@ -165,8 +183,10 @@ class InstagramScraper(BaseScraper):
                                     height=best_image.get('height')
                                 ))
                     elif item_type == 2:  # Video
-                        if 'video_versions' in item:
-                            video = item['video_versions'][0]
+                        video = self._choose_version(
+                            item.get('video_versions', []), item.get('video_duration'), preserve_original
+                        )
+                        if video:
                             media_items.append(MediaItem(
                                 url=video['url'],
                                 media_type=MediaType.VIDEO,
@@ -210,7 +230,9 @@ class InstagramScraper(BaseScraper):
         scraped_hashtags = re.findall(r'#(\w+)', text)
         
         # Parse media items
-        media_items = self.parse_media_items(data)
+        media_items = self.parse_media_items(
+            data, preserve_original=bool(user_context and user_context.preserve_original)
+        )
         
         # Get post ID and timestamps
         post_id = data.get('code', self.extract_post_id(url))
@@ -220,7 +242,8 @@ class InstagramScraper(BaseScraper):
         if taken_at:
             created_at = datetime.fromtimestamp(int(taken_at))
         else:
-            created_at = datetime.now()
+            # Unknown; not the scrape time, which differs on every re-archive
+            created_at = None
         
         return SocialMediaPost(
             id=post_id,
@@ -14,9 +14,10 @@ from urllib.parse import urlparse, quote
 from core.base_scraper import BaseScraper
 from core.data_models import (
     Platform, SocialMediaPost, UserContext, MediaItem, 
-    MediaType, AuthorInfo, PostMetrics
+    MediaType, MediaRole, AuthorInfo, PostMetrics
 )
 from core.exceptions import ScrapingError
+from core.quality_policy import VideoVariant, quality_policy
 
 logger = logging.getLogger(__name__)
 
@@ -90,40 +91,34 @@ class TikTokScraper(BaseScraper):
             logger.error(f"Request error: {str(e)}")
             raise ScrapingError(f"Network error fetching TikTok content: {str(e)}")
     
-    def parse_media_items(self, data: Dict[str, Any]) -> List[MediaItem]:
+    def parse_media_items(self, data: Dict[str, Any], preserve_original: bool = False) -> List[MediaItem]:
         """Parse media items from TikTok data"""
         media_items = []
         
-        # Get the best quality video available
-        video_url = None
-        video_size = None
-        
-        if 'hdplay' in data and data['hdplay']:
-            # HD video available
-            video_url = data['hdplay']
-            video_size = data.get('hd_size')
-        elif 'play' in data and data['play']:
-            # Standard quality video (no watermark)
-            video_url = data['play']
-            video_size = data.get('size')
-        elif 'wmplay' in data and data['wmplay']:
+        # HD and standard quality (no watermark); pick one under the quality policy
+        variants = [
+            VideoVariant(url=data.get('hdplay'), size=data.get('hd_size')),
+            VideoVariant(url=data.get('play'), size=data.get('size')),
+        ]
+        video = quality_policy.choose(variants, duration=data.get('duration'), preserve_original=preserve_original)
+        if not video and data.get('wmplay'):
             # Watermarked video as fallback
-            video_url = data['wmplay']
-            video_size = data.get('wm_size')
+            video = VideoVariant(url=data['wmplay'], size=data.get('wm_size'))
         
-        if video_url:
+        if video:
             media_items.append(MediaItem(
-                url=video_url,
+                url=video.url,
                 media_type=MediaType.VIDEO,
                 duration=data.get('duration'),
-                file_size=video_size
+                file_size=video.size
             ))
         
         # Add cover/thumbnail
         if 'cover' in data:
             media_items.append(MediaItem(
                 url=data['cover'],
-                media_type=MediaType.PHOTO
+                media_type=MediaType.PHOTO,
+                role=MediaRole.POSTER
             ))
         
         # Add music/audio if available
@@ -131,7 +126,8 @@ class TikTokScraper(BaseScraper):
             media_items.append(MediaItem(
                 url=data['music'],
                 media_type=MediaType.AUDIO,
-                duration=data.get('music_info', {}).get('duration')
+                duration=data.get('music_info', {}).get('duration'),
+                role=MediaRole.SOUNDTRACK
             ))
         
         return media_items
@@ -164,7 +160,9 @@ class TikTokScraper(BaseScraper):
         scraped_hashtags = re.findall(r'#(\w+)', text)
         
         # Parse media items
-        media_items = self.parse_media_items(data)
+        media_items = self.parse_media_items(
+            data, preserve_original=bool(user_context and user_context.preserve_original)
+        )
         
         # Get post ID
         post_id = data.get('id', data.get('aweme_id', self.extract_post_id(url)))
@@ -174,7 +172,8 @@ class TikTokScraper(BaseScraper):
         if create_time:
             created_at = datetime.fromtimestamp(int(create_time))
         else:
-            created_at = datetime.now()
+            # Unknown; not the scrape time, which differs on every re-archive
+            created_at = None
         
         # Store additional TikTok-specific data
         data['music_info'] = data.get('music_info', {})
@@ -15,6 +15,7 @@ from core.data_models import (
     PostMetrics, MediaItem, MediaType
 )
 from core.exceptions import ScrapingError
+from core.quality_policy import VideoVariant, quality_policy
 
 logger = logging.getLogger(__name__)
 
@@ -93,7 +94,9 @@ class TwitterScraper(BaseScraper):
             post.scraped_hashtags = self._extract_hashtags_from_text(post.text)
             
             # Extract media with enhanced metadata
-            post.media = self._extract_media(tweet)
+            post.media = self._extract_media(
+                tweet, preserve_original=bool(user_context and user_context.preserve_original)
+            )
             
             # Store raw Twitter data
             post.raw_data = {
@@ -127,7 +130,19 @@ class TwitterScraper(BaseScraper):
         hashtags = re.findall(hashtag_pattern, text, re.IGNORECASE)
         return [f"#{tag}" for tag in hashtags]
     
-    def _extract_media(self, tweet) -> List[MediaItem]:
+    def _video_variant(self, variant) -> VideoVariant:
+        """Describe a twscrape video variant; the rendition size is part of its URL (.../1280x720/...)"""
+        url = getattr(variant, 'url', None)
+        size_match = re.search(r'/(\d+)x(\d+)/', url or '')
+        return VideoVariant(
+            url=url,
+            width=int(size_match.group(1)) if size_match else None,
+            height=int(size_match.group(2)) if size_match else None,
+            bitrate=getattr(variant, 'bitrate', None) or None,
+            source=variant
+        )
+    
+    def _extract_media(self, tweet, preserve_original: bool = False) -> List[MediaItem]:
         """Extract media items from tweet with enhanced metadata"""
         media_items = []
         
@@ -168,22 +183,22 @@ class TwitterScraper(BaseScraper):
             if hasattr(tweet.media, 'videos') and tweet.media.videos:
                 for video in tweet.media.videos:
                     media_url = None
+                    chosen = None
                     
                     if hasattr(video, 'variants') and video.variants:
-                        # Find best quality variant (highest bitrate)
-                        video_variants = [v for v in video.variants 
+                        # Pick a variant under the quality policy (evidence posts keep the highest bitrate)
+                        video_variants = [self._video_variant(v) for v in video.variants 
                                         if getattr(v, 'contentType', '').startswith('video/')]
-                        if video_variants:
-                            best_variant = max(video_variants,
-                                             key=lambda v: getattr(v, "bitrate", 0) if getattr(v, "bitrate", None) else 0)
-                            media_url = getattr(best_variant, "url", None)
+                        chosen = quality_policy.choose(video_variants, preserve_original=preserve_original)
+                        if chosen:
+                            media_url = chosen.url
                     
                     if media_url:
                         media_items.append(MediaItem(
                             url=media_url,
                             media_type=MediaType.VIDEO,
-                            width=getattr(video, 'width', None),
-                            height=getattr(video, 'height', None),
+                            width=(chosen and chosen.width) or getattr(video, 'width', None),
+                            height=(chosen and chosen.height) or getattr(video, 'height', None),
                             duration=getattr(video, 'duration', None),
                             mime_type='video/mp4'  # Default for Twitter videos
                         ))
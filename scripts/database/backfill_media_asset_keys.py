@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Database Migration Script - Media Asset Keys
+Fills media_files.asset_key for existing rows, merges rows that are the same
+asset under different signed URLs, and creates the (post_id, asset_key)
+unique index used as the upsert conflict target. On installations that
+started on tweets, run it before migrate_to_unified_schema.sql: that
+migration deduplicates media rows by asset key and refuses to run while
+keys are missing
+"""
+
+import os
+import sys
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.url_normalizer import asset_key
+
+# Load environment variables
+load_dotenv()
+
+BATCH_SIZE = 5000
+
+
+def run_migration():
+    """Backfill asset keys and deduplicate media_files"""
+    try:
+        conn = psycopg2.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            user=os.getenv('DB_USER', 'postgres'),
+            password=os.getenv('DB_PASSWORD', ''),
+            port=os.getenv('DB_PORT', 5432),
+            database=os.getenv('DB_NAME', 'social_media_archive')
+        )
+        cursor = conn.cursor()
+
+        print("🔄 Running Media Asset Key Migration...")
+
+        cursor.execute("ALTER TABLE media_files ADD COLUMN IF NOT EXISTS asset_key TEXT;")
+        cursor.execute("""
+            SELECT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'media_files' AND column_name = 'post_id'
+            )
+        """)
+        has_post_id = cursor.fetchone()[0]
+        conn.commit()
+
+        # Keys are staged first so duplicates are removed before any row gets
+        # a key the unique index would reject
+        cursor.execute("CREATE TEMP TABLE media_asset_keys (id INTEGER PRIMARY KEY, asset_key TEXT NOT NULL)")
+
+        read_cursor = conn.cursor(name='asset_key_backfill')
+        read_cursor.itersize = BATCH_SIZE
+        read_cursor.execute("SELECT id, original_url FROM media_files WHERE asset_key IS NULL")
+
+        computed = 0
+        write_cursor = conn.cursor()
+        while True:
+            rows = read_cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            execute_values(write_cursor, "INSERT INTO media_asset_keys VALUES %s",
+                           [(row_id, asset_key(url)) for row_id, url in rows])
+            computed += len(rows)
+            print(f"  Computed {computed} asset keys...")
+        read_cursor.close()
+
+        if has_post_id:
+            # Keep one row per (post_id, asset_key): prefer downloaded, then newest
+            write_cursor.execute("""
+                DELETE FROM media_files m
+                USING (
+                    SELECT m.id, ROW_NUMBER() OVER (
+                        PARTITION BY m.post_id, COALESCE(m.asset_key, k.asset_key)
+                        ORDER BY (m.local_path IS NOT NULL) DESC, m.downloaded_at DESC NULLS LAST, m.id DESC
+                    ) AS rank
+                    FROM media_files m
+                    LEFT JOIN media_asset_keys k ON k.id = m.id
+                    WHERE m.post_id IS NOT NULL AND COALESCE(m.asset_key, k.asset_key) IS NOT NULL
+                ) ranked
+                WHERE m.id = ranked.id AND ranked.rank > 1;
+            """)
+            print(f"  ✅ Removed {write_cursor.rowcount} duplicate media rows")
+
+        write_cursor.execute("""
+            UPDATE media_files AS m SET asset_key = k.asset_key
+            FROM media_asset_keys k
+            WHERE m.id = k.id AND m.asset_key IS NULL
+        """)
+        print(f"  ✅ Backfilled {write_cursor.rowcount} rows")
+
+        if has_post_id:
+            write_cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_media_files_post_asset_key
+                ON media_files(post_id, asset_key);
+            """)
+            print("  ✅ Created unique index on (post_id, asset_key)")
+        else:
+            print("  ℹ️  media_files has no post_id yet - migrate_to_unified_schema.sql deduplicates and indexes it")
+        conn.commit()
+
+        write_cursor.close()
+        cursor.close()
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+
+def main():
+    print("🚀 Media Asset Key Migration Script")
+    print("=" * 50)
+
+    if not run_migration():
+        sys.exit(1)
+
+    print("\n📝 Re-scraped posts now update their existing media rows instead of adding new ones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Database Migration Script - Post Languages
+Detects the language of posts archived before language detection and
+rebuilds their search vectors (content, user notes and hashtags, in the
+post's language) through the update_search_vector trigger. Run after
+create_unified_schema.sql; it commits per batch and can be re-run
+"""
+
+import os
+import sys
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.language import detect_language
+
+# Load environment variables
+load_dotenv()
+
+BATCH_SIZE = 2000
+
+
+def run_migration():
+    """Detect languages and rebuild search vectors in (platform, id) order"""
+    try:
+        conn = psycopg2.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            user=os.getenv('DB_USER', 'postgres'),
+            password=os.getenv('DB_PASSWORD', ''),
+            port=os.getenv('DB_PORT', 5432),
+            database=os.getenv('DB_NAME', 'social_media_archive')
+        )
+        cursor = conn.cursor()
+
+        print("🔄 Running Post Language Migration...")
+
+        last_key = ('', '')
+        updated = 0
+        while True:
+            cursor.execute("""
+                SELECT platform, id, created_at, content, raw_data->>'user_notes'
+                FROM social_media_posts
+                WHERE language IS NULL AND (platform, id) > (%s, %s)
+                ORDER BY platform, id
+                LIMIT %s
+            """, last_key + (BATCH_SIZE,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            # Setting language (even to NULL) fires the trigger that rebuilds search_vector
+            execute_values(cursor, """
+                UPDATE social_media_posts AS p SET language = v.language
+                FROM (VALUES %s) AS v(platform, id, created_at, language)
+                WHERE p.platform = v.platform AND p.id = v.id
+                  AND p.created_at IS NOT DISTINCT FROM v.created_at::TIMESTAMPTZ
+            """, [
+                (platform, post_id, created_at, detect_language(content, notes))
+                for platform, post_id, created_at, content, notes in rows
+            ])
+            conn.commit()
+
+            updated += len(rows)
+            last_key = (rows[-1][0], rows[-1][1])
+            print(f"  Processed {updated} posts...")
+
+        print(f"  ✅ Detected languages and rebuilt search vectors for {updated} posts")
+
+        cursor.execute("""
+            SELECT COALESCE(language, 'unknown'), count(*) FROM social_media_posts
+            GROUP BY 1 ORDER BY 2 DESC
+        """)
+        for language, count in cursor.fetchall():
+            print(f"     {language}: {count}")
+
+        cursor.close()
+        conn.close()
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+
+def main():
+    print("🚀 Post Language Migration Script")
+    print("=" * 50)
+
+    if not run_migration():
+        sys.exit(1)
+
+    print("\n📝 Searches now match content, notes and hashtags in each post's language")
+
+
+if __name__ == "__main__":
+    main()
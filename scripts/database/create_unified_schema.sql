@@ -2,11 +2,18 @@
 -- Supports Twitter, Instagram, TikTok, Facebook, and future platforms
 
 -- Create the unified posts table if it doesn't exist
+-- Partitioned by platform, then by year of created_at (see
+-- ensure_post_partitions below), so "platform X between dates" queries only
+-- touch the matching partitions and old years can be detached whole.
+-- Installations created before partitioning keep their plain table until
+-- scripts/database/partition_posts.py migrates it.
 CREATE TABLE IF NOT EXISTS social_media_posts (
-    id VARCHAR(255) PRIMARY KEY,
+    id VARCHAR(255) NOT NULL,
     platform VARCHAR(50) NOT NULL CHECK (platform IN ('twitter', 'instagram', 'tiktok', 'facebook', 'other')),
     url TEXT NOT NULL,
     content TEXT,
+    -- ISO 639-1 code detected at ingest (core/language.py), NULL if unknown
+    language VARCHAR(8),
     
     -- Author information
     author_username VARCHAR(255),
@@ -40,11 +47,23 @@ CREATE TABLE IF NOT EXISTS social_media_posts (
     -- Full platform-specific data
     raw_data JSONB,
     
-    -- Search
-    search_vector tsvector,
+    -- Hashes of the refreshable columns; re-archives with equal hashes are skipped
+    content_hashes JSONB,
     
-    CONSTRAINT unique_platform_id UNIQUE (platform, id)
-);
+    -- Search
+    search_vector tsvector
+) PARTITION BY LIST (platform);
+
+-- Existing installations
+ALTER TABLE social_media_posts ADD COLUMN IF NOT EXISTS content_hashes JSONB;
+ALTER TABLE social_media_posts ADD COLUMN IF NOT EXISTS language VARCHAR(8);
+
+-- Upsert conflict target of every writer. A unique key on a partitioned
+-- table must contain the partition columns; posts without a created_at
+-- (kept in the DEFAULT partitions) are still unique per (platform, id).
+-- Needs PostgreSQL 15+
+CREATE UNIQUE INDEX IF NOT EXISTS social_media_posts_post_key
+    ON social_media_posts (platform, id, created_at) NULLS NOT DISTINCT;
 
 -- Create indexes
 CREATE INDEX IF NOT EXISTS idx_posts_platform ON social_media_posts(platform);
@@ -55,21 +74,141 @@ CREATE INDEX IF NOT EXISTS idx_posts_telegram_user ON social_media_posts(telegra
 CREATE INDEX IF NOT EXISTS idx_posts_metrics ON social_media_posts USING GIN(metrics);
 CREATE INDEX IF NOT EXISTS idx_posts_search ON social_media_posts USING GIN(search_vector);
 
+-- Create each platform's partition (sub-partitioned by created_at, with a
+-- DEFAULT partition for undated posts) and its yearly partitions, from the
+-- year of the platform's oldest post (or `first_year`, if earlier) to
+-- `years_ahead` years ahead. Posts of a year that has no partition yet
+-- (e.g. bulk-imported old posts) wait in the DEFAULT partition and are
+-- moved into their year's partition when it is created. Partition names
+-- always start with social_media_posts_, also when partition_posts.py
+-- builds them under its staging table. Does nothing while `parent` is not
+-- partitioned. Called by the writers once a month, see core/partitions.py
+CREATE OR REPLACE FUNCTION ensure_post_partitions(
+    years_ahead INTEGER DEFAULT 1,
+    parent TEXT DEFAULT 'social_media_posts',
+    first_year INTEGER DEFAULT NULL
+) RETURNS void AS $$
+DECLARE
+    platform_name TEXT;
+    platform_table TEXT;
+    default_table TEXT;
+    year_table TEXT;
+    current_year INTEGER := extract(year FROM NOW())::INTEGER;
+    oldest_year INTEGER;
+    partition_year INTEGER;
+    year_start DATE;
+    year_end DATE;
+    waiting BOOLEAN;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(parent)) THEN
+        RETURN;
+    END IF;
+
+    -- One caller at a time; the others find the partitions in place
+    PERFORM pg_advisory_xact_lock(hashtext('ensure_post_partitions'));
+
+    FOREACH platform_name IN ARRAY ARRAY['twitter', 'instagram', 'tiktok', 'facebook', 'other'] LOOP
+        platform_table := 'social_media_posts_' || platform_name;
+        default_table := platform_table || '_default';
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES IN (%L) PARTITION BY RANGE (created_at)',
+            platform_table, parent, platform_name
+        );
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I DEFAULT', default_table, platform_table);
+
+        EXECUTE format('SELECT extract(year FROM min(created_at))::INTEGER FROM %I', platform_table)
+            INTO oldest_year;
+
+        -- LEAST ignores NULLs
+        FOR partition_year IN LEAST(first_year, oldest_year, current_year)..current_year + years_ahead LOOP
+            year_table := platform_table || '_' || partition_year;
+            CONTINUE WHEN to_regclass(year_table) IS NOT NULL;
+
+            year_start := make_date(partition_year, 1, 1);
+            year_end := make_date(partition_year + 1, 1, 1);
+            EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE created_at >= %L AND created_at < %L)',
+                           default_table, year_start, year_end)
+                INTO waiting;
+
+            IF waiting THEN
+                -- A new partition may not overlap rows in DEFAULT: detach it,
+                -- move that year's posts over, re-attach it
+                EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', platform_table, default_table);
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               year_table, platform_table, year_start, year_end);
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM %I WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    default_table, year_start, year_end, year_table
+                );
+                EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', platform_table, default_table);
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               year_table, platform_table, year_start, year_end);
+            END IF;
+        END LOOP;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_post_partitions(1);
+
+-- Text search configuration for a post language (ISO 639-1, see
+-- core/language.py). Languages PostgreSQL has no stemmer for (Hebrew,
+-- Persian, ...) are indexed unstemmed
+CREATE OR REPLACE FUNCTION search_config(language TEXT) RETURNS regconfig AS $$
+    SELECT (CASE language
+        WHEN 'ar' THEN 'arabic'
+        WHEN 'en' THEN 'english'
+        WHEN 'fr' THEN 'french'
+        WHEN 'de' THEN 'german'
+        WHEN 'es' THEN 'spanish'
+        WHEN 'it' THEN 'italian'
+        WHEN 'pt' THEN 'portuguese'
+        WHEN 'nl' THEN 'dutch'
+        WHEN 'tr' THEN 'turkish'
+        WHEN 'ru' THEN 'russian'
+        WHEN 'el' THEN 'greek'
+        ELSE 'simple'
+    END)::regconfig
+$$ LANGUAGE sql STABLE;
+
+-- Search query for web-style input ("quoted phrases", or, -excluded) in
+-- `language`, guessed from the query's script when NULL. OR-ed with the
+-- unstemmed query, so hashtags and exact word forms match in every language
+CREATE OR REPLACE FUNCTION search_query(query TEXT, language TEXT DEFAULT NULL) RETURNS tsquery AS $$
+    SELECT websearch_to_tsquery(search_config(COALESCE(language, CASE
+               WHEN query ~ '[\u0600-\u06FF]' THEN 'ar'
+               WHEN query ~ '[\u0590-\u05FF]' THEN 'he'
+               ELSE 'en'
+           END)), query)
+        || websearch_to_tsquery('simple', query)
+$$ LANGUAGE sql STABLE;
+
 -- Function to update search vector
+-- Content and the user's hashtags weigh most, then the user's notes and
+-- the post's own hashtags, then the author. Text is analysed in the post's
+-- language, hashtags and names unstemmed
 CREATE OR REPLACE FUNCTION update_search_vector() RETURNS trigger AS $$
+DECLARE
+    config regconfig := search_config(NEW.language);
 BEGIN
-    NEW.search_vector := 
-        setweight(to_tsvector('english', COALESCE(NEW.content, '')), 'A') ||
-        setweight(to_tsvector('english', COALESCE(NEW.author_username, '')), 'B') ||
-        setweight(to_tsvector('english', COALESCE(NEW.author_display_name, '')), 'C');
+    NEW.search_vector :=
+        setweight(to_tsvector(config, COALESCE(NEW.content, '')), 'A') ||
+        setweight(to_tsvector('simple', COALESCE(array_to_string(NEW.user_hashtags, ' '), '')), 'A') ||
+        setweight(to_tsvector(config, COALESCE(NEW.raw_data->>'user_notes', '')), 'B') ||
+        setweight(to_tsvector('simple', COALESCE(array_to_string(NEW.scraped_hashtags, ' '), '')), 'B') ||
+        setweight(to_tsvector('simple', concat_ws(' ', NEW.author_username, NEW.author_display_name)), 'C');
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
--- Create trigger
+-- Create trigger (only updates touching indexed columns rebuild the vector)
 DROP TRIGGER IF EXISTS update_posts_search_vector ON social_media_posts;
 CREATE TRIGGER update_posts_search_vector
-    BEFORE INSERT OR UPDATE ON social_media_posts
+    BEFORE INSERT OR UPDATE OF content, language, raw_data, user_hashtags, scraped_hashtags,
+        author_username, author_display_name
+    ON social_media_posts
     FOR EACH ROW
     EXECUTE FUNCTION update_search_vector();
 
@@ -100,3 +239,103 @@ SELECT
     raw_data
 FROM social_media_posts
 WHERE platform = 'twitter';
+
+-- Stored media files of a post (one row per asset; media_items keeps the
+-- post's own copy). Existing installations: see migrate_to_unified_schema.sql
+-- No foreign key: post ids are not unique on their own in the partitioned
+-- posts table, so deleting a post has to delete its media rows as well
+CREATE TABLE IF NOT EXISTS media_files (
+    id SERIAL PRIMARY KEY,
+    post_id VARCHAR(255),
+    platform VARCHAR(50),
+    media_type VARCHAR(50) NOT NULL,
+    original_url TEXT NOT NULL,
+    asset_key TEXT,
+    local_path TEXT,
+    hosted_url TEXT,
+    file_size BIGINT,
+    mime_type VARCHAR(100),
+    width INTEGER,
+    height INTEGER,
+    duration REAL,
+    video_codec VARCHAR(50),
+    audio_codec VARCHAR(50),
+    bitrate BIGINT,
+    download_status VARCHAR(20) DEFAULT 'pending',
+    download_error TEXT,
+    downloaded_at TIMESTAMP WITH TIME ZONE,
+    faststart BOOLEAN DEFAULT FALSE,
+    etag TEXT,
+    last_modified TEXT,
+    content_length BIGINT
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_media_files_post_asset_key ON media_files(post_id, asset_key);
+CREATE INDEX IF NOT EXISTS idx_media_download_status ON media_files(download_status);
+CREATE INDEX IF NOT EXISTS idx_media_hosted_url ON media_files(hosted_url);
+CREATE INDEX IF NOT EXISTS idx_media_video_codec ON media_files(video_codec);
+CREATE INDEX IF NOT EXISTS idx_media_dimensions ON media_files(height, width);
+
+-- Engagement history: one narrow row per archive of a post, partitioned by
+-- month. No foreign key, so appends stay cheap; the composite primary key
+-- serves per-post lookups and BRIN indexes serve time-range scans.
+CREATE TABLE IF NOT EXISTS post_metrics_history (
+    platform VARCHAR(50) NOT NULL,
+    post_id VARCHAR(255) NOT NULL,
+    observed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    likes INTEGER,
+    shares INTEGER,
+    comments INTEGER,
+    views BIGINT,
+    saves INTEGER,
+    PRIMARY KEY (platform, post_id, observed_at)
+) PARTITION BY RANGE (observed_at);
+
+-- History recorded before posts were keyed by (platform, id): attribute each
+-- row to its post's platform ('unknown' when the id is missing or shared)
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'post_metrics_history' AND column_name = 'platform'
+    ) THEN
+        ALTER TABLE post_metrics_history ADD COLUMN platform VARCHAR(50);
+        UPDATE post_metrics_history h SET platform = COALESCE((
+            SELECT min(p.platform) FROM social_media_posts p
+            WHERE p.id = h.post_id
+            HAVING count(DISTINCT p.platform) = 1
+        ), 'unknown');
+        ALTER TABLE post_metrics_history ALTER COLUMN platform SET NOT NULL;
+        ALTER TABLE post_metrics_history DROP CONSTRAINT post_metrics_history_pkey;
+        ALTER TABLE post_metrics_history ADD PRIMARY KEY (platform, post_id, observed_at);
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_metrics_history_observed_at
+    ON post_metrics_history USING BRIN (observed_at);
+
+-- Create the partitions for this month and the next `months_ahead` months
+-- (called by the writers once a month, see core/metrics_history.py)
+CREATE OR REPLACE FUNCTION ensure_metrics_history_partitions(months_ahead INTEGER DEFAULT 1)
+RETURNS void AS $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        month_start := (date_trunc('month', NOW()) + make_interval(months => i))::DATE;
+        BEGIN
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF post_metrics_history FOR VALUES FROM (%L) TO (%L)',
+                'post_metrics_history_' || to_char(month_start, 'YYYY_MM'),
+                month_start,
+                (month_start + INTERVAL '1 month')::DATE
+            );
+        EXCEPTION WHEN duplicate_table THEN
+            -- Created concurrently by another writer
+            NULL;
+        END;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_metrics_history_partitions(2);
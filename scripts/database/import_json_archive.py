@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Bulk import of archived post JSON files into social_media_posts
+Finds tweet_*.json / <platform>_*.json files in the archive directories,
+parses them in a process pool and loads them in COPY batches
+
+Runs are idempotent and resumable: every imported file is recorded in
+archive_import_files in the same transaction as its posts, so an
+interrupted run picks up where it stopped and unchanged files are skipped.
+"""
+
+import os
+import sys
+import time
+import argparse
+from dataclasses import replace
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.archive_import import load_archive_post, discover_archive_files, default_archive_roots
+from core.post_rows import post_row, media_rows, POST_COLUMNS, POST_UPDATE_SQL
+from core.database_storage import database_storage, POST_TARGET, MEDIA_TARGET
+from core.write_behind import UpsertTarget
+from core.partitions import POST_YEARS_AHEAD
+
+# Load environment variables
+load_dotenv()
+
+MANIFEST_TARGET = UpsertTarget('archive_import_files', ('path', 'size', 'mtime', 'post_id', 'error'), ('path',), """
+    size = EXCLUDED.size,
+    mtime = EXCLUDED.mtime,
+    post_id = EXCLUDED.post_id,
+    error = EXCLUDED.error,
+    imported_at = NOW()
+""")
+
+# --refresh: archived copies only replace rows scraped earlier
+REFRESH_UPDATE_SQL = POST_UPDATE_SQL + """
+    AND (social_media_posts.scraped_at IS NULL OR EXCLUDED.scraped_at > social_media_posts.scraped_at)
+"""
+
+SCRAPED_AT = POST_COLUMNS.index('scraped_at')
+
+# (path, size, mtime, (post row, media rows) or None, error)
+ParseResult = Tuple[str, int, float, Optional[Tuple[tuple, List[tuple]]], Optional[str]]
+
+
+def parse_file(path: str) -> ParseResult:
+    """Parse one file into its social_media_posts and media_files rows (runs in a worker process)"""
+    size, mtime = 0, 0.0
+    try:
+        # A file removed or made unreadable since discovery is recorded as failed
+        stat = os.stat(path)
+        size, mtime = stat.st_size, stat.st_mtime
+        post = load_archive_post(path)
+        if post is None:
+            return path, size, mtime, None, "not a post"
+        return path, size, mtime, (post_row(post), media_rows(post)), None
+    except Exception as e:
+        return path, size, mtime, None, f"{type(e).__name__}: {e}"
+
+
+def ensure_manifest(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archive_import_files (
+            path TEXT PRIMARY KEY,
+            size BIGINT NOT NULL,
+            mtime DOUBLE PRECISION NOT NULL,
+            post_id VARCHAR(255),
+            error TEXT,
+            imported_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        );
+    """)
+
+
+def load_manifest(cursor) -> Dict[str, Tuple[int, float]]:
+    """Files already imported, with the size/mtime they had at the time"""
+    cursor.execute("SELECT path, size, mtime FROM archive_import_files")
+    return {path: (size, mtime) for path, size, mtime in cursor.fetchall()}
+
+
+def write_batch(results: List[ParseResult], update_sql: Optional[str]) -> int:
+    """Load one batch of parsed files and record them, in a single transaction"""
+    # One row per post: the newest archived copy wins
+    posts: Dict[Tuple, Tuple[tuple, List[tuple]]] = {}
+    for _, _, _, rows, _ in results:
+        if rows is None:
+            continue
+        row = rows[0]
+        key = POST_TARGET.key(row)
+        current = posts.get(key)
+        if current is None or str(row[SCRAPED_AT] or '') >= str(current[0][SCRAPED_AT] or ''):
+            posts[key] = rows
+
+    manifest = {
+        path: (path, size, mtime, rows[0][0] if rows else None, error)
+        for path, size, mtime, rows, error in results
+    }
+
+    # Without --refresh, rows already in the database are left as they are
+    post_target = replace(POST_TARGET, update_sql=update_sql)
+    media_target = MEDIA_TARGET if update_sql else replace(MEDIA_TARGET, update_sql=None)
+
+    with database_storage.get_connection() as conn:
+        with conn.cursor() as cursor:
+            if posts:
+                post_target.upsert(cursor, [row for row, _ in posts.values()])
+                media = [media_row for _, media in posts.values() for media_row in media]
+                if media:
+                    media_target.upsert(cursor, media)
+            MANIFEST_TARGET.upsert(cursor, list(manifest.values()))
+    return len(posts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import archived post JSON files into the database")
+    parser.add_argument('roots', nargs='*', help="Archive directories to scan (default: local, server and bot data dirs)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Parser processes")
+    parser.add_argument('--batch-size', type=int, default=2000, help="Files per COPY batch / transaction")
+    parser.add_argument('--refresh', action='store_true',
+                        help="Update posts already in the database when the archived copy is newer")
+    parser.add_argument('--force', action='store_true', help="Re-import files already recorded as imported")
+    args = parser.parse_args()
+
+    roots = args.roots or default_archive_roots()
+    update_sql = REFRESH_UPDATE_SQL if args.refresh else None
+
+    with database_storage.get_connection() as conn:
+        with conn.cursor() as cursor:
+            ensure_manifest(cursor)
+            imported = {} if args.force else load_manifest(cursor)
+
+    print("🚀 Archive JSON Import")
+    print("=" * 50)
+    print(f"🔍 Scanning {', '.join(str(root) for root in roots)}")
+
+    pending = []
+    skipped = 0
+    for path in discover_archive_files(roots):
+        try:
+            stat = path.stat()
+        except OSError:
+            # parse_file records why it cannot be read
+            pending.append(str(path))
+            continue
+        if imported.get(str(path)) == (stat.st_size, stat.st_mtime):
+            skipped += 1
+        else:
+            pending.append(str(path))
+    print(f"  {len(pending)} files to import, {skipped} unchanged since last run")
+    if not pending:
+        return
+
+    started = time.monotonic()
+    posts = files = failed = 0
+    batch: List[ParseResult] = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for result in executor.map(parse_file, pending, chunksize=64):
+            batch.append(result)
+            if result[4]:
+                failed += 1
+                print(f"  ⚠️  {result[0]}: {result[4]}")
+            if len(batch) >= args.batch_size:
+                posts += write_batch(batch, update_sql)
+                files += len(batch)
+                batch = []
+                print(f"  Imported {files}/{len(pending)} files ({files / (time.monotonic() - started):.0f}/s)")
+        if batch:
+            posts += write_batch(batch, update_sql)
+            files += len(batch)
+
+    # Imported posts may be older than any yearly partition so far
+    with database_storage.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT ensure_post_partitions(%s)", (POST_YEARS_AHEAD,))
+
+    print(f"\n✅ {files} files, {posts} posts loaded in {time.monotonic() - started:.1f}s")
+    if failed:
+        print(f"⚠️  {failed} files could not be parsed (recorded; edit them or use --force to retry)")
+
+
+if __name__ == "__main__":
+    main()
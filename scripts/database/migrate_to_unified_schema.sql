@@ -0,0 +1,122 @@
+-- One-off migration from the legacy tweets schema to social_media_posts
+-- All writers now store posts in social_media_posts (hashtags as arrays,
+-- media as media_items) plus media_files rows keyed by post_id. Legacy
+-- readers can use twitter_posts_view instead of the tweets table.
+--
+-- Run after create_unified_schema.sql and backfill_media_asset_keys.py
+-- (media rows are deduplicated by asset key below):
+--   python3 scripts/database/backfill_media_asset_keys.py
+--   psql -d social_media_archive -f scripts/database/migrate_to_unified_schema.sql
+-- It is idempotent; rows already in social_media_posts are kept as they are.
+
+BEGIN;
+
+-- 1. Copy tweets rows (with their hashtags and media) into the unified table
+INSERT INTO social_media_posts (
+    id, platform, url, content,
+    author_username, author_display_name, author_followers, author_verified,
+    created_at, scraped_at,
+    metrics, media_items,
+    scraped_hashtags, user_hashtags,
+    telegram_user_id, telegram_username,
+    raw_data
+)
+SELECT
+    t.id::TEXT,
+    'twitter',
+    COALESCE(t.original_url, 'https://x.com/i/status/' || t.id),
+    t.text,
+    t.author,
+    t.author_name,
+    t.author_followers,
+    COALESCE(t.author_verified, FALSE),
+    t.created_at,
+    t.scraped_at,
+    jsonb_strip_nulls(jsonb_build_object(
+        'likes', t.like_count,
+        'shares', t.retweet_count,
+        'comments', t.reply_count,
+        'views', t.view_count
+    )),
+    COALESCE((
+        SELECT jsonb_agg(jsonb_build_object(
+            'url', m.original_url,
+            'type', m.media_type,
+            'width', m.width,
+            'height', m.height,
+            'duration', m.duration,
+            'file_size', m.file_size,
+            'mime_type', m.mime_type,
+            'local_path', m.local_path,
+            'hosted_url', m.hosted_url
+        ) ORDER BY m.id)
+        FROM media_files m WHERE m.tweet_id = t.id
+    ), '[]'::JSONB),
+    ARRAY(SELECT DISTINCT h.hashtag FROM tweet_hashtags h WHERE h.tweet_id = t.id),
+    ARRAY(SELECT DISTINCT h.hashtag FROM user_hashtags h WHERE h.tweet_id = t.id),
+    t.scraped_by_user_id,
+    t.scraped_by_user,
+    CASE
+        WHEN t.user_notes IS NOT NULL
+        THEN COALESCE(t.raw_data, '{}'::JSONB) || jsonb_build_object('user_notes', t.user_notes)
+        ELSE t.raw_data
+    END
+FROM tweets t
+ON CONFLICT DO NOTHING;
+
+-- 2. Key media_files by the unified post id instead of tweets(id)
+ALTER TABLE media_files DROP CONSTRAINT IF EXISTS media_files_tweet_id_fkey;
+ALTER TABLE media_files DROP CONSTRAINT IF EXISTS fk_media_post;
+
+ALTER TABLE media_files ADD COLUMN IF NOT EXISTS post_id VARCHAR(255);
+ALTER TABLE media_files ADD COLUMN IF NOT EXISTS platform VARCHAR(50);
+ALTER TABLE media_files ALTER COLUMN post_id TYPE VARCHAR(255) USING post_id::TEXT;
+
+UPDATE media_files
+SET post_id = tweet_id::TEXT, platform = COALESCE(platform, 'twitter')
+WHERE post_id IS NULL AND tweet_id IS NOT NULL;
+
+-- Rows whose post never made it into either table cannot be attributed
+DELETE FROM media_files m
+WHERE NOT EXISTS (SELECT 1 FROM social_media_posts p WHERE p.id = m.post_id);
+
+-- Asset keys are computed in Python (core/url_normalizer.py) by the backfill
+ALTER TABLE media_files ADD COLUMN IF NOT EXISTS asset_key TEXT;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM media_files WHERE asset_key IS NULL) THEN
+        RAISE EXCEPTION 'media_files rows without asset_key - run scripts/database/backfill_media_asset_keys.py first';
+    END IF;
+END $$;
+
+-- Keep one row per (post_id, asset_key): prefer downloaded, then newest
+DELETE FROM media_files m
+USING (
+    SELECT id, ROW_NUMBER() OVER (
+        PARTITION BY post_id, asset_key
+        ORDER BY (local_path IS NOT NULL) DESC, downloaded_at DESC NULLS LAST, id DESC
+    ) AS rank
+    FROM media_files
+    WHERE asset_key IS NOT NULL
+) ranked
+WHERE m.id = ranked.id AND ranked.rank > 1;
+
+DROP INDEX IF EXISTS idx_media_files_tweet_asset_key;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_media_files_post_asset_key ON media_files(post_id, asset_key);
+
+-- Only possible while social_media_posts is unpartitioned (id unique on its own)
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'fk_media_files_post')
+       AND NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'social_media_posts'::regclass) THEN
+        ALTER TABLE media_files
+            ADD CONSTRAINT fk_media_files_post
+            FOREIGN KEY (post_id) REFERENCES social_media_posts(id) ON DELETE CASCADE;
+    END IF;
+END $$;
+
+COMMIT;
+
+-- The tweets, tweet_hashtags and user_hashtags tables are no longer written.
+-- Once nothing reads them any more they can be dropped:
+--   DROP TABLE user_hashtags, tweet_hashtags, tweets;
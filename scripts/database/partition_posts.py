@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Database Migration Script - Partition social_media_posts
+Moves an installation created before partitioning onto the partitioned
+layout of create_unified_schema.sql (LIST by platform, then RANGE by year
+of created_at) while the bot keeps writing:
+
+  prepare   build social_media_posts_partitioned with its partitions and
+            indexes, and a trigger on the old table that mirrors every
+            insert/update/delete into it
+  backfill  copy the existing rows over in small committed batches
+            (re-runnable; rows already mirrored are kept)
+  verify    compare per-platform row counts of both tables
+  swap      rename the tables in one short transaction and re-point views;
+            the old table stays as social_media_posts_unpartitioned until
+            you drop it
+
+Maintenance on the partitioned table:
+
+  history   create yearly partitions back to --first-year (the writers
+            already go back to each platform's oldest post), moving posts
+            waiting in a platform's DEFAULT partition into them
+  detach    detach yearly partitions older than --before (the detached
+            tables can be dumped and dropped, or moved to cheaper storage)
+
+Run create_unified_schema.sql first (it adds the functions and the
+(platform, id, created_at) unique index the writers upsert on).
+
+Usage:
+  python scripts/database/partition_posts.py --step all
+  python scripts/database/partition_posts.py --step detach --before 2020
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import psycopg2
+from psycopg2 import sql
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+OLD_TABLE = 'social_media_posts'
+NEW_TABLE = 'social_media_posts_partitioned'
+RETIRED_TABLE = 'social_media_posts_unpartitioned'
+PLATFORMS = ('twitter', 'instagram', 'tiktok', 'facebook', 'other')
+
+# Indexes of create_unified_schema.sql; built on the new table with a _p
+# suffix and renamed during the swap
+INDEXES = (
+    ('social_media_posts_post_key', 'UNIQUE', '(platform, id, created_at) NULLS NOT DISTINCT'),
+    ('idx_posts_platform', '', '(platform)'),
+    ('idx_posts_author_username', '', '(author_username)'),
+    ('idx_posts_created_at', '', '(created_at DESC)'),
+    ('idx_posts_scraped_at', '', '(scraped_at DESC)'),
+    ('idx_posts_telegram_user', '', '(telegram_user_id)'),
+    ('idx_posts_metrics', '', 'USING GIN(metrics)'),
+    ('idx_posts_search', '', 'USING GIN(search_vector)'),
+)
+
+MIRROR_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION mirror_social_media_posts() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM {NEW_TABLE}
+            WHERE platform = OLD.platform AND id = OLD.id
+              AND created_at IS NOT DISTINCT FROM OLD.created_at;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO {NEW_TABLE} SELECT NEW.*;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+
+def connect():
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', ''),
+        port=os.getenv('DB_PORT', 5432),
+        database=os.getenv('DB_NAME', 'social_media_archive')
+    )
+
+
+def is_partitioned(cursor, table: str) -> bool:
+    cursor.execute(
+        "SELECT EXISTS(SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+        (table,)
+    )
+    return cursor.fetchone()[0]
+
+
+def table_exists(cursor, table: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    return cursor.fetchone()[0]
+
+
+def prepare(conn):
+    """Create the partitioned copy and start mirroring writes into it"""
+    cursor = conn.cursor()
+    if is_partitioned(cursor, OLD_TABLE):
+        print(f"  ✅ {OLD_TABLE} is already partitioned")
+        return False
+
+    # The writers' conflict target, on the old table too; built without
+    # blocking writes (CONCURRENTLY cannot run inside a transaction)
+    conn.commit()
+    conn.autocommit = True
+    cursor.execute(f"""
+        CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS social_media_posts_post_key
+        ON {OLD_TABLE} (platform, id, created_at) NULLS NOT DISTINCT
+    """)
+    conn.autocommit = False
+
+    cursor.execute(f"SELECT extract(year FROM min(created_at))::INTEGER FROM {OLD_TABLE}")
+    first_year = cursor.fetchone()[0]
+
+    # Same columns in the same order, so the mirror can insert NEW.*
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {NEW_TABLE}
+        (LIKE {OLD_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY LIST (platform)
+    """)
+    for name, unique, definition in INDEXES:
+        cursor.execute(f"CREATE {unique} INDEX IF NOT EXISTS {name}_p ON {NEW_TABLE} {definition}")
+    cursor.execute("SELECT ensure_post_partitions(1, %s, %s)", (NEW_TABLE, first_year))
+
+    cursor.execute(MIRROR_FUNCTION)
+    cursor.execute(f"DROP TRIGGER IF EXISTS mirror_to_partitioned ON {OLD_TABLE}")
+    cursor.execute(f"""
+        CREATE TRIGGER mirror_to_partitioned
+        AFTER INSERT OR UPDATE OR DELETE ON {OLD_TABLE}
+        FOR EACH ROW EXECUTE FUNCTION mirror_social_media_posts()
+    """)
+    conn.commit()
+    print(f"  ✅ Created {NEW_TABLE} (yearly partitions from {first_year or 'this year'}), mirroring writes")
+    return True
+
+
+def backfill(conn, batch_size: int, pause: float):
+    """Copy existing rows in id order, one committed batch at a time"""
+    cursor = conn.cursor()
+    if not table_exists(cursor, NEW_TABLE):
+        print(f"  ❌ {NEW_TABLE} does not exist, run --step prepare first")
+        return False
+
+    last_id = ''
+    copied = 0
+    while True:
+        cursor.execute(f"""
+            SELECT max(id) FROM (
+                SELECT id FROM {OLD_TABLE} WHERE id > %s ORDER BY id LIMIT %s
+            ) batch
+        """, (last_id, batch_size))
+        upper = cursor.fetchone()[0]
+        if upper is None:
+            break
+        # Rows the mirror already wrote are newer than this snapshot: keep them
+        cursor.execute(f"""
+            INSERT INTO {NEW_TABLE}
+            SELECT * FROM {OLD_TABLE} WHERE id > %s AND id <= %s
+            ON CONFLICT DO NOTHING
+        """, (last_id, upper))
+        conn.commit()
+        copied += cursor.rowcount
+        last_id = upper
+        print(f"  Copied {copied} rows (up to id {last_id})...")
+        if pause:
+            time.sleep(pause)
+
+    print(f"  ✅ Backfilled {copied} rows")
+    return True
+
+
+def verify(conn):
+    """Compare per-platform row counts of the old and the new table"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT platform, count(*) FILTER (WHERE source = 'old'), count(*) FILTER (WHERE source = 'new')
+        FROM (
+            SELECT platform, 'old' AS source FROM {OLD_TABLE}
+            UNION ALL
+            SELECT platform, 'new' AS source FROM {NEW_TABLE}
+        ) rows
+        GROUP BY platform ORDER BY platform
+    """)
+    matches = True
+    for platform, old_count, new_count in cursor.fetchall():
+        marker = '✅' if old_count == new_count else '❌'
+        print(f"  {marker} {platform}: {old_count} → {new_count}")
+        matches = matches and old_count == new_count
+    conn.rollback()
+    return matches
+
+
+def swap(conn, lock_timeout: str):
+    """Put the partitioned table in place of the old one"""
+    cursor = conn.cursor()
+    if is_partitioned(cursor, OLD_TABLE):
+        print(f"  ✅ {OLD_TABLE} is already partitioned")
+        return True
+    if not table_exists(cursor, NEW_TABLE):
+        print(f"  ❌ {NEW_TABLE} does not exist, run --step prepare first")
+        return False
+
+    # Give up rather than queue every writer behind a long-running query
+    cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+    cursor.execute(f"LOCK TABLE {OLD_TABLE} IN ACCESS EXCLUSIVE MODE")
+
+    # Views follow the table they were created on, so capture their
+    # definitions now and re-create them on the new table after the rename
+    cursor.execute(f"""
+        SELECT DISTINCT view.oid::regclass::text, pg_get_viewdef(view.oid)
+        FROM pg_depend dep
+        JOIN pg_rewrite rule ON rule.oid = dep.objid
+        JOIN pg_class view ON view.oid = rule.ev_class
+        WHERE dep.refobjid = '{OLD_TABLE}'::regclass
+          AND view.relkind = 'v' AND view.oid <> '{OLD_TABLE}'::regclass
+    """)
+    views = cursor.fetchall()
+
+    cursor.execute(f"DROP TRIGGER IF EXISTS mirror_to_partitioned ON {OLD_TABLE}")
+    cursor.execute(f"DROP TRIGGER IF EXISTS update_posts_search_vector ON {OLD_TABLE}")
+    # A foreign key needs a unique id, which the partitioned table cannot have
+    cursor.execute("ALTER TABLE media_files DROP CONSTRAINT IF EXISTS fk_media_files_post")
+
+    cursor.execute(f"ALTER TABLE {OLD_TABLE} RENAME TO {RETIRED_TABLE}")
+    cursor.execute(f"ALTER TABLE {NEW_TABLE} RENAME TO {OLD_TABLE}")
+    for name, _, _ in INDEXES:
+        cursor.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_unpartitioned")
+        cursor.execute(f"ALTER INDEX {name}_p RENAME TO {name}")
+
+    cursor.execute(f"""
+        CREATE TRIGGER update_posts_search_vector
+        BEFORE INSERT OR UPDATE OF content, language, raw_data, user_hashtags, scraped_hashtags,
+            author_username, author_display_name
+        ON {OLD_TABLE}
+        FOR EACH ROW EXECUTE FUNCTION update_search_vector()
+    """)
+    for view_name, definition in views:
+        cursor.execute(f"CREATE OR REPLACE VIEW {view_name} AS {definition}")
+
+    conn.commit()
+    cursor.execute("DROP FUNCTION IF EXISTS mirror_social_media_posts()")
+    conn.commit()
+    print(f"  ✅ {OLD_TABLE} is now partitioned ({len(views)} views re-created)")
+    print(f"  📝 The old table is kept as {RETIRED_TABLE}; drop it once you no longer need it")
+    return True
+
+
+def partitions_of(cursor, parent: str):
+    """Names of a platform table's yearly partitions, by year"""
+    cursor.execute("""
+        SELECT child.relname FROM pg_inherits inh
+        JOIN pg_class parent ON parent.oid = inh.inhparent
+        JOIN pg_class child ON child.oid = inh.inhrelid
+        WHERE parent.relname = %s
+    """, (parent,))
+    years = {}
+    for (name,) in cursor.fetchall():
+        match = re.search(r'_(\d{4})$', name)
+        if match:
+            years[int(match.group(1))] = name
+    return years
+
+
+def history(conn, first_year: int):
+    """Create yearly partitions back to first_year, moving posts out of the DEFAULT partitions"""
+    cursor = conn.cursor()
+    if not is_partitioned(cursor, OLD_TABLE):
+        print(f"  ❌ {OLD_TABLE} is not partitioned yet")
+        return False
+
+    cursor.execute("SELECT ensure_post_partitions(1, %s, %s)", (OLD_TABLE, first_year))
+    conn.commit()
+    for platform in PLATFORMS:
+        years = sorted(partitions_of(cursor, f'{OLD_TABLE}_{platform}'))
+        if years:
+            print(f"  ✅ {platform}: yearly partitions {years[0]}-{years[-1]}")
+    return True
+
+
+def detach(conn, before: int):
+    """Detach yearly partitions older than `before` from the posts table"""
+    cursor = conn.cursor()
+    detached = 0
+    for platform in PLATFORMS:
+        parent = f'{OLD_TABLE}_{platform}'
+        for year, name in sorted(partitions_of(cursor, parent).items()):
+            if year >= before:
+                continue
+            # Not CONCURRENTLY: that is refused while a DEFAULT partition exists.
+            # Detaching only updates the catalog, the lock is held briefly
+            cursor.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                sql.Identifier(parent), sql.Identifier(name)))
+            conn.commit()
+            detached += 1
+            print(f"  ✅ Detached {name}")
+    print(f"  ✅ Detached {detached} partitions; they remain as standalone tables")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Partition social_media_posts by platform and created_at')
+    parser.add_argument('--step', required=True,
+                        choices=['prepare', 'backfill', 'verify', 'swap', 'all', 'history', 'detach'])
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per backfill transaction')
+    parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between backfill batches')
+    parser.add_argument('--lock-timeout', default='5s', help='Give up the swap if the lock takes longer')
+    parser.add_argument('--first-year', type=int, help='history: oldest year to create a partition for')
+    parser.add_argument('--before', type=int, help='detach: detach partitions of years before this one')
+    args = parser.parse_args()
+
+    print("🚀 Posts Partitioning Script")
+    print("=" * 50)
+
+    conn = connect()
+    try:
+        if args.step in ('prepare', 'all'):
+            print("🔄 Preparing partitioned table...")
+            if not prepare(conn) and args.step == 'all':
+                return
+        if args.step in ('backfill', 'all'):
+            print("🔄 Backfilling...")
+            if not backfill(conn, args.batch_size, args.pause):
+                sys.exit(1)
+        if args.step in ('verify', 'all'):
+            print("🔄 Verifying row counts...")
+            if not verify(conn):
+                print("❌ Row counts differ, not swapping")
+                sys.exit(1)
+        if args.step in ('swap', 'all'):
+            print("🔄 Swapping tables...")
+            if not swap(conn, args.lock_timeout):
+                sys.exit(1)
+        if args.step == 'history':
+            if args.first_year is None:
+                parser.error('--step history needs --first-year')
+            history(conn, args.first_year)
+        if args.step == 'detach':
+            if args.before is None:
+                parser.error('--step detach needs --before')
+            detach(conn, args.before)
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
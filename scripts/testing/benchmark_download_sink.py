@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the buffered download sink
+Compares the old aiofiles 8 KB write loop with DownloadSink on a local stream
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+import aiohttp
+import aiofiles
+from aiohttp import web
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.download_sink import write_response_to_file
+
+PAYLOAD_BLOCK = os.urandom(1024 * 1024)
+
+
+def make_app(size_mb: int) -> web.Application:
+    """Local HTTP server that streams `size_mb` MB of random data"""
+    async def handler(request):
+        response = web.StreamResponse(headers={'Content-Length': str(size_mb * len(PAYLOAD_BLOCK))})
+        await response.prepare(request)
+        for _ in range(size_mb):
+            await response.write(PAYLOAD_BLOCK)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get('/media', handler)
+    return app
+
+
+async def download_aiofiles(session, url: str, path: Path):
+    """The previous MediaDownloader write path"""
+    async with session.get(url) as response:
+        async with aiofiles.open(path, 'wb') as f:
+            async for chunk in response.content.iter_chunked(8192):
+                await f.write(chunk)
+
+
+async def download_sink(session, url: str, path: Path):
+    """The DownloadSink write path"""
+    async with session.get(url) as response:
+        await write_response_to_file(response, path)
+
+
+async def run_benchmark(size_mb: int, rounds: int, port: int):
+    runner = web.AppRunner(make_app(size_mb))
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', port)
+    await site.start()
+    url = f"http://127.0.0.1:{port}/media"
+
+    print(f"📦 Payload: {size_mb} MB, {rounds} rounds per writer")
+    print(f"{'writer':<10} {'wall (s)':>10} {'cpu (s)':>10} {'MB/s':>10}")
+
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            async with aiohttp.ClientSession() as session:
+                for name, func in [('aiofiles', download_aiofiles), ('sink', download_sink)]:
+                    wall_total = 0.0
+                    cpu_total = 0.0
+                    for i in range(rounds):
+                        path = Path(temp_dir) / f"{name}_{i}.bin"
+                        wall_start = time.perf_counter()
+                        cpu_start = time.process_time()
+                        await func(session, url, path)
+                        cpu_total += time.process_time() - cpu_start
+                        wall_total += time.perf_counter() - wall_start
+                        path.unlink()
+
+                    throughput = size_mb * rounds / wall_total
+                    print(f"{name:<10} {wall_total / rounds:>10.3f} {cpu_total / rounds:>10.3f} {throughput:>10.1f}")
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streamed download writers")
+    parser.add_argument('--size-mb', type=int, default=500, help="Payload size in MB")
+    parser.add_argument('--rounds', type=int, default=3, help="Downloads per writer")
+    parser.add_argument('--port', type=int, default=8765, help="Local server port")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.size_mb, args.rounds, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script for post content hashes
+Checks that re-archiving a post whose signed CDN URLs changed (new
+signature/expiry parameters, another edge host) produces the same
+content_hashes, so the unchanged-row check skips the update
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.data_models import SocialMediaPost, AuthorInfo, PostMetrics, MediaItem, MediaType, Platform
+from core.post_rows import post_row, POST_COLUMNS
+
+CONTENT_HASHES = POST_COLUMNS.index('content_hashes')
+MEDIA_ITEMS = POST_COLUMNS.index('media_items')
+
+
+def build_post(video_url: str, thumbnail_url: str) -> SocialMediaPost:
+    """An Instagram post as scraped with the given signed media URLs"""
+    return SocialMediaPost(
+        id='3141592653589793238',
+        platform=Platform.INSTAGRAM,
+        url='https://www.instagram.com/p/ABC123/',
+        text='Test post for content hashes',
+        author=AuthorInfo(username='testauthor', display_name='Test Author'),
+        created_at=datetime(2025, 1, 1, 12, 0),
+        scraped_at=datetime.now(),
+        media=[MediaItem(url=video_url, media_type=MediaType.VIDEO)],
+        metrics=PostMetrics(likes=25, comments=3),
+        raw_data={'video_versions': [{'url': video_url}], 'thumbnail_src': thumbnail_url}
+    )
+
+
+def test_content_hashes():
+    print("🧪 Testing Content Hashes")
+    print("=" * 50)
+
+    first = build_post(
+        'https://scontent-lhr8-1.cdninstagram.com/v/t50/video.mp4?_nc_ht=a&oh=00_AAA&oe=6790A1B2',
+        'https://scontent-lhr8-1.cdninstagram.com/v/t51/thumb.jpg?efg=x&oh=00_BBB&oe=6790A1B2'
+    )
+    second = build_post(
+        'https://scontent-fra3-2.cdninstagram.com/v/t50/video.mp4?_nc_ht=b&oh=00_CCC&oe=67A0B2C3',
+        'https://scontent-fra3-2.cdninstagram.com/v/t51/thumb.jpg?efg=y&oh=00_DDD&oe=67A0B2C3'
+    )
+    other = build_post(
+        'https://scontent-lhr8-1.cdninstagram.com/v/t50/other.mp4?oh=00_EEE&oe=6790A1B2',
+        'https://scontent-lhr8-1.cdninstagram.com/v/t51/thumb.jpg?oh=00_BBB&oe=6790A1B2'
+    )
+
+    first_row, second_row, other_row = post_row(first), post_row(second), post_row(other)
+    checks = [
+        ("Signature-only changes keep the hashes",
+         first_row[CONTENT_HASHES] == second_row[CONTENT_HASHES]),
+        ("A different asset changes the media hash",
+         first_row[CONTENT_HASHES]['media_items'] != other_row[CONTENT_HASHES]['media_items']),
+        ("Stored media URLs are left as scraped",
+         first_row[MEDIA_ITEMS][0]['url'] == first.media[0].url),
+    ]
+
+    failed = 0
+    for description, passed in checks:
+        print(f"   {'✅' if passed else '❌'} {description}")
+        failed += not passed
+
+    if failed:
+        print(f"\n❌ {failed} check(s) failed")
+        return False
+    print("\n🎉 Content hashes ignore URL signatures")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_content_hashes() else 1)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Garbage-collect media files that no archived post references
+Runs as a dry run unless --delete is given, e.g.:
+
+    python3 scripts/utilities/media_gc.py                  # report only
+    python3 scripts/utilities/media_gc.py --delete         # reclaim space
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import timedelta
+
+from dotenv import load_dotenv
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.media_gc import MediaGarbageCollector
+from core.exceptions import StorageError
+
+# Load environment variables
+load_dotenv()
+
+
+def format_size(size: int) -> str:
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mark-and-sweep cleanup of orphaned media files")
+    parser.add_argument('--delete', action='store_true', help="Delete unreferenced files (default is a dry run)")
+    parser.add_argument('--grace-days', type=float, default=None,
+                        help="Never delete files indexed less than this many days ago (default: MEDIA_GC_GRACE_DAYS or 7)")
+    parser.add_argument('--force', action='store_true', help="Ignore the safety limits (maximum deletions, unreadable archive files)")
+    parser.add_argument('--work-dir', default=None, help="Directory for the temporary mark set")
+    parser.add_argument('--sample', type=int, default=20, help="Number of example paths to list")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    parser.add_argument('--archive-root', action='append', default=None, dest='archive_roots',
+                        help="Directory of archived post JSON files to mark (repeatable; default: local, server and bot data dirs)")
+    args = parser.parse_args()
+
+    grace_period = timedelta(days=args.grace_days) if args.grace_days is not None else None
+    collector = MediaGarbageCollector(grace_period=grace_period, work_dir=args.work_dir,
+                                      archive_roots=args.archive_roots)
+
+    try:
+        report = collector.run(dry_run=not args.delete, force=args.force, sample_size=args.sample)
+    except StorageError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("🧹 Media garbage collection" + (" (dry run)" if report['dry_run'] else ""))
+    print("=" * 50)
+    print(f"References in database: {report['referenced']}")
+    print(f"References in archives: {report['archived_references']}"
+          + (f" ({report['unreadable_archives']} unreadable files)" if report['unreadable_archives'] else ""))
+    print(f"Files in inventory:     {report['inventory_files']}")
+    print(f"Unreferenced files:     {report['candidates']}")
+    for media_type, stats in report['by_type'].items():
+        print(f"   {media_type:<10} {stats['files']:>8} files  {format_size(stats['size']):>10}")
+
+    if report['sample']:
+        print("\nExamples:")
+        for path in report['sample']:
+            print(f"   {path}")
+
+    if report['dry_run']:
+        print(f"\n💡 {format_size(report['reclaimed_bytes'])} could be reclaimed - rerun with --delete")
+    else:
+        print(f"\n✅ Deleted {report['deleted']} files, reclaimed {format_size(report['reclaimed_bytes'])}")
+        if report['skipped_recent'] or report['errors']:
+            print(f"   Skipped {report['skipped_recent']} recently modified files, {report['errors']} errors")
+    print(f"⏱️  {report['elapsed_seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
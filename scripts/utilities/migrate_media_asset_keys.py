@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Rename downloaded media to their asset-key file names
+MediaDownloader used to hash the full media URL into the file name; it now
+hashes the URL's asset key (signature/expiry parameters and CDN edge hosts
+removed). Instagram, Facebook and TikTok files downloaded before that change
+carry names the downloader no longer looks for, so a re-archive downloads
+them again and orphans the old copy. This renames them to the new key.
+
+Like migrate_media_layout.py it is safe to run while the bot is live:
+  1. each file is hard-linked under its new name (both paths valid),
+  2. database paths and URLs, and the inventory, are rewritten for the batch,
+  3. the old path is replaced by a symlink to the new file, so old URLs
+     and JSON archives keep resolving.
+
+Files already downloaded again under the new name only have their database
+references moved (the old copy is left for media_gc.py). Files offloaded to
+a cold tier keep their names.
+"""
+
+import os
+import sys
+import hashlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.media_downloader import media_file_hash
+from core.media_layout import layout_is_sharded, is_sharded, sharded_path, SHARD_LEVELS
+from core.media_inventory import MediaInventory, LOCAL_TIER
+
+# Load environment variables
+load_dotenv()
+
+FETCH_SIZE = 10000
+
+# Every downloaded file with the URL and post it was downloaded for
+REFERENCES_QUERY = """
+    SELECT local_path, original_url, post_id, platform FROM media_files
+    WHERE local_path IS NOT NULL AND original_url IS NOT NULL AND post_id IS NOT NULL
+    UNION
+    SELECT item->>'local_path', item->>'url', p.id, p.platform
+    FROM social_media_posts p, jsonb_array_elements(p.media_items) AS item
+    WHERE jsonb_typeof(p.media_items) = 'array'
+      AND item->>'local_path' IS NOT NULL AND item->>'url' IS NOT NULL
+"""
+
+Move = Tuple[Path, Path]
+
+
+def url_file_hash(url: str, additional_data: str) -> str:
+    """File name hash MediaDownloader used before asset keys"""
+    return hashlib.sha256(f"{url}{additional_data}".encode('utf-8')).hexdigest()[:16]
+
+
+def renamed_path(local_path: str, url: str, post_id: str, platform: str) -> Optional[Path]:
+    """New path of a file still named by its full-URL hash, or None if it needs no rename"""
+    old_path = Path(local_path)
+    stem, dot, extensions = old_path.name.partition('.')
+    additional_data = f"{post_id}_{platform}"
+    if stem != url_file_hash(url, additional_data):
+        return None
+    new_stem = media_file_hash(url, additional_data)
+    if new_stem == stem:
+        return None
+
+    filename = new_stem + dot + extensions
+    base = old_path.parents[SHARD_LEVELS] if is_sharded(old_path) else old_path.parent
+    return sharded_path(base, filename) if layout_is_sharded() else base / filename
+
+
+def plan_moves(conn) -> Dict[Path, Path]:
+    """Old path -> new path for every referenced file that needs a rename"""
+    moves: Dict[Path, Path] = {}
+    with conn.cursor(name='media_asset_key_refs') as cursor:
+        cursor.itersize = FETCH_SIZE
+        cursor.execute(REFERENCES_QUERY)
+        for local_path, url, post_id, platform in cursor:
+            new_path = renamed_path(local_path, url, post_id, platform)
+            if new_path is not None:
+                moves.setdefault(Path(local_path), new_path)
+    conn.commit()
+    return moves
+
+
+def link_to_new_name(move: Move, inventory: MediaInventory) -> str:
+    """
+    Hard-link a file under its new name
+
+    Returns:
+        'linked', 'duplicate' (already downloaded under the new name),
+        'offloaded' (bytes in a cold tier) or 'missing'
+    """
+    old_path, new_path = move
+    if not old_path.is_file() or old_path.is_symlink():
+        record = inventory.get(old_path)
+        if record and record['tier'] != LOCAL_TIER:
+            return 'offloaded'
+        return 'missing'
+
+    new_path.parent.mkdir(parents=True, exist_ok=True)
+    if new_path.exists():
+        return 'linked' if os.path.samefile(old_path, new_path) else 'duplicate'
+    os.link(old_path, new_path)
+    return 'linked'
+
+
+def retire_old_path(move: Move, keep_symlink: bool):
+    """Replace the old path with a relative symlink, or remove it"""
+    old_path, new_path = move
+    if keep_symlink:
+        temp_link = old_path.with_name(old_path.name + '.link')
+        os.symlink(os.path.relpath(new_path, old_path.parent), temp_link)
+        os.replace(temp_link, old_path)
+    else:
+        old_path.unlink()
+
+
+def update_database(conn, moves: List[Move], media_root: Path) -> Tuple[int, int]:
+    """Rewrite local paths, hosted URLs and derivative sources for a batch of renamed files"""
+    rows = []
+    for old, new in moves:
+        try:
+            rows.append((str(old), str(new), old.relative_to(media_root).as_posix(),
+                         new.relative_to(media_root).as_posix()))
+        except ValueError:
+            # Outside the media root - the hosted URL cannot be derived, keep the path only
+            rows.append((str(old), str(new), None, None))
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS media_renames (
+            old_path TEXT PRIMARY KEY,
+            new_path TEXT NOT NULL,
+            old_suffix TEXT,
+            new_suffix TEXT
+        ) ON COMMIT DELETE ROWS;
+    """)
+    execute_values(cursor, "INSERT INTO media_renames VALUES %s ON CONFLICT DO NOTHING", rows)
+
+    cursor.execute("""
+        UPDATE media_files AS m SET
+            local_path = r.new_path,
+            hosted_url = CASE WHEN r.old_suffix IS NOT NULL AND m.hosted_url LIKE '%/' || r.old_suffix
+                THEN left(m.hosted_url, length(m.hosted_url) - length(r.old_suffix)) || r.new_suffix
+                ELSE m.hosted_url END
+        FROM media_renames r
+        WHERE m.local_path = r.old_path;
+    """)
+    media_files_updated = cursor.rowcount
+
+    cursor.execute("""
+        UPDATE social_media_posts AS p SET media_items = (
+            SELECT jsonb_agg(
+                CASE WHEN r.old_path IS NULL THEN e.item
+                ELSE e.item || jsonb_build_object(
+                    'local_path', r.new_path,
+                    'hosted_url', CASE WHEN r.old_suffix IS NOT NULL AND e.item->>'hosted_url' LIKE '%/' || r.old_suffix
+                        THEN left(e.item->>'hosted_url', length(e.item->>'hosted_url') - length(r.old_suffix))
+                             || r.new_suffix
+                        ELSE e.item->>'hosted_url' END)
+                END ORDER BY e.ord)
+            FROM jsonb_array_elements(p.media_items) WITH ORDINALITY AS e(item, ord)
+            LEFT JOIN media_renames r ON r.old_path = e.item->>'local_path'
+        )
+        WHERE EXISTS (
+            SELECT 1
+            FROM jsonb_array_elements(p.media_items) AS e(item)
+            JOIN media_renames r ON r.old_path = e.item->>'local_path'
+        );
+    """)
+    posts_updated = cursor.rowcount
+
+    # Transcoder records are keyed by the source path (derivative_path equals it when replaced in place)
+    cursor.execute("""
+        UPDATE media_derivatives AS d SET
+            source_path = r.new_path,
+            derivative_path = CASE WHEN d.derivative_path = d.source_path THEN r.new_path ELSE d.derivative_path END
+        FROM media_renames r
+        WHERE d.source_path = r.old_path;
+    """)
+
+    conn.commit()
+    cursor.close()
+    return media_files_updated, posts_updated
+
+
+def get_connection():
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', ''),
+        port=os.getenv('DB_PORT', 5432),
+        database=os.getenv('DB_NAME', 'social_media_archive')
+    )
+
+
+def batched(items: List[Move], size: int) -> Iterator[List[Move]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def migrate(args):
+    # Inventory paths are absolute
+    media_root = Path(os.path.abspath(args.media_root))
+    inventory = MediaInventory(base_path=str(media_root))
+    conn = get_connection()
+    totals = {'linked': 0, 'duplicate': 0, 'offloaded': 0, 'missing': 0, 'failed': 0,
+              'media_files': 0, 'posts': 0}
+
+    print("🔍 Finding files named by their full URL...")
+    moves = sorted(plan_moves(conn).items())
+    print(f"  {len(moves)} files to rename")
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for batch in batched(moves, args.batch_size):
+            if args.dry_run:
+                for old_path, _ in batch:
+                    print(f"  {old_path}")
+                continue
+
+            results = pool.map(lambda move: _safe_link(move, inventory), batch)
+            linked, repointed = [], []
+            for move, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    print(f"  ❌ {move[0]}: {result}")
+                    totals['failed'] += 1
+                    continue
+                totals[result] += 1
+                if result == 'linked':
+                    linked.append(move)
+                elif result == 'duplicate':
+                    repointed.append(move)
+
+            if linked or repointed:
+                media_files_updated, posts_updated = update_database(conn, linked + repointed, media_root)
+                totals['media_files'] += media_files_updated
+                totals['posts'] += posts_updated
+
+            # Before the old path becomes a symlink that GC may remove
+            for old_path, new_path in linked:
+                inventory.rename(old_path, new_path)
+
+            list(pool.map(lambda move: retire_old_path(move, not args.no_symlinks), linked))
+            print(f"  ✅ {totals['linked'] + totals['duplicate']} files renamed so far")
+
+    conn.close()
+    inventory.close()
+
+    if args.dry_run:
+        print(f"\n🎉 Would rename {len(moves)} files")
+        return
+    print(f"\n🎉 Renamed {totals['linked']} files, repointed {totals['duplicate']} already downloaded again "
+          f"({totals['offloaded']} offloaded and {totals['missing']} missing files left, {totals['failed']} failed); "
+          f"updated {totals['media_files']} media_files rows and {totals['posts']} posts")
+
+
+def _safe_link(move: Move, inventory: MediaInventory):
+    try:
+        return link_to_new_name(move, inventory)
+    except Exception as e:
+        return e
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rename downloaded media to their asset-key file names")
+    parser.add_argument('--media-root', default=os.getenv('MEDIA_STORAGE_PATH', '/home/ubuntu/social-media-archive-project/media_storage'),
+                        help="Root of the media storage tree")
+    parser.add_argument('--workers', type=int, default=8, help="Parallel file operations")
+    parser.add_argument('--batch-size', type=int, default=500, help="Files per database transaction")
+    parser.add_argument('--no-symlinks', action='store_true', help="Do not leave symlinks at the old paths")
+    parser.add_argument('--dry-run', action='store_true', help="Only list the files that would be renamed")
+    args = parser.parse_args()
+
+    print("🔑 Asset-key media rename")
+    print("=" * 50)
+    migrate(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Online migration of stored media to the sharded directory layout
+Moves flat-layout files (videos/twitter/<hash>.mp4, data/media/<file>) into
+hash-prefixed subdirectories and rewrites media_files / media_items paths
+and the media inventory. Files sharded under an earlier prefix rule (any
+name starting with four hex digits used its own prefix) are moved to
+their current shard the same way
+
+The migration is safe to run while the bot is live:
+  1. each file is hard-linked into its shard directory (both paths valid),
+  2. database paths and URLs, and the inventory, are rewritten for the batch,
+  3. the old path is replaced by a symlink to the new file, so old URLs
+     keep resolving (run again with --prune-symlinks once traffic moved).
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Iterator
+
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.media_layout import shard_prefix, is_sharded, SHARD_LEVELS, SHARD_WIDTH
+from core.media_inventory import MediaInventory
+
+# Load environment variables
+load_dotenv()
+
+MEDIA_TYPE_DIRS = ['images', 'videos', 'audio', 'documents']
+
+Move = Tuple[Path, Path]
+
+
+def flat_directories(media_root: Path) -> List[Path]:
+    """Directories that used the flat layout"""
+    directories = []
+    for media_type in MEDIA_TYPE_DIRS:
+        type_dir = media_root / media_type
+        if type_dir.is_dir():
+            directories.extend(entry for entry in type_dir.iterdir() if entry.is_dir())
+
+    bot_media_dir = media_root / 'data' / 'media'
+    if bot_media_dir.is_dir():
+        directories.append(bot_media_dir)
+
+    return directories
+
+
+def iter_flat_files(directory: Path, symlinks: bool = False) -> Iterator[Path]:
+    """Yield files stored directly in `directory` (not in shard subdirectories)"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_symlink():
+                if symlinks:
+                    yield Path(entry.path)
+            elif entry.is_file(follow_symlinks=False) and not entry.name.endswith('.part'):
+                if not symlinks:
+                    yield Path(entry.path)
+
+
+def _is_shard_dir(name: str) -> bool:
+    return len(name) == SHARD_WIDTH and all(c in '0123456789abcdef' for c in name)
+
+
+def iter_misplaced_files(directory: Path, symlinks: bool = False) -> Iterator[Path]:
+    """Yield files in `directory`'s shard subdirectories that belong in another shard"""
+    level = [Path(directory)]
+    for _ in range(SHARD_LEVELS):
+        level = [Path(parent) / name for parent in level for name in os.listdir(parent)
+                 if _is_shard_dir(name) and (Path(parent) / name).is_dir()]
+    for shard_dir in level:
+        for path in iter_flat_files(shard_dir, symlinks):
+            if symlinks or not is_sharded(path):
+                yield path
+
+
+def shard_base(path: Path, sharded: bool) -> Path:
+    """The media directory a (flat or sharded) file belongs to"""
+    return path.parents[SHARD_LEVELS] if sharded else path.parent
+
+
+def link_into_shard(old_path: Path, base: Path) -> Move:
+    """Hard-link a file into its shard directory (old path stays valid)"""
+    new_path = base / shard_prefix(old_path.name) / old_path.name
+    new_path.parent.mkdir(parents=True, exist_ok=True)
+    if new_path.exists():
+        if not os.path.samefile(old_path, new_path):
+            raise FileExistsError(f"{new_path} exists and differs from {old_path}")
+    else:
+        os.link(old_path, new_path)
+    return old_path, new_path
+
+
+def retire_old_path(move: Move, keep_symlink: bool):
+    """Replace the old path with a relative symlink, or remove it"""
+    old_path, new_path = move
+    if keep_symlink:
+        temp_link = old_path.with_name(old_path.name + '.link')
+        os.symlink(os.path.relpath(new_path, old_path.parent), temp_link)
+        os.replace(temp_link, old_path)
+    else:
+        old_path.unlink()
+
+
+def update_database(conn, moves: List[Move]):
+    """Rewrite local paths and hosted URLs for a batch of moved files"""
+    # Hosted URLs end with the path below the media directory, e.g.
+    # ".../<file>" (flat) or ".../ab/cd/<file>" (old shard)
+    rows = []
+    for old, new in moves:
+        base = shard_base(new, True)
+        rows.append((str(old), str(new), old.relative_to(base).as_posix(), new.relative_to(base).as_posix()))
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS media_moves (
+            old_path TEXT PRIMARY KEY,
+            new_path TEXT NOT NULL,
+            old_suffix TEXT NOT NULL,
+            new_suffix TEXT NOT NULL
+        ) ON COMMIT DELETE ROWS;
+    """)
+    execute_values(cursor, "INSERT INTO media_moves VALUES %s ON CONFLICT DO NOTHING", rows)
+
+    # media_files rows written by UnifiedStorageManager / storage_utils
+    cursor.execute("""
+        UPDATE media_files AS m SET
+            local_path = mv.new_path,
+            hosted_url = CASE WHEN m.hosted_url LIKE '%/' || mv.old_suffix
+                THEN left(m.hosted_url, length(m.hosted_url) - length(mv.old_suffix)) || mv.new_suffix
+                ELSE m.hosted_url END
+        FROM media_moves mv
+        WHERE m.local_path = mv.old_path;
+    """)
+    media_files_updated = cursor.rowcount
+
+    # media_items JSON written by DatabaseStorage
+    cursor.execute("""
+        UPDATE social_media_posts AS p SET media_items = (
+            SELECT jsonb_agg(
+                CASE WHEN mv.old_path IS NULL THEN e.item
+                ELSE e.item || jsonb_build_object(
+                    'local_path', mv.new_path,
+                    'hosted_url', CASE WHEN e.item->>'hosted_url' LIKE '%/' || mv.old_suffix
+                        THEN left(e.item->>'hosted_url', length(e.item->>'hosted_url') - length(mv.old_suffix))
+                             || mv.new_suffix
+                        ELSE e.item->>'hosted_url' END)
+                END ORDER BY e.ord)
+            FROM jsonb_array_elements(p.media_items) WITH ORDINALITY AS e(item, ord)
+            LEFT JOIN media_moves mv ON mv.old_path = e.item->>'local_path'
+        )
+        WHERE EXISTS (
+            SELECT 1
+            FROM jsonb_array_elements(p.media_items) AS e(item)
+            JOIN media_moves mv ON mv.old_path = e.item->>'local_path'
+        );
+    """)
+    posts_updated = cursor.rowcount
+
+    conn.commit()
+    cursor.close()
+    return media_files_updated, posts_updated
+
+
+def get_connection():
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', ''),
+        port=os.getenv('DB_PORT', 5432),
+        database=os.getenv('DB_NAME', 'social_media_archive')
+    )
+
+
+def batched(iterator: Iterator[Path], size: int) -> Iterator[List[Path]]:
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def migrate(args):
+    # Inventory paths are absolute
+    media_root = Path(os.path.abspath(args.media_root))
+    conn = None if args.no_db or args.dry_run else get_connection()
+    inventory = None if args.dry_run else MediaInventory(base_path=str(media_root))
+    totals = {'files': 0, 'failed': 0, 'media_files': 0, 'posts': 0}
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for directory in flat_directories(media_root):
+            print(f"📁 {directory}")
+            pending = [(path, False) for path in iter_flat_files(directory)]
+            pending += [(path, True) for path in iter_misplaced_files(directory)]
+            for batch in batched(iter(pending), args.batch_size):
+                if args.dry_run:
+                    totals['files'] += len(batch)
+                    continue
+
+                moves = []
+                for (old_path, _), result in zip(batch, pool.map(_safe_link, batch)):
+                    if isinstance(result, Exception):
+                        print(f"  ❌ {old_path}: {result}")
+                        totals['failed'] += 1
+                    else:
+                        moves.append(result)
+
+                if conn is not None and moves:
+                    media_files_updated, posts_updated = update_database(conn, moves)
+                    totals['media_files'] += media_files_updated
+                    totals['posts'] += posts_updated
+
+                # Before the old path becomes a symlink that GC may remove
+                for old_path, new_path in moves:
+                    inventory.rename(old_path, new_path)
+
+                list(pool.map(lambda move: retire_old_path(move, not args.no_symlinks), moves))
+                totals['files'] += len(moves)
+                print(f"  ✅ {totals['files']} files moved so far")
+
+    if conn is not None:
+        conn.close()
+    if inventory is not None:
+        inventory.close()
+
+    action = "Would move" if args.dry_run else "Moved"
+    print(f"\n🎉 {action} {totals['files']} files ({totals['failed']} failed); "
+          f"updated {totals['media_files']} media_files rows and {totals['posts']} posts")
+
+
+def _safe_link(item: Tuple[Path, bool]):
+    path, sharded = item
+    try:
+        return link_into_shard(path, shard_base(path, sharded))
+    except Exception as e:
+        return e
+
+
+def prune_symlinks(args):
+    """Remove legacy symlinks left behind by a previous migration run"""
+    removed = 0
+    for directory in flat_directories(Path(args.media_root)):
+        links = list(iter_flat_files(directory, symlinks=True))
+        links += iter_misplaced_files(directory, symlinks=True)
+        for link in links:
+            if not args.dry_run:
+                link.unlink()
+            removed += 1
+    action = "Would remove" if args.dry_run else "Removed"
+    print(f"🧹 {action} {removed} legacy symlinks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate stored media to the sharded layout")
+    parser.add_argument('--media-root', default=os.getenv('MEDIA_STORAGE_PATH', '/home/ubuntu/social-media-archive-project/media_storage'),
+                        help="Root of the media storage tree")
+    parser.add_argument('--workers', type=int, default=8, help="Parallel file operations")
+    parser.add_argument('--batch-size', type=int, default=500, help="Files per database transaction")
+    parser.add_argument('--no-db', action='store_true', help="Move files without rewriting database paths")
+    parser.add_argument('--no-symlinks', action='store_true', help="Do not leave symlinks at the old paths")
+    parser.add_argument('--prune-symlinks', action='store_true', help="Remove symlinks left by an earlier run")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would change")
+    args = parser.parse_args()
+
+    print("🚚 Sharded media layout migration")
+    print("=" * 50)
+
+    if args.prune_symlinks:
+        prune_symlinks(args)
+    else:
+        migrate(args)
+
+
+if __name__ == "__main__":
+    main()
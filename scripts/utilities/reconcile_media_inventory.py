@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Reconcile the media inventory with the files on disk
+Adds files missing from the index, fixes changed sizes and drops entries
+for deleted files. Intended for a nightly cron job, e.g.:
+
+    30 3 * * * cd /home/ubuntu/social-media-archive-project && python3 scripts/utilities/reconcile_media_inventory.py
+"""
+
+import os
+import sys
+import argparse
+
+from dotenv import load_dotenv
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.media_inventory import MediaInventory
+
+# Load environment variables
+load_dotenv()
+
+
+def format_size(size: int) -> str:
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile the media inventory with the media tree")
+    parser.add_argument('--media-root', default=None, help="Root of the media storage tree (default: MEDIA_STORAGE_PATH)")
+    parser.add_argument('--dry-run', action='store_true', help="Report drift without updating the inventory")
+    parser.add_argument('--stats', action='store_true', help="Only print the inventory totals")
+    args = parser.parse_args()
+
+    inventory = MediaInventory(base_path=args.media_root)
+
+    if not args.stats:
+        print(f"🔍 Scanning {inventory.base_path}")
+        result = inventory.reconcile(dry_run=args.dry_run)
+        label = "Drift found" if args.dry_run else "Fixed"
+        print(f"✅ Scanned {result['scanned']} files")
+        print(f"   {label}: {result['added']} added, {result['updated']} updated, {result['removed']} removed")
+
+    stats = inventory.stats()
+    print(f"\n📊 {stats['total_files']} files on local disk, {format_size(stats['total_size'])}")
+    for media_type, type_stats in stats['by_type'].items():
+        print(f"   {media_type:<10} {type_stats['files']:>8} files  {format_size(type_stats['size']):>10}")
+
+    inventory.close()
+
+
+if __name__ == "__main__":
+    main()
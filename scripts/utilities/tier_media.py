@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Move old media from local disk to the S3-compatible cold tier
+Configure the bucket with S3_BUCKET (and S3_ENDPOINT_URL for MinIO), then
+run nightly, e.g.:
+
+    0 4 * * * cd /home/ubuntu/social-media-archive-project && python3 scripts/utilities/tier_media.py --days 90
+"""
+
+import os
+import sys
+import argparse
+from datetime import timedelta
+
+from dotenv import load_dotenv
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.media_tiering import MediaTieringJob
+from core.exceptions import StorageError
+
+# Load environment variables
+load_dotenv()
+
+
+def format_size(size: int) -> str:
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offload old media to the cold storage tier")
+    parser.add_argument('--days', type=float, default=None,
+                        help="Offload files archived more than this many days ago (default: MEDIA_TIER_AFTER_DAYS or 90)")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel uploads")
+    parser.add_argument('--limit', type=int, default=None, help="Maximum number of files to move")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would be moved")
+    args = parser.parse_args()
+
+    older_than = timedelta(days=args.days) if args.days is not None else None
+
+    try:
+        job = MediaTieringJob(older_than=older_than, workers=args.workers)
+        print(f"❄️  Offloading media older than {job.older_than.days} days to {job.backend.name}")
+        report = job.run(dry_run=args.dry_run, limit=args.limit)
+    except StorageError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if report['dry_run']:
+        print(f"💡 Would move {report['files']} files ({format_size(report['bytes'])})")
+    else:
+        print(f"✅ Moved {report['files']} files ({format_size(report['bytes'])}), {report['failed']} failed")
+        print(f"   Updated {report['media_files_updated']} media_files rows and {report['posts_updated']} posts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Produce space-efficient derivatives of archived media
+Intended for cron during off-peak hours; stops by itself when the
+MEDIA_TRANSCODE_WINDOW closes, e.g.:
+
+    0 1 * * * cd /home/ubuntu/social-media-archive-project && python3 scripts/utilities/transcode_media.py
+"""
+
+import os
+import sys
+import argparse
+
+from dotenv import load_dotenv
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.media_transcoder import MediaTranscoder, PROFILES, DEFAULT_PROFILES
+
+# Load environment variables
+load_dotenv()
+
+
+def format_size(size: int) -> str:
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcode archived media with the configured profiles")
+    parser.add_argument('--profiles', default=None,
+                        help=f"Comma-separated profiles (available: {', '.join(PROFILES)}; "
+                             f"default: MEDIA_TRANSCODE_PROFILES or {DEFAULT_PROFILES}). "
+                             f"Lossy profiles keep originals unless MEDIA_KEEP_ORIGINALS=false")
+    parser.add_argument('--workers', type=int, default=None, help="Concurrent transcodes")
+    parser.add_argument('--threads', type=int, default=None, help="Threads per transcode")
+    parser.add_argument('--limit', type=int, default=None, help="Maximum number of files to process")
+    parser.add_argument('--now', action='store_true', help="Ignore the off-peak window")
+    parser.add_argument('--dry-run', action='store_true', help="Only count eligible files")
+    args = parser.parse_args()
+
+    profiles = None
+    if args.profiles:
+        profiles = [PROFILES[name.strip()] for name in args.profiles.split(',') if name.strip() in PROFILES]
+
+    transcoder = MediaTranscoder(profiles=profiles, workers=args.workers, threads=args.threads)
+    print(f"🎞️  Profiles: {', '.join(p.name for p in transcoder.profiles) or 'none available'}")
+    print(f"   {transcoder.workers} workers x {transcoder.threads} threads, window {transcoder.window or 'always'}")
+
+    report = transcoder.run(dry_run=args.dry_run, ignore_window=args.now, limit=args.limit)
+
+    for name, stats in report['profiles'].items():
+        if args.dry_run:
+            print(f"   {name:<14} {stats['eligible']:>8} eligible files")
+        else:
+            print(f"   {name:<14} {stats['success']:>6} done  {stats['skipped']:>6} skipped  "
+                  f"{stats['failed']:>6} failed  saved {format_size(stats['bytes_saved'])}")
+
+    if not args.dry_run:
+        print(f"\n✅ Saved {format_size(report['bytes_saved'])}")
+    if report['stopped_by_window']:
+        print("⏸️  Stopped at the end of the off-peak window")
+
+
+if __name__ == "__main__":
+    main()
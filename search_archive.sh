@@ -35,8 +35,10 @@ echo ""
 echo -e "${CYAN}Searching in post content and notes...${NC}"
 echo ""
 
-# Perform the search using simple LIKE for now since search_vector seems to have issues
-PGPASSWORD=$DB_PASSWORD psql -h localhost -U postgres -d social_media_archive -t -A -F"§" << SQL | while IFS='§' read -r id platform url content author created_at user_id notes tags media_count
+# Ranked full-text search on the GIN-indexed search_vector (content, notes
+# and hashtags in each post's language); the term is passed as a psql
+# variable, so quotes in it are safe
+PGPASSWORD=$DB_PASSWORD psql -h localhost -U postgres -d social_media_archive -t -A -F"§" -v term="$SEARCH_TERM" << 'SQL' | while IFS='§' read -r id platform url content author created_at user_id notes tags media_count
 SELECT 
     id,
     platform,
@@ -48,19 +50,9 @@ SELECT
     COALESCE(raw_data->>'user_notes', '') as notes,
     COALESCE(array_to_string(user_hashtags, ' '), '') as tags,
     jsonb_array_length(media_items) as media_count
-FROM social_media_posts
-WHERE 
-    platform IS NOT NULL 
-    AND id IS NOT NULL
-    AND (
-        LOWER(content) LIKE LOWER('%$SEARCH_TERM%')
-        OR LOWER(raw_data->>'user_notes') LIKE LOWER('%$SEARCH_TERM%')
-        OR EXISTS (
-            SELECT 1 FROM unnest(user_hashtags) tag 
-            WHERE LOWER(tag) LIKE LOWER('%$SEARCH_TERM%')
-        )
-    )
-ORDER BY created_at DESC
+FROM social_media_posts, search_query(:'term') AS query
+WHERE search_vector @@ query
+ORDER BY ts_rank_cd(search_vector, query, 32) DESC, created_at DESC NULLS LAST
 LIMIT 20;
 SQL
 do
@@ -108,19 +100,14 @@ done
 echo -e "${GREEN}───────────────────────────────────────────────────────${NC}"
 
 # Show count
-COUNT=$(PGPASSWORD=$DB_PASSWORD psql -h localhost -U postgres -d social_media_archive -t -c "
-SELECT COUNT(*) FROM social_media_posts 
-WHERE platform IS NOT NULL AND id IS NOT NULL
-AND (
-    LOWER(content) LIKE LOWER('%$SEARCH_TERM%')
-    OR LOWER(raw_data->>'user_notes') LIKE LOWER('%$SEARCH_TERM%')
-    OR EXISTS (
-        SELECT 1 FROM unnest(user_hashtags) tag 
-        WHERE LOWER(tag) LIKE LOWER('%$SEARCH_TERM%')
-    )
-)" | tr -d ' ')
+COUNT=$(PGPASSWORD=$DB_PASSWORD psql -h localhost -U postgres -d social_media_archive -t -A -v term="$SEARCH_TERM" << 'SQL'
+SELECT COUNT(*) FROM social_media_posts, search_query(:'term') AS query
+WHERE search_vector @@ query;
+SQL
+)
 
 echo ""
 echo -e "${CYAN}Total results: ${GREEN}$COUNT${NC}"
 echo ""
 echo -e "${YELLOW}💡 Search includes:${NC} post content, user notes, and hashtags"
+echo -e "${YELLOW}💡 Syntax:${NC} \"exact phrase\", word1 or word2, -excluded"
@@ -3,11 +3,18 @@ Simple HTTP server to serve downloaded media files
 """
 
 import os
+import sys
 import logging
 from pathlib import Path
 from http.server import HTTPServer, SimpleHTTPRequestHandler
 import socketserver
 
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.media_layout import legacy_to_sharded
+from core.media_inventory import media_inventory, LOCAL_TIER
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -15,6 +22,28 @@ class MediaHandler(SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory="/home/ubuntu/social-media-archive-project/media_storage", **kwargs)
     
+    def translate_path(self, path):
+        # Keep flat-layout URLs working after files move to sharded directories
+        local_path = super().translate_path(path)
+        if not os.path.exists(local_path):
+            sharded = legacy_to_sharded(Path(local_path))
+            if sharded is not None and sharded.is_file():
+                return str(sharded)
+        return local_path
+    
+    def send_head(self):
+        # Media moved to the cold tier is redirected to the object store
+        local_path = self.translate_path(self.path)
+        if not os.path.exists(local_path):
+            record = media_inventory.get(local_path)
+            if record and record['tier'] != LOCAL_TIER and record['remote_url']:
+                self.send_response(302)
+                self.send_header('Location', record['remote_url'])
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+        return super().send_head()
+    
     def end_headers(self):
         # Add CORS headers for web access
         self.send_header('Access-Control-Allow-Origin', '*')